@@ -0,0 +1,40 @@
+"""Páginas de Indicadores generadas a partir de especificaciones.
+
+Cada familia (`medicos`, `horas_efectivas`, `horas_programadas`,
+`atenciones`, `atenciones_nm`) define un layout parametrizado y un único
+juego de callbacks con ids `{"type": ..., "page": MATCH}`. Los módulos de
+página (`total_medicos_a_d`, ...) solo declaran su `IndicatorSpec` y llaman
+a `register_indicator_page`.
+"""
+from dash import register_page
+
+from dash_registry import require_callbacks
+from .common import IndicatorSpec, VARIANT_FILTERS
+from . import medicos, horas_efectivas, horas_programadas, atenciones, atenciones_nm
+
+__all__ = [
+    "IndicatorSpec",
+    "VARIANT_FILTERS",
+    "register_indicator_page",
+    "medicos",
+    "horas_efectivas",
+    "horas_programadas",
+    "atenciones",
+    "atenciones_nm",
+]
+
+
+def register_indicator_page(module_name, family, spec):
+    """Registra la página `module_name` como variante `spec` de `family`.
+
+    Los callbacks viven en el módulo de la familia; se declaran como
+    dependencia para que `bind_indicator_pages` los asocie a la misma app.
+    """
+    family.SPECS[spec.key] = spec
+    register_page(
+        module_name,
+        path_template=spec.path,
+        name=spec.name,
+        layout=family.build_layout(spec)
+    )
+    require_callbacks(module_name, family.__name__)
@@ -0,0 +1,648 @@
+"""Atenciones médicas de consulta externa (total_atenciones y variantes)."""
+import re
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import dash_ag_grid as dag
+from dash import html, dcc, Input, Output, State, no_update
+
+from dash_registry import callback
+from .common import (
+    BRAND, MUTED, FONT_FAMILY, FEMALE, CARD_STYLE, GRAPH_CONFIG, ERROR_STYLE,
+    page_id, match_id, current_page_key, get_codcas_periodo, tipo_asegurado_sql,
+    create_connection, read_sql, fill_label, empty_fig, top_bar_fig, pinned_total_options, send_csv,
+    page_header, page_container, graph_pair, tabs, tab,
+)
+from .row_model import (
+    infinite_grid, infinite_options, rows_block, filter_frame, pinned_rows, register_refresh
+)
+
+SOURCE_TABLE = "dwsge.dw_consulta_externa_homologacion_{anio}_{periodo}"
+DEFAULT_FILTERS = ("ce.cod_actividad = '91'", "ce.cod_variable = '001'")
+TITLE = "Detalle de Atenciones Médicas"
+
+JOINS = """
+        LEFT JOIN dwsge.sgss_cmsho10 AS c ON ce.cod_servicio = c.servhoscod
+        LEFT JOIN dwsge.dim_especialidad AS e ON ce.cod_especialidad = e.cod_especialidad
+        LEFT JOIN dwsge.sgss_cmtco10 AS t ON ce.cod_tipo_consulta = t.tipconcod
+        LEFT JOIN dwsge.sgss_cmdia10 AS d ON ce.cod_diag = d.diagcod
+        LEFT JOIN dwsge.sgss_cmace10 AS a ON ce.cod_actividad = a.actcod AND ce.cod_subactividad = a.actespcod
+        LEFT JOIN dwsge.sgss_cmact10 AS am ON ce.cod_actividad = am.actcod
+        LEFT JOIN dwsge.sgss_cmcas10 AS ca ON ce.cod_oricentro = ca.oricenasicod AND ce.cod_centro = ca.cenasicod
+        LEFT JOIN dwsge.dim_agrupador as ag ON ce.cod_agrupador = ag.cod_agrupador"""
+
+DETALLE_COLUMNS = [
+    {"headerName": "Servicio", "field": "servicio2"},
+    {"headerName": "Actividad", "field": "actividad2"},
+    {"headerName": "Subactividad", "field": "subactividad2"},
+    {"headerName": "Tipo consulta", "field": "tipo_consulta2"},
+    {"headerName": "CodDiag", "field": "coddiag2"},
+    {"headerName": "Diagnostico", "field": "diagnostico2"},
+    {"headerName": "dni_medico", "field": "dni_medico2", "filter": "agNumberColumnFilter"},
+    {"headerName": "acto_med", "field": "acto_med2", "filter": "agNumberColumnFilter"},
+    {"headerName": "sexo", "field": "sexo2"},
+    {"headerName": "fecha_atencion", "field": "fecha_atencion2"},
+    {"headerName": "desc_cl", "field": "desc_cl2"}
+]
+DETALLE_GRID_OPTIONS = infinite_options(
+    onFirstDataRendered={"function": "params.api.autoSizeAllColumns();"}
+)
+RESUMEN_COLUMNS = [
+    {"headerName": "Servicio", "field": "descripcion_servicio"},
+    {"headerName": "Subactividad", "field": "subactividad"},
+    {"headerName": "Sexo", "field": "sexo", "width": 100},
+    {"headerName": "CodDiag", "field": "cod_diag", "width": 100},
+    {"headerName": "Diagnóstico", "field": "descripcion_diagnostico", "width": 550},
+    {"headerName": "Atenciones", "field": "Atenciones", "filter": "agNumberColumnFilter"}
+]
+
+PREFERRED_GROUPS = [
+    ("adulto mayor", "Adulto mayor (60+ años)"),
+    ("adulto", "Adulto (30-59 años)"),
+    ("joven", "Joven (18-29 años)"),
+    ("adolescente", "Adolescente (12-17 años)"),
+    ("niño", "Niño (0-11 años)")
+]
+
+# Variantes registradas, por `IndicatorSpec.key`
+SPECS = {}
+
+
+def _where(spec, codcas, tipo_asegurado, clasificacion="2,4,6"):
+    return f"""WHERE ce.cod_centro = '{codcas}'
+          AND ce.clasificacion in ({clasificacion})
+          AND {spec.where(DEFAULT_FILTERS)}
+          AND {tipo_asegurado_sql(tipo_asegurado)}"""
+
+
+def build_query(spec, anio, periodo, codcas, tipo_asegurado, extra_columns=""):
+    # Las barras de inicio y el detalle comparten esta consulta (caché)
+    return f"""
+        SELECT
+            ce.cod_servicio,
+            ce.cod_especialidad,
+            ca.cenasides,
+            am.actdes AS actividad,
+            ag.agrupador AS agrupador,
+            a.actespnom AS subactividad,
+            ce.cod_tipo_consulta,
+            ce.cod_diag,
+            d.diagdes AS descripcion_diagnostico,
+            c.servhosdes AS descripcion_servicio,
+            e.especialidad AS descripcion_especialidad,
+            t.tipcondes AS descripcion_tipo_consulta,
+            dni_medico,
+            doc_paciente,{extra_columns}
+            cod_tipdoc_paciente,
+            sexo,
+            fecha_atencion,
+            acto_med
+        FROM {SOURCE_TABLE.format(anio=anio, periodo=periodo)} AS ce{JOINS}
+        {_where(spec, codcas, tipo_asegurado)}
+    """
+
+
+def build_no_considerados_query(spec, anio, periodo, codcas, tipo_asegurado):
+    return f"""
+        SELECT
+            c.servhosdes AS Servicio2,
+            am.actdes AS Actividad2,
+            a.actespnom AS Subactividad2,
+            t.tipcondes AS Tipo_consulta2,
+            ce.cod_diag as CodDiag2,
+            d.diagdes AS Diagnostico2,
+            dni_medico as dni_medico2,
+            acto_med as acto_med2,
+            sexo as sexo2,
+            fecha_atencion as fecha_atencion2,
+            cl.desc_cl AS desc_cl2
+        FROM {SOURCE_TABLE.format(anio=anio, periodo=periodo)} AS ce{JOINS}
+        LEFT JOIN dwsge.dwe_cl10 as cl ON ce.clasificacion = cl.id_cl
+        {_where(spec, codcas, tipo_asegurado, clasificacion="1,3,5,0")}
+    """
+
+
+def build_tornado_query(spec, anio, periodo, codcas, tipo_asegurado):
+    return f"""
+        SELECT
+            ge.grupo_etario,
+            ce.sexo,
+            COUNT(*) AS atenciones
+        FROM {SOURCE_TABLE.format(anio=anio, periodo=periodo)} AS ce
+        LEFT JOIN dwsge.dim_grupo_etario as ge ON ce.anio_edad = ge.edad
+        {_where(spec, codcas, tipo_asegurado)}
+        GROUP BY ge.grupo_etario, ce.sexo
+    """
+
+
+def _card_title(icon, text):
+    return html.Div([
+        html.I(className=f"bi {icon} me-2", style={'color': BRAND, 'fontSize': '20px'}),
+        html.H5(text, style={"color": BRAND, "fontFamily": FONT_FAMILY, "fontWeight": 700,
+                             "marginBottom": 0, "letterSpacing": "-0.2px"}),
+    ], style={'display': 'flex', 'alignItems': 'center', 'marginBottom': '12px'})
+
+
+def build_layout(spec):
+    key = spec.key
+    msg_style = {"marginTop": "10px", "color": MUTED, "fontFamily": FONT_FAMILY, "fontSize": "12px", "fontWeight": "600"}
+    return page_container([
+        dcc.Location(id=page_id("page-url", key), refresh=False),
+        page_header(key, "bi-clipboard2-pulse", spec.title or TITLE,
+                    "Análisis completo de la producción del periodo seleccionado",
+                    "btn-download-query1", "download-query1-csv", icon_size="28px"),
+        tabs(key, "main-tabs", "tab-graficos", [
+            tab("Producción", "tab-graficos", html.Div([
+                # Barras servicio / subactividad
+                html.Div([
+                    graph_pair(key, "bar-servicio-graph", "bar-especialidad-graph")
+                ], style={**CARD_STYLE}),
+                html.Br(),
+                html.Br(),
+                # Agrupador + especialidad
+                html.Div([
+                    graph_pair(key, "total-atenciones-graph", "total-atenciones-graph-esp"),
+                    html.Div(id=page_id("total-atenciones-msg", key), style=msg_style)
+                ], style={**CARD_STYLE}),
+                html.Br(),
+                # Tornado
+                html.Div([
+                    _card_title("bi-gender-ambiguous", "Atenciones por grupo etario y sexo"),
+                    dcc.Loading(
+                        html.Div([
+                            dcc.Graph(id=page_id("tornado-atenciones-graph", key), config=GRAPH_CONFIG,
+                                      style={"height": "360px", "width": "100%"})
+                        ]),
+                        type="dot"
+                    ),
+                    html.Div(id=page_id("tornado-atenciones-msg", key), style=msg_style)
+                ], style={**CARD_STYLE})
+            ], style={"padding": "8px"})),
+            tab("Diagnósticos", "tab-resumen", html.Div([
+                html.Div([
+                    _card_title("bi-clipboard-data", "Resumen servicio / subactividad / diagnóstico"),
+                    # Top 10 coddiag x sexo (antes de la tabla)
+                    dcc.Loading(
+                        dcc.Graph(id=page_id("bar-topdiag-graph", key), config=GRAPH_CONFIG,
+                                  style={"height": "360px", "width": "100%"}),
+                        type="dot"
+                    ),
+                    html.Div(id=page_id("tabla-resumen-atenciones-wrapper", key))
+                ], style={**CARD_STYLE})
+            ], style={"padding": "8px"})),
+            tab("Registros no considerados", "tab-detalle", html.Div([
+                html.Div([
+                    _card_title("bi-exclamation-triangle", "Detalle de registros no considerados"),
+                    html.Div(id=page_id("tabla-detalle-wrapper", key))
+                ], style={**CARD_STYLE})
+            ], style={"padding": "8px"})),
+        ]),
+    ], max_width="1700px")
+
+
+def _params(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown):
+    spec = SPECS[current_page_key()]
+    return (spec, *get_codcas_periodo(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown))
+
+
+def _bar(df, dim, title, y_title, fill):
+    fig = top_bar_fig(df, dim, title, "Atenciones", y_title, fill=fill)
+    fig.update_layout(hovermode="y", bargap=0.24, bargroupgap=0.12)
+    return fig
+
+
+@callback(
+    Output(match_id("bar-servicio-graph"), "figure"),
+    Output(match_id("bar-especialidad-graph"), "figure"),
+    Input(match_id("page-url"), "pathname"),
+    Input(match_id("page-url"), "search"),
+    State("filter-periodo", "value"),
+    State("filter-anio", "value"),
+    State("filter-tipo-asegurado", "value")
+)
+def update_barras_inicio(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown):
+    spec, codcas, periodo, anio, tipo_asegurado = _params(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown)
+    if not codcas or not periodo or not anio:
+        return empty_fig("Atenciones por servicio"), empty_fig("Atenciones por subactividad")
+    try:
+        df = read_sql(build_query(spec, anio, periodo, codcas, tipo_asegurado))
+    except Exception:
+        return empty_fig("Atenciones por servicio"), empty_fig("Atenciones por subactividad")
+    if df.empty:
+        return (
+            empty_fig(f"Atenciones por servicio - Periodo {periodo}"),
+            empty_fig(f"Atenciones por subactividad - Periodo {periodo}"),
+        )
+    return (
+        _bar(df, "descripcion_servicio", f"Atenciones por servicio - Periodo {periodo}", "Servicio", "Sin servicio"),
+        _bar(df, "subactividad", f"Atenciones por subactividad - Periodo {periodo}", "Servicio", "Sin subactividad"),
+    )
+
+
+def _sex_simple(s):
+    s2 = str(s).strip().upper()
+    if s2 in ("M", "MASCULINO", "VARON", "H"):
+        return "M"
+    if s2 in ("F", "FEMENINO", "MUJER"):
+        return "F"
+    return "Sin dato"
+
+
+def _topdiag_fig(df, periodo):
+    title = f"Top 10 diagnósticos por atenciones - Periodo {periodo}"
+    diag_df = df.assign(
+        sexo_simple=df["sexo"].map(_sex_simple),
+        cod_diag=df["cod_diag"].fillna("Sin cod")
+    )
+    totals_diag = diag_df.groupby("cod_diag").size().reset_index(name="total")
+    top_codes = totals_diag.sort_values("total", ascending=False).head(10)["cod_diag"].tolist()
+    top_diag_df = diag_df[diag_df["cod_diag"].isin(top_codes)]
+    if top_diag_df.empty:
+        return empty_fig(title)
+
+    desc_map = (
+        diag_df[["cod_diag", "descripcion_diagnostico"]]
+        .dropna()
+        .drop_duplicates()
+        .set_index("cod_diag")["descripcion_diagnostico"]
+        .to_dict()
+    )
+    bar_data = top_diag_df.groupby(["cod_diag", "sexo_simple"], observed=True).size().reset_index(name="Atenciones")
+    order_y = (
+        totals_diag[totals_diag["cod_diag"].isin(top_codes)]
+        .sort_values("total", ascending=True)["cod_diag"].tolist()
+    )
+    bar_data["descripcion_diagnostico"] = bar_data["cod_diag"].map(desc_map)
+    grand_total = bar_data["Atenciones"].sum()
+    bar_data["label"] = bar_data["Atenciones"].apply(
+        lambda v: f"{v:,.0f} ({(v/grand_total):.1%})" if grand_total else f"{v:,.0f} (0.0%)"
+    )
+
+    fig = px.bar(
+        bar_data,
+        y="cod_diag",
+        x="Atenciones",
+        color="sexo_simple",
+        orientation="h",
+        title=title,
+        hover_data={"descripcion_diagnostico": True, "cod_diag": False, "sexo_simple": False, "Atenciones": True},
+        color_discrete_map={"M": "#4C78A8", "F": "#B82753", "Sin dato": "#9aa0a6"},
+        text="label"
+    )
+    fig.update_traces(
+        textposition="outside",
+        cliponaxis=False,
+        texttemplate="%{text}",
+        marker_line_color="rgba(0,0,0,0.06)",
+        marker_line_width=1,
+        textfont=dict(size=11)
+    )
+    fig.update_layout(
+        barmode="group",
+        template="simple_white",
+        paper_bgcolor="#F9FBFD",
+        plot_bgcolor="#F9FBFD",
+        margin=dict(l=90, r=32, t=70, b=40),
+        title_font=dict(size=18, color=BRAND),
+        font=dict(family=FONT_FAMILY, size=12, color="#1F2937"),
+        xaxis_title="Atenciones",
+        yaxis_title="CodDiag",
+        yaxis=dict(categoryorder="array", categoryarray=order_y, ticks="outside", tickfont=dict(color="#1F2937")),
+        legend_title_text="Sexo",
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            bgcolor="rgba(255,255,255,0.85)",
+            bordercolor="rgba(0,0,0,0.05)",
+            borderwidth=1,
+        ),
+        xaxis=dict(showgrid=True, gridcolor="rgba(10,76,140,0.08)", zeroline=False, ticks="outside"),
+        hoverlabel=dict(bgcolor="#FFFFFF", font=dict(family=FONT_FAMILY, color="#0F172A")),
+    )
+    return fig
+
+
+def _resumen_grid(df, key):
+    resumen_df = (
+        df.assign(
+            descripcion_servicio=df["descripcion_servicio"].fillna("Sin servicio"),
+            subactividad=df["subactividad"].fillna("Sin subactividad"),
+            sexo=fill_label(df["sexo"], "Sin sexo"),
+            cod_diag=df["cod_diag"].fillna("Sin cod"),
+            descripcion_diagnostico=df["descripcion_diagnostico"].fillna("Sin diagnóstico")
+        ).groupby(["descripcion_servicio", "subactividad", "sexo", "cod_diag", "descripcion_diagnostico"], observed=True)
+         .size().reset_index(name="Atenciones").sort_values("Atenciones", ascending=False)
+    )
+    return dag.AgGrid(
+        id=page_id("tabla-resumen-atenciones", key),
+        columnDefs=RESUMEN_COLUMNS,
+        rowData=resumen_df.to_dict("records"),
+        defaultColDef={"sortable": True, "resizable": True, "filter": "agTextColumnFilter", "floatingFilter": True},
+        dashGridOptions=pinned_total_options(
+            "descripcion_servicio", "Total atenciones", sum_field="Atenciones",
+            pinned=[{"descripcion_servicio": f"Total atenciones: {resumen_df['Atenciones'].sum():,}"}]
+        ),
+        className="ag-theme-alpine",
+        style={"height": "400px", "width": "100%"}
+    )
+
+
+def _detalle_grid(df2, key):
+    if df2.empty:
+        return html.Div("Sin datos detalle (query2).", style=ERROR_STYLE)
+    # Filas por bloques desde `detalle_bloque`
+    return infinite_grid(
+        page_id("tabla-detalle-query2", key),
+        DETALLE_COLUMNS,
+        grid_options=_detalle_options(len(df2)),
+        enableEnterpriseModules=True,
+        style={"height": "500px", "width": "100%"}
+    )
+
+
+def _detalle_total(total):
+    return [{"servicio2": f"Total filas: {total}"}]
+
+
+def _detalle_options(total):
+    return {**DETALLE_GRID_OPTIONS, "pinnedBottomRowData": _detalle_total(total)}
+
+
+@callback(
+    Output(match_id("total-atenciones-graph"), "figure"),
+    Output(match_id("total-atenciones-graph-esp"), "figure"),
+    Output(match_id("total-atenciones-msg"), "children"),
+    Output(match_id("tabla-detalle-wrapper"), "children"),
+    Output(match_id("tabla-resumen-atenciones-wrapper"), "children"),
+    Output(match_id("bar-topdiag-graph"), "figure"),
+    Input(match_id("page-url"), "pathname"),
+    Input(match_id("page-url"), "search"),
+    State("filter-periodo", "value"),
+    State("filter-anio", "value"),
+    State("filter-tipo-asegurado", "value")
+)
+def update_total_atenciones(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown):
+    empty_div = html.Div()
+    spec, codcas, periodo, anio, tipo_asegurado = _params(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown)
+
+    def _empty(msg, suffix=""):
+        return (
+            empty_fig(f"Atenciones por agrupador{suffix}"),
+            empty_fig(f"Atenciones por especialidad{suffix}"),
+            msg,
+            empty_div,
+            empty_div,
+            empty_fig(f"Top 10 diagnósticos por atenciones{suffix}"),
+        )
+
+    if not codcas:
+        return _empty("Sin ruta.")
+    if not periodo or not anio:
+        return _empty("Faltan filtros requeridos (asegúrate de tener ?periodo=MM&anio=YYYY o dropdowns con datos).")
+    if create_connection() is None:
+        return _empty("Error de conexión a la base de datos.")
+
+    try:
+        df = read_sql(build_query(spec, anio, periodo, codcas, tipo_asegurado))
+        df2 = read_sql(build_no_considerados_query(spec, anio, periodo, codcas, tipo_asegurado))
+    except Exception as e:
+        return _empty(f"Error ejecutando consulta: {e}")
+    if df.empty:
+        empty = _empty(f"Sin datos para periodo {periodo}.", f" - Periodo {periodo}")
+        return empty[:4] + (html.Div("Sin datos resumen.", style=ERROR_STYLE),) + empty[5:]
+
+    key = spec.key
+    fig = _bar(df, "agrupador", f"Atenciones por agrupador - Periodo {periodo}", "Agrupador", "Sin agrupador")
+    fig2 = _bar(df, "descripcion_especialidad", f"Atenciones por especialidad - Periodo {periodo}",
+                "Especialidad", "Sin especialidad")
+    top_agr = fill_label(df["agrupador"], "Sin agrupador").value_counts().head(10)
+    msg_fig = f"{int(top_agr.sum()):,} atenciones en {top_agr.shape[0]} agrupadores."
+    msg = f"{len(df):,} registros procesados | {msg_fig}"
+    return (
+        fig,
+        fig2,
+        msg,
+        _detalle_grid(df2, key),
+        _resumen_grid(df, key),
+        _topdiag_fig(df, periodo),
+    )
+
+
+def _norm_sex(s):
+    s2 = str(s).strip().upper()
+    if s2 in ("M", "MASCULINO", "VARON", "H"):
+        return "Masculino"
+    if s2 in ("F", "FEMENINO", "MUJER"):
+        return "Femenino"
+    return s if pd.notna(s) else "Sin dato"
+
+
+def _age_key(label):
+    m = re.match(r"^\s*(\d+)", str(label))
+    return int(m.group(1)) if m else 999
+
+
+def _order_tuple(label):
+    label_lower = str(label).lower()
+    for idx, (keyword, _) in enumerate(PREFERRED_GROUPS):
+        if keyword in label_lower:
+            return (idx, 0)
+    return (len(PREFERRED_GROUPS), _age_key(label))
+
+
+def _prettify_label(label):
+    label_lower = str(label).lower()
+    for keyword, pretty in PREFERRED_GROUPS:
+        if keyword in label_lower:
+            return pretty
+    return str(label)
+
+
+@callback(
+    Output(match_id("tornado-atenciones-graph"), "figure"),
+    Output(match_id("tornado-atenciones-msg"), "children"),
+    Input(match_id("page-url"), "pathname"),
+    Input(match_id("page-url"), "search"),
+    State("filter-periodo", "value"),
+    State("filter-anio", "value"),
+    State("filter-tipo-asegurado", "value")
+)
+def update_tornado_atenciones(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown):
+    spec, codcas, periodo, anio, tipo_asegurado = _params(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown)
+    if not codcas:
+        return empty_fig("Sexo y grupo etario vs atenciones"), "Sin ruta."
+    if not periodo or not anio:
+        return empty_fig("Sexo y grupo etario vs atenciones"), "Faltan filtros requeridos (periodo/anio)."
+    if create_connection() is None:
+        return empty_fig("Sexo y grupo etario vs atenciones"), "Error de conexión a la base de datos."
+
+    try:
+        df = read_sql(build_tornado_query(spec, anio, periodo, codcas, tipo_asegurado))
+    except Exception as e:
+        return empty_fig("Sexo y grupo etario vs atenciones"), f"Error ejecutando consulta: {e}"
+    if df.empty:
+        return empty_fig(f"Sexo y grupo etario vs atenciones - Periodo {periodo}"), f"Sin datos para periodo {periodo}."
+
+    df["sexo_norm"] = df["sexo"].apply(_norm_sex)
+    df["grupo_etario"] = df["grupo_etario"].fillna("Sin grupo")
+    pv = df.pivot_table(index="grupo_etario", columns="sexo_norm", values="atenciones", aggfunc="sum", fill_value=0, observed=True)
+
+    age_order = sorted(list(pv.index), key=_order_tuple)
+    male_vals = pv["Masculino"].reindex(age_order, fill_value=0) if "Masculino" in pv.columns else pd.Series(0, index=age_order)
+    fem_vals = pv["Femenino"].reindex(age_order, fill_value=0) if "Femenino" in pv.columns else pd.Series(0, index=age_order)
+    display_labels = [_prettify_label(label) for label in age_order]
+
+    grand_total = int(male_vals.sum() + fem_vals.sum())
+    male_labels = [f"{v:,} ({(v/grand_total):.1%})" if grand_total else f"{v:,} (0.0%)" for v in male_vals.tolist()]
+    fem_labels = [f"{v:,} ({(v/grand_total):.1%})" if grand_total else f"{v:,} (0.0%)" for v in fem_vals.tolist()]
+
+    fig = go.Figure()
+    fig.add_bar(
+        y=display_labels,
+        x=(-male_vals).tolist(),
+        name="Masculino",
+        orientation="h",
+        marker_color=BRAND,
+        marker_line_color="rgba(0,0,0,0.06)",
+        marker_line_width=1,
+        hovertemplate="<b>%{y}</b><br>Masculino: %{customdata:,}<extra></extra>",
+        customdata=male_vals.tolist(),
+        text=male_labels,
+        texttemplate="%{text}",
+        textposition="outside",
+        textfont=dict(size=13, color="#0F172A"),
+    )
+    fig.add_bar(
+        y=display_labels,
+        x=fem_vals.tolist(),
+        name="Femenino",
+        orientation="h",
+        marker_color=FEMALE,
+        marker_line_color="rgba(0,0,0,0.06)",
+        marker_line_width=1,
+        hovertemplate="<b>%{y}</b><br>Femenino: %{x:,}<extra></extra>",
+        text=fem_labels,
+        texttemplate="%{text}",
+        textposition="outside",
+        textfont=dict(size=13, color="#0F172A"),
+    )
+    fig.update_layout(
+        barmode="relative",
+        template="simple_white",
+        paper_bgcolor="#F9FBFD",
+        plot_bgcolor="#F9FBFD",
+        margin=dict(l=80, r=32, t=60, b=40),
+        title_font=dict(size=18, color=BRAND),
+        font=dict(family=FONT_FAMILY, size=12, color="#1F2937"),
+        xaxis=dict(
+            title="Atenciones",
+            showgrid=True,
+            gridcolor="rgba(10,76,140,0.08)",
+            zeroline=True,
+            zerolinewidth=1,
+            zerolinecolor="#94a3b8",
+            ticks="outside",
+            tickformat=",.0f",
+            tickfont=dict(color="#475569"),
+        ),
+        yaxis=dict(
+            title="Grupo etario",
+            categoryorder="array",
+            categoryarray=display_labels,
+            showgrid=False,
+            ticks="outside",
+            tickfont=dict(color="#1F2937"),
+        ),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.04,
+            xanchor="right",
+            x=0,
+            bgcolor="rgba(255,255,255,0.85)",
+            bordercolor="rgba(0,0,0,0.05)",
+            borderwidth=1,
+        ),
+        hoverlabel=dict(bgcolor="#FFFFFF", font=dict(family=FONT_FAMILY, color="#0F172A")),
+    )
+
+    total_m = int(male_vals.sum())
+    total_f = int(fem_vals.sum())
+    msg = f"Total atenciones: {total_m + total_f:,} | Masculino: {total_m:,} | Femenino: {total_f:,}"
+    return fig, msg
+
+
+def _detalle_frame(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown):
+    spec, codcas, periodo, anio, tipo_asegurado = _params(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown)
+    if not codcas or not periodo or not anio:
+        return None
+    # Misma consulta que `update_total_atenciones`: sale de la caché
+    return read_sql(build_no_considerados_query(spec, anio, periodo, codcas, tipo_asegurado))
+
+
+@callback(
+    Output(match_id("tabla-detalle-query2"), "getRowsResponse"),
+    Input(match_id("tabla-detalle-query2"), "getRowsRequest"),
+    State(match_id("page-url"), "pathname"),
+    State(match_id("page-url"), "search"),
+    State("filter-periodo", "value"),
+    State("filter-anio", "value"),
+    State("filter-tipo-asegurado", "value"),
+    prevent_initial_call=True
+)
+def detalle_bloque(request, pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown):
+    if not request:
+        return no_update
+    df2 = _detalle_frame(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown)
+    if df2 is None:
+        return {"rowData": [], "rowCount": 0}
+    return rows_block(df2, request)
+
+
+# Conteo de filas con los filtros de la grilla; el inicial viene en la grilla
+@callback(
+    Output(match_id("tabla-detalle-query2"), "dashGridOptions"),
+    Input(match_id("tabla-detalle-query2"), "filterModel"),
+    State(match_id("page-url"), "pathname"),
+    State(match_id("page-url"), "search"),
+    State("filter-periodo", "value"),
+    State("filter-anio", "value"),
+    State("filter-tipo-asegurado", "value"),
+    prevent_initial_call=True
+)
+def detalle_total(filter_model, pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown):
+    df2 = _detalle_frame(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown)
+    if df2 is None:
+        return no_update
+    return pinned_rows(_detalle_total(len(filter_frame(df2, filter_model))))
+
+
+register_refresh("tabla-detalle-query2", ("page-url", "pathname"), ("page-url", "search"))
+
+
+@callback(
+    Output(match_id("download-query1-csv"), "data"),
+    Input(match_id("btn-download-query1"), "n_clicks"),
+    State(match_id("page-url"), "pathname"),
+    State(match_id("page-url"), "search"),
+    State("filter-periodo", "value"),
+    State("filter-anio", "value"),
+    State("filter-tipo-asegurado", "value"),
+    prevent_initial_call=True
+)
+def descargar_query1_csv(n_clicks, pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown):
+    spec, codcas, periodo, anio, tipo_asegurado = _params(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown)
+    if not codcas or not periodo or not anio:
+        return None
+    query = build_query(spec, anio, periodo, codcas, tipo_asegurado, extra_columns="\n            anio_edad,")
+    try:
+        df = read_sql(query, cache=False)
+    except Exception:
+        return None
+
+    filename = f"{spec.download_name or spec.name}_{codcas}_{anio}_{periodo}.csv"
+    return send_csv(df, filename, encoding="utf-8-sig", sep="|")
@@ -0,0 +1,156 @@
+"""Atenciones no médicas (total_atenciones_nm_*)."""
+from dash import html, dcc, Input, Output, State
+
+from dash_registry import callback
+from .common import (
+    MUTED, FONT_FAMILY, CARD_STYLE, GRAPH_CONFIG,
+    page_id, match_id, current_page_key, get_codcas_periodo, tipo_asegurado_sql,
+    create_connection, read_sql, fill_label, empty_fig, top_bar_fig, send_csv,
+    page_header, page_container, graph_pair, tabs, tab,
+)
+
+SOURCE_TABLE = "dwsge.dwe_consulta_externa_no_medicas_{anio}_{periodo}"
+TITLE = "Detalle de Atenciones"
+
+# Variantes registradas, por `IndicatorSpec.key`
+SPECS = {}
+
+
+def build_query(spec, anio, periodo, codcas, tipo_asegurado):
+    # Barras, diagnósticos y descarga usan la misma consulta (caché)
+    return f"""
+                    SELECT ce.cod_oricentro, ce.cod_centro,a.actespnom,c.servhosdes,ce.cod_servicio, ce.cod_actividad, ce.cod_subactividad,ce.acto_med, ce.doc_paciente, ce.diagcod, dg.diagdes
+                    FROM {SOURCE_TABLE.format(anio=anio, periodo=periodo)} ce
+                    LEFT OUTER JOIN dwsge.sgss_cmdia10 dg
+                        ON dg.diagcod=ce.diagcod
+                    LEFT JOIN dwsge.sgss_cmsho10 AS c
+                        ON ce.cod_servicio = c.servhoscod
+                    LEFT JOIN dwsge.sgss_cmace10 AS a
+                        ON ce.cod_actividad = a.actcod
+                        AND ce.cod_subactividad = a.actespcod
+                    LEFT JOIN dwsge.sgss_cmact10 AS am
+                        ON ce.cod_actividad = am.actcod
+                    LEFT JOIN dwsge.sgss_cmcas10 AS ca
+                        ON ce.cod_oricentro = ca.oricenasicod
+                        AND ce.cod_centro = ca.cenasicod
+                        WHERE cod_centro = '{codcas}'
+                        AND {spec.where(indent="                        ")}
+                        AND {tipo_asegurado_sql(tipo_asegurado)}
+    """
+
+
+def build_layout(spec):
+    key = spec.key
+    return page_container([
+        dcc.Location(id=page_id("page-url-nm", key), refresh=False),
+        page_header(key, "bi-clipboard2-pulse", spec.title or TITLE,
+                    "Análisis completo de la producción del periodo seleccionado",
+                    "btn-download-query1-nm", "download-query1-csv-nm", icon_size="28px"),
+        tabs(key, "main-tabs-nm", "tab-graficos", [
+            tab("Producción", "tab-graficos", html.Div([
+                # Barras servicio / subactividad
+                html.Div([
+                    graph_pair(key, "bar-servicio-graph-nm", "bar-especialidad-graph-nm")
+                ], style={**CARD_STYLE}),
+                html.Br(),
+                html.Br(),
+                # Diagnósticos
+                html.Div([
+                    dcc.Loading(
+                        html.Div(
+                            dcc.Graph(id=page_id("total-atenciones-graph-nm", key), config=GRAPH_CONFIG,
+                                      style={"height": "320px", "width": "100%"}),
+                            style={"minWidth": "320px"}
+                        ),
+                        type="dot"
+                    ),
+                    html.Div(
+                        id=page_id("total-atenciones-msg-nm", key),
+                        style={"marginTop": "10px", "color": MUTED, "fontFamily": FONT_FAMILY, "fontSize": "12px", "fontWeight": "600"}
+                    )
+                ], style={**CARD_STYLE}),
+                html.Br()
+            ], style={"padding": "8px"})),
+        ]),
+    ], max_width="1700px")
+
+
+def _load(pathname, search):
+    """Devuelve (periodo, df, error) de la variante actual; solo usa la URL."""
+    spec = SPECS[current_page_key()]
+    codcas, periodo, anio, tipo_asegurado = get_codcas_periodo(pathname, search, None, None)
+    if not codcas:
+        return periodo, None, "Sin ruta."
+    if not periodo or not anio:
+        return periodo, None, "Faltan filtros requeridos (asegúrate de tener ?periodo=MM&anio=YYYY o dropdowns con datos)."
+    if create_connection() is None:
+        return periodo, None, "Error de conexión a la base de datos."
+    try:
+        return periodo, read_sql(build_query(spec, anio, periodo, codcas, tipo_asegurado)), None
+    except Exception as e:
+        return periodo, None, f"Error ejecutando consulta: {e}"
+
+
+def _bar(df, dim, title, y_title, fill):
+    fig = top_bar_fig(df, dim, title, "Atenciones", y_title, fill=fill)
+    fig.update_layout(hovermode="y", bargap=0.24, bargroupgap=0.12)
+    return fig
+
+
+@callback(
+    Output(match_id("bar-servicio-graph-nm"), "figure"),
+    Output(match_id("bar-especialidad-graph-nm"), "figure"),
+    Input(match_id("page-url-nm"), "pathname"),
+    Input(match_id("page-url-nm"), "search"),
+)
+def update_barras_inicio(pathname, search):
+    periodo, df, error = _load(pathname, search)
+    if error:
+        return empty_fig("Atenciones por servicio"), empty_fig("Atenciones por subactividad")
+    if df.empty:
+        return (
+            empty_fig(f"Atenciones por servicio - Periodo {periodo}"),
+            empty_fig(f"Atenciones por subactividad - Periodo {periodo}"),
+        )
+    return (
+        _bar(df, "servhosdes", f"Atenciones por servicio - Periodo {periodo}", "Servicio", "Sin servicio"),
+        _bar(df, "actespnom", f"Atenciones por subactividad - Periodo {periodo}", "Servicio", "Sin subactividad"),
+    )
+
+
+@callback(
+    Output(match_id("total-atenciones-graph-nm"), "figure"),
+    Output(match_id("total-atenciones-msg-nm"), "children"),
+    Input(match_id("page-url-nm"), "pathname"),
+    Input(match_id("page-url-nm"), "search"),
+)
+def update_total_atenciones_nm(pathname, search):
+    periodo, df, error = _load(pathname, search)
+    if error:
+        return empty_fig("Atenciones por diagnóstico"), error
+    if df.empty:
+        return (
+            empty_fig(f"Atenciones por diagnóstico - Periodo {periodo}"),
+            f"Sin datos para periodo {periodo}."
+        )
+    fig = _bar(df, "diagdes", f"Atenciones por diagnóstico - Periodo {periodo}", "Diagnóstico", "Sin diagnóstico")
+    top_diag = fill_label(df["diagdes"], "Sin diagnóstico").value_counts().head(10)
+    msg_fig = f"{int(top_diag.sum()):,} atenciones en {top_diag.shape[0]} diagnósticos."
+    return fig, f"{len(df):,} registros procesados | {msg_fig}"
+
+
+@callback(
+    Output(match_id("download-query1-csv-nm"), "data"),
+    Input(match_id("btn-download-query1-nm"), "n_clicks"),
+    State(match_id("page-url-nm"), "pathname"),
+    State(match_id("page-url-nm"), "search"),
+    prevent_initial_call=True
+)
+def descargar_query1_csv(n_clicks, pathname, search):
+    spec = SPECS[current_page_key()]
+    codcas, periodo, anio, _ = get_codcas_periodo(pathname, search, None, None)
+    _, df, error = _load(pathname, search)
+    if error:
+        return None
+    filename = f"{spec.download_name or spec.name}_{codcas}_{anio}_{periodo}.csv"
+    return send_csv(df, filename, encoding="utf-8-sig", sep="|")
@@ -0,0 +1,300 @@
+"""Horas efectivas de consulta externa (total_horas_efectivas y variantes)."""
+import pandas as pd
+from dash import html, dcc, Input, Output, State, no_update
+
+from dash_registry import callback
+from .common import (
+    BRAND, MUTED, FONT_FAMILY, CARD_STYLE,
+    page_id, match_id, current_page_key, get_codcas_periodo, query_store, store_params,
+    read_sql, cached_frame,
+    empty_fig, top_bar_fig, hours_matrix_grid, send_csv,
+    page_header, page_container, section_title, graph_pair, tabs, tab,
+)
+from .row_model import infinite_grid, infinite_options, rows_block, pinned_rows, register_refresh
+
+SOURCE_TABLE = "dwsge.dwe_consulta_externa_horas_efectivas_{anio}_{periodo}"
+DEFAULT_FILTERS = ("ce.cod_actividad = '91'", "ce.cod_variable = '001'")
+TITLE = "Horas efectivas por consulta externa"
+
+GRID_COLUMNS = [
+    {"headerName": "Fecha programada", "field": "fecha_prog", "width": 140},
+    {"headerName": "DNI Médico", "field": "dni_medico", "width": 120},
+    {"headerName": "Servicio", "field": "servicio", "width": 360},
+    {"headerName": "Subactividad", "field": "subactividad"},
+    {"headerName": "Agrupador", "field": "agrupador"},
+    {"headerName": "Especialidad", "field": "especialidad"},
+    {"headerName": "Horas Efectivas", "field": "horas_efectivas", "type": "numericColumn", "valueFormatter": "d3.format(',')(value)"},
+]
+GRID_OPTIONS = infinite_options(animateRows=True)
+
+# Variantes registradas, por `IndicatorSpec.key`
+SPECS = {}
+
+
+def build_query(spec, periodo, anio, codcas):
+    return f"""
+        SELECT
+            ce.dni_medico,
+            c.servhosdes as servicio,
+            ag.agrupador,
+            e.especialidad,
+            a.actespnom as subactividad,
+            ce.fecha_prog,
+            ce.horas_efec_def
+        FROM {SOURCE_TABLE.format(anio=anio, periodo=periodo)} AS ce
+        LEFT JOIN dwsge.sgss_cmsho10 AS c
+            ON ce.cod_servicio = c.servhoscod
+        LEFT JOIN dwsge.dim_especialidad AS e
+            ON ce.cod_especialidad = e.cod_especialidad
+        LEFT JOIN dwsge.sgss_cmace10 AS a
+            ON ce.cod_actividad = a.actcod
+            AND ce.cod_subactividad = a.actespcod
+        LEFT JOIN dwsge.sgss_cmact10 AS am
+            ON ce.cod_actividad = am.actcod
+        LEFT JOIN dwsge.sgss_cmcas10 AS ca
+            ON ce.cod_oricentro = ca.oricenasicod
+            AND ce.cod_centro = ca.cenasicod
+        LEFT JOIN dwsge.dim_agrupador AS ag ON ce.cod_agrupador = ag.cod_agrupador
+        WHERE ce.cod_centro = '{codcas}'
+        AND {spec.where(DEFAULT_FILTERS, indent="        ")};
+"""
+
+
+def build_layout(spec):
+    key = spec.key
+    return page_container([
+        dcc.Location(id=page_id("he-page-url", key), refresh=False),
+        page_header(key, "bi-clock-history", spec.title or TITLE,
+                    "⏱️ Distribución y resumen de horas efectivas del periodo seleccionado",
+                    "he-download-btn", "he-download"),
+        tabs(key, "he-main-tabs", "tab-graficos", [
+            tab("Horas efectivas", "tab-graficos", html.Div([
+                html.Div([
+                    graph_pair(key, "he-servicio-graph", "he-subactividad-graph", height="340px")
+                ], style={**CARD_STYLE}),
+                html.Div([
+                    graph_pair(key, "he-agrupador-graph", "he-especialidad-graph", height="340px"),
+                    html.Div(
+                        id=page_id("he-total-msg", key),
+                        style={"marginTop": "10px", "color": MUTED, "fontFamily": FONT_FAMILY, "fontSize": "12px", "fontWeight": "600"}
+                    )
+                ], style={**CARD_STYLE}),
+                # Matriz antes de la tabla
+                html.Div([
+                    section_title("bi-grid-3x3", "Matriz de horas efectivas por día"),
+                    dcc.Loading(
+                        html.Div(id=page_id("he-matriz-wrapper", key), style={"marginTop": "12px"}),
+                        type="dot"
+                    )
+                ], style={**CARD_STYLE, "marginTop": "12px"}),
+                html.Div([
+                    html.H5("Resumen horas efectivas",
+                            style={"color": BRAND, "fontFamily": FONT_FAMILY, "fontWeight": 700,
+                                   "marginBottom": "12px", "letterSpacing": "-0.2px"}),
+                    # Filas por bloques desde `grid_bloque`
+                    infinite_grid(
+                        page_id("he-grid", key),
+                        GRID_COLUMNS,
+                        grid_options=_grid_options(0),
+                        default_col_def={
+                            "resizable": True,
+                            "sortable": True,
+                            "filter": True,
+                            "floatingFilter": True
+                        },
+                        style={"height": "420px", "width": "100%"},
+                    ),
+                    html.Div(id=page_id("he-tornado-msg", key),
+                             style={"marginTop": "6px", "color": MUTED, "fontFamily": FONT_FAMILY,
+                                    "fontSize": "12px", "fontWeight": "bold"})
+                ], style={**CARD_STYLE, "marginTop": "12px"})
+            ], style={"padding": "8px"})),
+        ]),
+        # Token firmado + anio/periodo (`query_store`); los datos quedan en la caché del servidor
+        dcc.Store(id=page_id("he-store-data", key))
+    ])
+
+
+def _total_row(total):
+    return [{
+        "fecha_prog": "",
+        "dni_medico": "",
+        "servicio": "TOTAL",
+        "subactividad": "",
+        "agrupador": "",
+        "especialidad": "",
+        "horas_efectivas": int(total)
+    }]
+
+
+def _grid_options(total):
+    return {**GRID_OPTIONS, "pinnedBottomRowData": _total_row(total)}
+
+
+def _frame(data):
+    df = pd.DataFrame(data)
+    # float64 desde read_sql (frame_schema); solo faltan los nulos
+    df["horas_efec_def"] = df["horas_efec_def"].fillna(0)
+    return df
+
+
+def _store_query(data):
+    """Consulta de `he-store-data`, o None si el store no es válido."""
+    params = store_params(data)
+    if params is None:
+        return None
+    codcas, periodo, anio = params
+    return build_query(SPECS[current_page_key()], periodo, anio, codcas)
+
+
+def _query_frame(query):
+    return _frame(read_sql(query))
+
+
+@callback(
+    Output(match_id("he-store-data"), "data"),
+    Input(match_id("he-page-url"), "pathname"),
+    Input(match_id("he-page-url"), "search"),
+    State("filter-periodo", "value"),
+    State("filter-anio", "value"),
+    prevent_initial_call=True
+)
+def load_data(pathname, search, periodo_dropdown, anio_dropdown):
+    spec = SPECS[current_page_key()]
+    codcas, periodo, anio, _ = get_codcas_periodo(pathname, search, periodo_dropdown, anio_dropdown)
+    if not codcas or not periodo or not anio:
+        return None
+    try:
+        df = read_sql(build_query(spec, periodo, anio, codcas))
+        if df.empty:
+            return None
+        return query_store(pathname, periodo, anio)
+    except Exception as e:
+        print(f"Query error: {e}")
+        return None
+
+
+def _bar(df, dim, title, y_title, total_global):
+    return top_bar_fig(df, dim, title, "Horas efectivas", y_title, value="horas_efec_def", height=340,
+                       hover_label="Horas efectivas", with_pct=True, share_of=total_global)
+
+
+@callback(
+    Output(match_id("he-servicio-graph"), "figure"),
+    Output(match_id("he-subactividad-graph"), "figure"),
+    Input(match_id("he-store-data"), "data")
+)
+def update_figs(data):
+    query = _store_query(data)
+    if query is None:
+        return empty_fig("Horas Efectivas por Servicio"), empty_fig("Horas Efectivas por Subactividad")
+    df = _query_frame(query)
+    total_global = float(df["horas_efec_def"].sum()) or 0.0
+    return (
+        _bar(df, "servicio", "Horas Efectivas por Servicio", "Servicio", total_global),
+        _bar(df, "subactividad", "Horas Efectivas por Subactividad", "Subactividad", total_global),
+    )
+
+
+@callback(
+    Output(match_id("he-agrupador-graph"), "figure"),
+    Output(match_id("he-especialidad-graph"), "figure"),
+    Input(match_id("he-store-data"), "data")
+)
+def update_second_figs(data):
+    query = _store_query(data)
+    if query is None:
+        return empty_fig("Horas Efectivas por Agrupador"), empty_fig("Horas Efectivas por Especialidad")
+    df = _query_frame(query)
+    total_global = float(df["horas_efec_def"].sum()) or 0.0
+    return (
+        _bar(df, "agrupador", "Horas Efectivas por Agrupador", "Agrupador", total_global),
+        _bar(df, "especialidad", "Horas Efectivas por Especialidad", "Especialidad", total_global),
+    )
+
+
+@callback(
+    Output(match_id("he-matriz-wrapper"), "children"),
+    Input(match_id("he-store-data"), "data")
+)
+def build_matriz_horas(data):
+    query = _store_query(data)
+    df = _query_frame(query) if query is not None else None
+    return hours_matrix_grid(df, "horas_efec_def", "fecha_prog",
+                             page_id("he-matriz-grid", current_page_key()),
+                             "Sin datos de horas efectivas.")
+
+
+def _detalle(query):
+    df = _query_frame(query)[["fecha_prog", "dni_medico", "servicio", "subactividad", "agrupador", "especialidad", "horas_efec_def"]]
+    return df.assign(
+        fecha_prog=pd.to_datetime(df["fecha_prog"], errors="coerce").dt.strftime("%Y-%m-%d").fillna("Sin fecha"),
+        dni_medico=df["dni_medico"].fillna("Sin DNI"),
+    ).rename(columns={"horas_efec_def": "horas_efectivas"})
+
+
+def _grid_frame(query):
+    def build():
+        df = _detalle(query)
+        df["horas_efectivas"] = df["horas_efectivas"].round(0).astype(int)
+        return df
+    return cached_frame(("he-grid", query), build)
+
+
+@callback(
+    Output(match_id("he-grid"), "getRowsResponse"),
+    Input(match_id("he-grid"), "getRowsRequest"),
+    State(match_id("he-store-data"), "data"),
+    prevent_initial_call=True
+)
+def grid_bloque(request, data):
+    if not request:
+        return no_update
+    query = _store_query(data)
+    if query is None:
+        return {"rowData": [], "rowCount": 0}
+    return rows_block(_grid_frame(query), request)
+
+
+@callback(
+    Output(match_id("he-grid"), "dashGridOptions"),
+    Input(match_id("he-store-data"), "data"),
+    prevent_initial_call=True
+)
+def grid_total(data):
+    query = _store_query(data)
+    if query is None:
+        return pinned_rows(_total_row(0))
+    # Total del periodo (sin filtros ni redondeo por fila)
+    return pinned_rows(_total_row(_query_frame(query)["horas_efec_def"].sum()))
+
+
+register_refresh("he-grid", ("he-store-data", "data"))
+
+
+@callback(
+    Output(match_id("he-download"), "data"),
+    Input(match_id("he-download-btn"), "n_clicks"),
+    State(match_id("he-store-data"), "data"),
+    prevent_initial_call=True
+)
+def download_csv(n_clicks, data):
+    params = store_params(data)
+    if not n_clicks or params is None:
+        return None
+    spec = SPECS[current_page_key()]
+    codcas, periodo, anio = params
+
+    df = _detalle(build_query(spec, periodo, anio, codcas)).rename(columns={
+        "fecha_prog": "Fecha Programada",
+        "dni_medico": "DNI Médico",
+        "servicio": "Servicio",
+        "subactividad": "Subactividad",
+        "agrupador": "Agrupador",
+        "especialidad": "Especialidad",
+        "horas_efectivas": "Horas Efectivas"
+    })
+    df["Horas Efectivas"] = df["Horas Efectivas"].round(0).astype(int)
+
+    filename = f"{spec.download_name or spec.name}_{codcas}_{periodo}.csv"
+    return send_csv(df, filename)
@@ -0,0 +1,317 @@
+"""Horas programadas de consulta externa (total_horas_programadas y variantes)."""
+import pandas as pd
+from dash import html, dcc, Input, Output, State, no_update
+
+from dash_registry import callback
+from .common import (
+    BRAND, FONT_FAMILY, CARD_STYLE,
+    page_id, match_id, current_page_key, get_codcas_periodo, query_store, store_params,
+    read_sql, cached_frame, fill_label,
+    empty_fig, top_bar_fig, hours_matrix_grid, send_csv,
+    page_header, page_container, section_title, graph_pair, tabs, tab,
+)
+from .row_model import (
+    infinite_grid, infinite_options, rows_block, filter_frame, pinned_rows, register_refresh
+)
+
+SOURCE_TABLE = "dwsge.dwe_consulta_externa_programacion_{anio}_{periodo}"
+DEFAULT_FILTERS = ("ce.cod_actividad = '91'", "ce.cod_variable = '001'")
+TITLE = "Horas programadas por consulta externa"
+
+TABLE_COLUMNS = [
+    {"headerName": "Fecha programada", "field": "fecha_prog", "width": 140},
+    {"headerName": "DNI Médico", "field": "dni_medico"},
+    {"headerName": "Servicio", "field": "descripcion_servicio", "width": 360},
+    {"headerName": "Subactividad", "field": "detalle_subactividad", "width": 360},
+    {"headerName": "Agrupador", "field": "agrupador"},
+    {"headerName": "Especialidad", "field": "descripcion_especialidad"},
+    {"headerName": "Total horas programadas", "field": "total_horas", "filter": "agNumberColumnFilter"}
+]
+TABLE_GROUP = [
+    "fecha_prog", "descripcion_servicio", "detalle_subactividad", "agrupador",
+    "descripcion_especialidad", "cod_tipdoc_medico", "dni_medico"
+]
+TABLE_GRID_OPTIONS = infinite_options(
+    onFirstDataRendered={"function": "params.api.autoSizeAllColumns();"}
+)
+TABLE_FILL = {
+    "descripcion_servicio": "Sin servicio",
+    "detalle_subactividad": "Sin subactividad",
+    "agrupador": "Sin agrupador",
+    "descripcion_especialidad": "Sin especialidad",
+    "cod_tipdoc_medico": "Sin tipo doc",
+    "dni_medico": "Sin DNI",
+}
+
+# Variantes registradas, por `IndicatorSpec.key`
+SPECS = {}
+
+
+def build_query(spec, periodo, anio, codcas):
+    return f"""
+    SELECT
+        ce.cod_servicio,
+        ce.cod_especialidad,
+        ca.cenasides,
+        ce.cod_tipdoc_medico,
+        ce.dni_medico,
+        am.actdes AS actividad,
+        ag.agrupador AS agrupador,
+        a.actespnom AS detalle_subactividad,
+        c.servhosdes AS descripcion_servicio,
+        e.especialidad AS descripcion_especialidad,
+        ce.total_horas,
+        ce.fecha_prog
+    FROM {SOURCE_TABLE.format(anio=anio, periodo=periodo)} ce
+    LEFT JOIN dwsge.sgss_cmsho10 AS c ON ce.cod_servicio = c.servhoscod
+    LEFT JOIN dwsge.dim_especialidad AS e ON ce.cod_especialidad = e.cod_especialidad
+    LEFT JOIN dwsge.sgss_cmace10 AS a ON ce.cod_actividad = a.actcod AND ce.cod_subactividad = a.actespcod
+    LEFT JOIN dwsge.sgss_cmact10 AS am ON ce.cod_actividad = am.actcod
+    LEFT JOIN dwsge.sgss_cmcas10 AS ca ON ce.cod_oricentro = ca.oricenasicod AND ce.cod_centro = ca.cenasicod
+    LEFT JOIN dwsge.dim_agrupador AS ag ON ce.cod_agrupador = ag.cod_agrupador
+    WHERE ce.cod_centro = '{codcas}'
+        AND (
+            ce.cod_motivo_suspension IS NULL
+            OR ce.cod_motivo_suspension NOT IN ('04','09','10','99','13','16','11')
+        )
+      AND {spec.where(DEFAULT_FILTERS, indent="      ")}
+    """
+
+
+def build_layout(spec):
+    key = spec.key
+    return page_container([
+        dcc.Location(id=page_id("hp-page-url", key), refresh=False),
+        page_header(key, "bi-calendar-check", spec.title or TITLE,
+                    "📅 Distribución y resumen de horas programadas del periodo seleccionado",
+                    "hp-download-btn", "hp-download"),
+        tabs(key, "hp-main-tabs", "tab-graficos", [
+            tab("Horas programadas", "tab-graficos", html.Div([
+                html.Div([
+                    graph_pair(key, "hp-graph-servicio", "hp-graph-subactividad", height="380px")
+                ], style={**CARD_STYLE}),
+                html.Div([
+                    graph_pair(key, "hp-graph-agrupador", "hp-graph-especialidad", height="320px")
+                ], style={**CARD_STYLE, "marginTop": "12px"}),
+                # Matriz antes de la tabla
+                html.Div([
+                    section_title("bi-grid-3x3-gap", "Matriz de horas programadas por día"),
+                    dcc.Loading(
+                        html.Div(id=page_id("hp-matriz-wrapper", key), style={"marginTop": "12px"}),
+                        type="dot"
+                    )
+                ], style={**CARD_STYLE, "marginTop": "12px"}),
+                html.Div([
+                    html.H5("Resumen horas programadas",
+                            style={"color": BRAND, "fontFamily": FONT_FAMILY, "fontWeight": 700,
+                                   "marginBottom": "12px", "letterSpacing": "-0.2px"}),
+                    # Filas por bloques desde `tabla_horas_bloque`
+                    infinite_grid(
+                        page_id("hp-tabla-horas-programadas", key),
+                        TABLE_COLUMNS,
+                        grid_options=_table_options(0, False),
+                        style={"height": "430px", "width": "100%"},
+                    ),
+                ], style={**CARD_STYLE, "marginTop": "12px"})
+            ], style={"padding": "8px"})),
+        ]),
+        # Token firmado + anio/periodo (`query_store`); los datos quedan en la caché del servidor
+        dcc.Store(id=page_id("hp-store-data", key))
+    ])
+
+
+def _total_row(total, filtered):
+    label = "Total horas filtradas" if filtered else "Total horas"
+    return [{
+        "fecha_prog": "",
+        "descripcion_servicio": f"{label}: {total:,.2f}",
+        "total_horas": total
+    }]
+
+
+def _table_options(total, filtered):
+    return {**TABLE_GRID_OPTIONS, "pinnedBottomRowData": _total_row(total, filtered)}
+
+
+def _frame(data):
+    df = pd.DataFrame(data)
+    # float64 desde read_sql (frame_schema); solo faltan los nulos
+    df["total_horas"] = df["total_horas"].fillna(0)
+    return df
+
+
+def _load(pathname, search, periodo_dropdown, anio_dropdown):
+    spec = SPECS[current_page_key()]
+    codcas, periodo, anio, _ = get_codcas_periodo(pathname or "", search or "", periodo_dropdown, anio_dropdown)
+    if not codcas or not periodo or not anio:
+        return None, None
+    return spec, (codcas, periodo, anio)
+
+
+def _store_query(data):
+    """Consulta de `hp-store-data`, o None si el store no es válido."""
+    params = store_params(data)
+    if params is None:
+        return None
+    codcas, periodo, anio = params
+    return build_query(SPECS[current_page_key()], periodo, anio, codcas)
+
+
+def _query_frame(query):
+    return _frame(read_sql(query))
+
+
+@callback(
+    Output(match_id("hp-store-data"), "data"),
+    Input(match_id("hp-page-url"), "pathname"),
+    Input(match_id("hp-page-url"), "search"),
+    State("filter-periodo", "value"),
+    State("filter-anio", "value"),
+    prevent_initial_call=False,
+)
+def load_data_to_store(pathname, search, periodo_dropdown, anio_dropdown):
+    spec, params = _load(pathname, search, periodo_dropdown, anio_dropdown)
+    if params is None:
+        return None
+    codcas, periodo, anio = params
+    try:
+        df = read_sql(build_query(spec, periodo, anio, codcas))
+    except Exception as e:
+        print(f"Error ejecutando consulta horas programadas: {e}")
+        return None
+
+    if df.empty:
+        return None
+    return query_store(pathname, periodo, anio)
+
+
+def _bar(df, dim, title, height, total_all, fill=None):
+    return top_bar_fig(df, dim, title, "Total horas", value="total_horas", height=height,
+                       hover_label="Total horas", share_of=total_all, fill=fill)
+
+
+@callback(
+    Output(match_id("hp-graph-servicio"), "figure"),
+    Output(match_id("hp-graph-subactividad"), "figure"),
+    Input(match_id("hp-store-data"), "data"),
+)
+def update_graficos_primer_bloque(data):
+    query = _store_query(data)
+    if query is None:
+        return (
+            empty_fig("Horas programadas por servicio"),
+            empty_fig("Horas programadas por subactividad"),
+        )
+    df = _query_frame(query)
+    total_all = float(df["total_horas"].sum())
+    return (
+        _bar(df, "descripcion_servicio", "Horas programadas por servicio", 380, total_all),
+        _bar(df, "detalle_subactividad", "Horas programadas por subactividad", 380, total_all),
+    )
+
+
+@callback(
+    Output(match_id("hp-graph-agrupador"), "figure"),
+    Output(match_id("hp-graph-especialidad"), "figure"),
+    Input(match_id("hp-store-data"), "data"),
+)
+def update_graficos_segundo_bloque(data):
+    query = _store_query(data)
+    if query is None:
+        return empty_fig("Horas programadas por agrupador"), empty_fig("Horas programadas por especialidad")
+    df = _query_frame(query)
+    total_all = float(df["total_horas"].sum()) or 0.0
+    return (
+        _bar(df, "agrupador", "Horas programadas por agrupador", 320, total_all, fill="Sin agrupador"),
+        _bar(df, "descripcion_especialidad", "Horas programadas por especialidad", 320, total_all,
+             fill="Sin especialidad"),
+    )
+
+
+@callback(
+    Output(match_id("hp-matriz-wrapper"), "children"),
+    Input(match_id("hp-store-data"), "data"),
+)
+def build_matriz_horas(data):
+    query = _store_query(data)
+    df = _query_frame(query) if query is not None else None
+    return hours_matrix_grid(df, "total_horas", "fecha_prog",
+                             page_id("hp-matriz-grid", current_page_key()),
+                             "Sin datos de horas programadas.")
+
+
+def _table_frame(query):
+    def build():
+        df = _query_frame(query)
+        df = df.assign(
+            fecha_prog=pd.to_datetime(df["fecha_prog"], errors="coerce").dt.strftime("%Y-%m-%d").fillna("Sin fecha"),
+            **{col: fill_label(df[col], fill, blanks=True) for col, fill in TABLE_FILL.items()}
+        )
+        return (
+            df.groupby(TABLE_GROUP, as_index=False, observed=True)["total_horas"].sum()
+              .sort_values("total_horas", ascending=False)
+              .reset_index(drop=True)
+        )
+    return cached_frame(("hp-table", query), build)
+
+
+# Bloque de filas
+@callback(
+    Output(match_id("hp-tabla-horas-programadas"), "getRowsResponse"),
+    Input(match_id("hp-tabla-horas-programadas"), "getRowsRequest"),
+    State(match_id("hp-store-data"), "data"),
+    prevent_initial_call=True
+)
+def tabla_horas_bloque(request, data):
+    if not request:
+        return no_update
+    query = _store_query(data)
+    if query is None:
+        return {"rowData": [], "rowCount": 0}
+    return rows_block(_table_frame(query), request)
+
+
+# Total dinámico en fila inferior: mismos filtros que la grilla
+@callback(
+    Output(match_id("hp-tabla-horas-programadas"), "dashGridOptions"),
+    Input(match_id("hp-store-data"), "data"),
+    Input(match_id("hp-tabla-horas-programadas"), "filterModel"),
+    prevent_initial_call=True
+)
+def tabla_horas_total(data, filter_model):
+    query = _store_query(data)
+    if query is None:
+        return pinned_rows(_total_row(0, False))
+    filtered = filter_frame(_table_frame(query), filter_model)
+    total = float(filtered["total_horas"].sum())
+    return pinned_rows(_total_row(total, bool(filter_model)))
+
+
+register_refresh("hp-tabla-horas-programadas", ("hp-store-data", "data"))
+
+
+@callback(
+    Output(match_id("hp-download"), "data"),
+    Input(match_id("hp-download-btn"), "n_clicks"),
+    State(match_id("hp-page-url"), "pathname"),
+    State(match_id("hp-page-url"), "search"),
+    State("filter-periodo", "value"),
+    State("filter-anio", "value"),
+    prevent_initial_call=True
+)
+def hp_descargar_csv(n_clicks, pathname, search, periodo_dropdown, anio_dropdown):
+    if not n_clicks:
+        return None
+    spec, params = _load(pathname, search, periodo_dropdown, anio_dropdown)
+    if params is None:
+        return None
+    codcas, periodo, anio = params
+    try:
+        # Misma consulta que la página: normalmente sale de la caché
+        df = read_sql(build_query(spec, periodo, anio, codcas))
+    except Exception:
+        return None
+    if df.empty:
+        return None
+    filename = f"{spec.download_name or spec.name}_{codcas}_{anio}_{periodo}.csv"
+    return send_csv(df, filename, encoding="utf-8-sig", sep="|")
@@ -0,0 +1,351 @@
+"""Producción por médico (total_medicos y variantes)."""
+import dash_ag_grid as dag
+from dash import html, dcc, Input, Output, State, no_update
+
+from dash_registry import callback
+from .common import (
+    MUTED, FONT_FAMILY, CARD_STYLE, ERROR_STYLE,
+    page_id, match_id, current_page_key, get_codcas_periodo, tipo_asegurado_sql,
+    create_connection, read_sql, cached_frame, format_fecha, send_csv,
+    page_header, page_container, section_title, tabs, tab,
+)
+from .row_model import (
+    infinite_grid, infinite_options, rows_block, filter_frame, pinned_rows, register_refresh
+)
+
+SOURCE_TABLE = "dwsge.dw_consulta_externa_homologacion_{anio}_{periodo}"
+DEFAULT_FILTERS = ("ce.cod_actividad = '91'", "ce.cod_variable = '001'")
+TITLE = "Detalle de producción médica"
+DOWNLOAD_NAME = "total_atenciones"
+
+TABLE_COLUMNS = [
+    {"headerName": "DNI Médico", "field": "dni_medico", "minWidth": 120},
+    {"headerName": "Fecha atención", "field": "fecha_atencion", "minWidth": 140},
+    {"headerName": "Servicio", "field": "descripcion_servicio", "minWidth": 350, "flex": 2},
+    {"headerName": "Atenciones", "field": "Atenciones", "filter": "agNumberColumnFilter", "minWidth": 130}
+]
+TABLE_GRID_OPTIONS = infinite_options(
+    onFirstDataRendered={"function": "params.api.autoSizeAllColumns();"}
+)
+
+DOWNLOAD_COLUMNS = """
+            ce.cod_servicio,
+            ce.cod_especialidad,
+            ca.cenasides,
+            am.actdes AS actividad,
+            ag.agrupador AS agrupador,
+            a.actespnom AS subactividad,
+            ce.cod_tipo_consulta,
+            ce.cod_diag,
+            c.servhosdes AS descripcion_servicio,
+            e.especialidad AS descripcion_especialidad,
+            t.tipcondes AS descripcion_tipo_consulta,
+            d.diagdes AS descripcion_diagnostico,
+            dni_medico,
+            doc_paciente,
+            cod_tipdoc_paciente,
+            sexo,
+            fecha_atencion,
+            acto_med"""
+
+# Variantes registradas, por `IndicatorSpec.key`
+SPECS = {}
+
+
+def _where(spec, codcas, tipo_asegurado):
+    return f"""WHERE ce.cod_centro = '{codcas}'
+          AND ce.clasificacion in (2,4,6)
+          AND {spec.where(DEFAULT_FILTERS)}
+          AND {tipo_asegurado_sql(tipo_asegurado)}"""
+
+
+def build_query(spec, anio, periodo, codcas, tipo_asegurado):
+    # La tabla y la matriz usan la misma consulta: la caché la ejecuta una vez
+    return f"""
+        SELECT c.servhosdes AS descripcion_servicio,
+               ce.dni_medico,
+               ce.fecha_atencion
+        FROM {SOURCE_TABLE.format(anio=anio, periodo=periodo)} AS ce
+        LEFT JOIN dwsge.sgss_cmsho10 AS c ON ce.cod_servicio = c.servhoscod
+        {_where(spec, codcas, tipo_asegurado)}
+    """
+
+
+def build_download_query(spec, anio, periodo, codcas, tipo_asegurado):
+    return f"""
+        SELECT {DOWNLOAD_COLUMNS}
+        FROM {SOURCE_TABLE.format(anio=anio, periodo=periodo)} AS ce
+        LEFT JOIN dwsge.sgss_cmsho10 AS c ON ce.cod_servicio = c.servhoscod
+        LEFT JOIN dwsge.dim_especialidad AS e ON ce.cod_especialidad = e.cod_especialidad
+        LEFT JOIN dwsge.sgss_cmtco10 AS t ON ce.cod_tipo_consulta = t.tipconcod
+        LEFT JOIN dwsge.sgss_cmdia10 AS d ON ce.cod_diag = d.diagcod
+        LEFT JOIN dwsge.sgss_cmace10 AS a ON ce.cod_actividad = a.actcod AND ce.cod_subactividad = a.actespcod
+        LEFT JOIN dwsge.sgss_cmact10 AS am ON ce.cod_actividad = am.actcod
+        LEFT JOIN dwsge.sgss_cmcas10 AS ca ON ce.cod_oricentro = ca.oricenasicod AND ce.cod_centro = ca.cenasicod
+        LEFT JOIN dwsge.dim_agrupador as ag ON ce.cod_agrupador = ag.cod_agrupador
+        {_where(spec, codcas, tipo_asegurado)}
+    """
+
+
+def build_layout(spec):
+    key = spec.key
+    return page_container([
+        dcc.Location(id=page_id("tm-location", key), refresh=False),
+        page_header(key, "bi-clipboard2-heart", spec.title or TITLE,
+                    "📊 Tabla de atenciones por médico para el periodo seleccionado",
+                    "tm-download-btn", "tm-download"),
+        tabs(key, "tm-tabs", "tm-tab-prod", [
+            tab("Producción", "tm-tab-prod", html.Div([
+                html.Div([
+                    section_title("bi-calendar-week", "Matriz de Atenciones por Día"),
+                    html.Div(id=page_id("tm-matriz-wrapper", key), style={"marginTop": "12px"})
+                ], style={**CARD_STYLE}),
+                html.Div([
+                    html.Div(
+                        id=page_id("tm-msg", key),
+                        style={"marginTop": "6px", "color": MUTED, "fontFamily": FONT_FAMILY, "fontSize": "12px", "fontWeight": "bold"}
+                    ),
+                    html.Div(id=page_id("tm-table-wrapper", key), style={"marginTop": "12px"})
+                ], style={**CARD_STYLE})
+            ], style={"padding": "8px", "display": "flex", "flexDirection": "column", "gap": "12px"}))
+        ]),
+    ])
+
+
+def _query(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown):
+    """Devuelve (consulta, None) o (None, mensaje de error) para la variante actual."""
+    spec = SPECS[current_page_key()]
+    codcas, periodo, anio, tipo_asegurado = get_codcas_periodo(
+        pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown
+    )
+    if not codcas:
+        return None, "Sin ruta."
+    if not periodo or not anio:
+        return None, "Faltan filtros (periodo/año)."
+    if create_connection() is None:
+        return None, "Error de conexión a la base de datos."
+    return build_query(spec, anio, periodo, codcas, tipo_asegurado), None
+
+
+def _load(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown):
+    """Devuelve (df, None) o (None, mensaje de error) para la variante actual."""
+    query, error = _query(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown)
+    if error:
+        return None, error
+    try:
+        return read_sql(query), None
+    except Exception as e:
+        return None, f"Error consulta: {e}"
+
+
+def _table_frame(query):
+    """Atenciones por servicio/médico/día; la grilla la pagina por bloques."""
+    def build():
+        df = read_sql(query)
+        return (
+            df.assign(
+                descripcion_servicio=df["descripcion_servicio"].fillna("Sin servicio"),
+                dni_medico=df["dni_medico"].fillna("Sin DNI"),
+                fecha_atencion=format_fecha(df["fecha_atencion"])
+            )
+            .groupby(["descripcion_servicio", "dni_medico", "fecha_atencion"])
+            .size().reset_index(name="Atenciones")
+            .sort_values("Atenciones", ascending=False)
+            .reset_index(drop=True)
+        )
+    return cached_frame(("tm-table", query), build)
+
+
+def _pinned_total(total_att):
+    return [{
+        "descripcion_servicio": f"Total atenciones: {total_att:,}",
+        "fecha_atencion": "",
+        "Atenciones": total_att
+    }]
+
+
+@callback(
+    Output(match_id("tm-table-wrapper"), "children"),
+    Input(match_id("tm-location"), "pathname"),
+    Input(match_id("tm-location"), "search"),
+    State("filter-periodo", "value"),
+    State("filter-anio", "value"),
+    State("filter-tipo-asegurado", "value"),
+)
+def update_tabla_medicos(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown):
+    query, error = _query(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown)
+    if error:
+        return html.Div(error, style=ERROR_STYLE)
+    try:
+        prod_med_df = _table_frame(query)
+    except Exception as e:
+        return html.Div(f"Error consulta: {e}", style=ERROR_STYLE)
+    if prod_med_df.empty:
+        return html.Div("Sin datos producción por médico.", style=ERROR_STYLE)
+    total_att = int(prod_med_df["Atenciones"].sum())
+    # Filas por bloques desde `tm_tabla_bloque`
+    return infinite_grid(
+        page_id("tm-table-grid", current_page_key()),
+        TABLE_COLUMNS,
+        grid_options={**TABLE_GRID_OPTIONS, "pinnedBottomRowData": _pinned_total(total_att)},
+        default_col_def={
+            "sortable": True,
+            "resizable": True,
+            "filter": "agTextColumnFilter",
+            "floatingFilter": True,
+            "flex": 1
+        },
+        style={"height": "750px", "width": "100%"}
+    )
+
+
+# Bloque de filas
+@callback(
+    Output(match_id("tm-table-grid"), "getRowsResponse"),
+    Input(match_id("tm-table-grid"), "getRowsRequest"),
+    State(match_id("tm-location"), "pathname"),
+    State(match_id("tm-location"), "search"),
+    State("filter-periodo", "value"),
+    State("filter-anio", "value"),
+    State("filter-tipo-asegurado", "value"),
+    prevent_initial_call=True
+)
+def tm_tabla_bloque(request, pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown):
+    if not request:
+        return no_update
+    query, error = _query(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown)
+    if error:
+        return {"rowData": [], "rowCount": 0}
+    return rows_block(_table_frame(query), request)
+
+
+# Total dinámico (suma Atenciones filtradas); el inicial viene en la grilla
+@callback(
+    Output(match_id("tm-table-grid"), "dashGridOptions"),
+    Input(match_id("tm-table-grid"), "filterModel"),
+    State(match_id("tm-location"), "pathname"),
+    State(match_id("tm-location"), "search"),
+    State("filter-periodo", "value"),
+    State("filter-anio", "value"),
+    State("filter-tipo-asegurado", "value"),
+    prevent_initial_call=True
+)
+def tm_tabla_total(filter_model, pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown):
+    query, error = _query(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown)
+    if error:
+        return no_update
+    filtered = filter_frame(_table_frame(query), filter_model)
+    return pinned_rows(_pinned_total(int(filtered["Atenciones"].sum())))
+
+
+register_refresh("tm-table-grid", ("tm-location", "pathname"), ("tm-location", "search"))
+
+
+@callback(
+    Output(match_id("tm-matriz-wrapper"), "children"),
+    Input(match_id("tm-location"), "pathname"),
+    Input(match_id("tm-location"), "search"),
+    State("filter-periodo", "value"),
+    State("filter-anio", "value"),
+    State("filter-tipo-asegurado", "value"),
+)
+def update_matriz_medicos(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown):
+    df, error = _load(pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown)
+    if error:
+        return html.Div(error, style=ERROR_STYLE)
+    if df.empty:
+        return html.Div("Sin datos de atenciones.", style=ERROR_STYLE)
+
+    df = df.assign(
+        dni_medico=df["dni_medico"].fillna("Sin DNI"),
+        fecha_atencion=format_fecha(df["fecha_atencion"])
+    )
+    # Filtrar fechas válidas (excluir "Sin fecha")
+    df_valid = df[df["fecha_atencion"] != "Sin fecha"]
+    if df_valid.empty:
+        return html.Div("No hay fechas válidas en los datos.", style=ERROR_STYLE)
+
+    # DNI en filas, fechas en columnas, conteo de atenciones
+    pivot_df = df_valid.groupby(["dni_medico", "fecha_atencion"]).size().unstack(fill_value=0)
+    pivot_df = pivot_df.reindex(sorted(pivot_df.columns), axis=1)
+    pivot_df["Total"] = pivot_df.sum(axis=1)
+    pivot_df = pivot_df.sort_values("Total", ascending=False).reset_index()
+
+    col_defs = [
+        {
+            "headerName": "DNI Médico",
+            "field": "dni_medico",
+            "pinned": "left",
+            "minWidth": 120,
+            "cellStyle": {"fontWeight": "bold", "backgroundColor": "#f8f9fa"}
+        }
+    ]
+    for fecha in sorted(col for col in pivot_df.columns if col not in ["dni_medico", "Total"]):
+        col_defs.append({
+            "headerName": fecha,
+            "field": fecha,
+            "filter": "agNumberColumnFilter",
+            "minWidth": 100,
+            "cellStyle": {
+                "function": "params.value > 0 ? {'backgroundColor': '#ECF5FB', 'fontWeight': '600'} : {}"
+            }
+        })
+    col_defs.append({
+        "headerName": "Total",
+        "field": "Total",
+        "pinned": "right",
+        "filter": "agNumberColumnFilter",
+        "minWidth": 100,
+        "cellStyle": {"fontWeight": "bold", "backgroundColor": "#7FB9DE"}
+    })
+
+    total_row = {"dni_medico": "TOTAL"}
+    for col in pivot_df.columns:
+        if col != "dni_medico":
+            total_row[col] = int(pivot_df[col].sum())
+
+    return dag.AgGrid(
+        id=page_id("tm-matriz-grid", current_page_key()),
+        columnDefs=col_defs,
+        rowData=pivot_df.to_dict("records"),
+        defaultColDef={
+            "sortable": True,
+            "resizable": True,
+            "filter": True,
+            "floatingFilter": False,
+            "flex": 0
+        },
+        dashGridOptions={
+            "pinnedBottomRowData": [total_row],
+            "onFirstDataRendered": {"function": "params.api.autoSizeAllColumns();"}
+        },
+        className="ag-theme-alpine",
+        style={"height": "700px", "width": "100%"}
+    )
+
+
+@callback(
+    Output(match_id("tm-download"), "data"),
+    Input(match_id("tm-download-btn"), "n_clicks"),
+    State(match_id("tm-location"), "pathname"),
+    State(match_id("tm-location"), "search"),
+    State("filter-periodo", "value"),
+    State("filter-anio", "value"),
+    State("filter-tipo-asegurado", "value"),
+    prevent_initial_call=True
+)
+def tm_descargar_csv(n_clicks, pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown):
+    if not n_clicks:
+        return None
+    spec = SPECS[current_page_key()]
+    codcas, periodo, anio, tipo_asegurado = get_codcas_periodo(
+        pathname, search, periodo_dropdown, anio_dropdown, tipo_dropdown
+    )
+    if not codcas or not periodo or not anio:
+        return None
+    try:
+        df = read_sql(build_download_query(spec, anio, periodo, codcas, tipo_asegurado), cache=False)
+    except Exception:
+        return None
+    filename = f"{spec.download_name or DOWNLOAD_NAME}_{codcas}_{anio}_{periodo}.csv"
+    return send_csv(df, filename, encoding="utf-8-sig", sep="|")
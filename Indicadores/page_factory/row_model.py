@@ -0,0 +1,197 @@
+"""Modelo de filas "infinite" de AgGrid servido desde frames en caché.
+
+La grilla solo pide bloques (`getRowsRequest`: startRow, endRow, sortModel,
+filterModel) y el callback de la página responde con `rows_block` sobre un
+DataFrame de `cached_frame`; el navegador nunca recibe el mes completo y los
+filtros/orden se resuelven en el servidor.
+
+La fila de totales (`pinnedBottomRowData`) no se escribe desde el callback
+de `getRowsRequest`: cada página la calcula en su propio callback, disparado
+por el store/URL y el `filterModel` de la grilla, y la envía con
+`pinned_rows` (un `Patch` que solo toca esa clave de `dashGridOptions`).
+"""
+from functools import reduce
+
+import pandas as pd
+import dash_ag_grid as dag
+from dash import Output, Input, State, ClientsideFunction, Patch
+
+from dash_registry import clientside_callback
+from .common import match_id
+
+BLOCK_SIZE = 100
+MAX_BLOCKS = 10
+
+
+def infinite_options(**extra):
+    """`dashGridOptions` base de una grilla por bloques."""
+    return {
+        "cacheBlockSize": BLOCK_SIZE,
+        "maxBlocksInCache": MAX_BLOCKS,
+        "infiniteInitialRowCount": 1,
+        "rowBuffer": 0,
+        **extra,
+    }
+
+
+def infinite_grid(grid_id, column_defs, grid_options=None, default_col_def=None, **kwargs):
+    return dag.AgGrid(
+        id=grid_id,
+        rowModelType="infinite",
+        columnDefs=column_defs,
+        defaultColDef=default_col_def or {
+            "sortable": True,
+            "resizable": True,
+            "filter": "agTextColumnFilter",
+            "floatingFilter": True,
+        },
+        dashGridOptions=grid_options or infinite_options(),
+        className=kwargs.pop("className", "ag-theme-alpine"),
+        **kwargs
+    )
+
+
+def register_refresh(grid_kind, *triggers):
+    """Vuelve a pedir bloques a `grid_kind` cuando cambia algún `triggers`.
+
+    `triggers` son `(kind, propiedad)` de la misma página, p. ej. la URL o
+    el store con los parámetros de la consulta.
+    """
+    clientside_callback(
+        ClientsideFunction(namespace="grid", function_name="refreshInfinite"),
+        Output(match_id(grid_kind), "className"),
+        *[Input(match_id(kind), prop) for kind, prop in triggers],
+        State(match_id(grid_kind), "id"),
+        stacklevel=2,
+    )
+
+
+# ---------------------------------------------------------------------------
+# filterModel / sortModel de AgGrid aplicados al DataFrame
+# ---------------------------------------------------------------------------
+def _text_mask(serie, kind, val):
+    pattern = str(val or "").lower()
+    lowered = serie.astype(str).str.lower()
+    if kind == "contains":
+        return lowered.str.contains(pattern, regex=False, na=False)
+    if kind == "notContains":
+        return ~lowered.str.contains(pattern, regex=False, na=False)
+    if kind == "equals":
+        return lowered == pattern
+    if kind == "notEqual":
+        return lowered != pattern
+    if kind == "startsWith":
+        return lowered.str.startswith(pattern)
+    if kind == "endsWith":
+        return lowered.str.endswith(pattern)
+    return None
+
+
+def _to_float(val):
+    try:
+        return float(val) if val is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _number_mask(serie, kind, cond):
+    serie = pd.to_numeric(serie, errors="coerce")
+    num = _to_float(cond.get("filter"))
+    if kind == "inRange":
+        num_to = _to_float(cond.get("filterTo"))
+        if num is not None and num_to is not None:
+            return (serie >= num) & (serie <= num_to)
+        return None
+    if num is None:
+        return None
+    if kind == "equals":
+        return serie == num
+    if kind == "notEqual":
+        return serie != num
+    if kind == "greaterThan":
+        return serie > num
+    if kind == "greaterThanOrEqual":
+        return serie >= num
+    if kind == "lessThan":
+        return serie < num
+    if kind == "lessThanOrEqual":
+        return serie <= num
+    return None
+
+
+def _condition_mask(serie, filter_type, cond):
+    kind = cond.get("type")
+    if kind in ("blank", "notBlank"):
+        blank = serie.isna() | (serie.astype(str).str.strip() == "")
+        return blank if kind == "blank" else ~blank
+    if filter_type == "number":
+        return _number_mask(serie, kind, cond)
+    if filter_type == "text":
+        return _text_mask(serie, kind, cond.get("filter"))
+    return None
+
+
+def _column_mask(serie, f):
+    filter_type = f.get("filterType")
+    # Filtro con dos condiciones: `conditions` (AgGrid >= 29) o condition1/2
+    conditions = f.get("conditions") or [c for c in (f.get("condition1"), f.get("condition2")) if c]
+    if not conditions:
+        return _condition_mask(serie, filter_type, f)
+    masks = [m for m in (_condition_mask(serie, filter_type, c) for c in conditions) if m is not None]
+    if not masks:
+        return None
+    if f.get("operator") == "OR":
+        return reduce(lambda a, b: a | b, masks)
+    return reduce(lambda a, b: a & b, masks)
+
+
+def filter_frame(df, filter_model):
+    """Aplica el `filterModel` de AgGrid (text/number) a `df`."""
+    if not filter_model:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for col, f in filter_model.items():
+        if col not in df.columns:
+            continue
+        col_mask = _column_mask(df[col], f)
+        if col_mask is not None:
+            mask &= col_mask.fillna(False)
+    return df[mask]
+
+
+def sort_frame(df, sort_model):
+    sort_model = [s for s in (sort_model or []) if s.get("colId") in df.columns]
+    if not sort_model:
+        return df
+    return df.sort_values(
+        [s["colId"] for s in sort_model],
+        ascending=[s.get("sort") != "desc" for s in sort_model],
+        kind="mergesort",
+        na_position="last",
+    )
+
+
+def rows_block(df, request):
+    """`getRowsResponse` de `request` sobre `df`.
+
+    `endRow` viene del navegador: se acota a lo que la grilla puede tener
+    en caché (`BLOCK_SIZE * MAX_BLOCKS` filas) para que un request
+    manipulado no pueda pedir el mes completo de una vez.
+    """
+    filtered = filter_frame(df, request.get("filterModel"))
+    ordered = sort_frame(filtered, request.get("sortModel"))
+    start = max(int(request.get("startRow") or 0), 0)
+    end = int(request.get("endRow") or start + BLOCK_SIZE)
+    end = min(max(end, start), start + BLOCK_SIZE * MAX_BLOCKS)
+    response = {
+        "rowData": ordered.iloc[start:end].to_dict("records"),
+        "rowCount": len(ordered),
+    }
+    return response
+
+
+def pinned_rows(rows):
+    """`Patch` de `dashGridOptions` que solo reemplaza la fila de totales."""
+    patch = Patch()
+    patch["pinnedBottomRowData"] = rows
+    return patch
@@ -0,0 +1,146 @@
+"""Snapshots en disco (Arrow IPC / Feather) de consultas sobre meses cerrados.
+
+Las particiones mensuales del DW (`dwsge.<tabla>_{anio}_{periodo}`) no
+cambian una vez cerrado el mes, así que el resultado de una consulta que
+solo lee meses cerrados (siempre filtrada por `cod_centro`) se guarda una
+vez en `SNAPSHOT_DIR/<anio>_<periodo>/<hash>.arrow` sin compresión y se lee
+con memory-map: los hilos y procesos de waitress comparten las páginas del
+archivo vía la caché del sistema operativo.
+
+El directorio se limita a `SNAPSHOT_MAX_BYTES`; se eliminan primero los
+archivos leídos hace más tiempo. Sin `pyarrow` instalado el store queda
+desactivado y todo se consulta en Postgres como antes.
+"""
+import hashlib
+import os
+import re
+import shutil
+import threading
+from backend.dw_periods import month_closed
+from backend.metrics import cache_event
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow es opcional
+    feather = None
+
+SNAPSHOT_DIR = os.environ.get(
+    "INDICADORES_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "snapshots"),
+)
+SNAPSHOT_MAX_BYTES = int(os.environ.get("INDICADORES_SNAPSHOT_MAX_MB", "2048")) * 1024 * 1024
+# Días tras el fin de mes en que el DW aún puede recargar la partición
+SNAPSHOT_CLOSE_DAYS = int(os.environ.get("INDICADORES_SNAPSHOT_CLOSE_DAYS", "15"))
+SNAPSHOT_ENABLED = feather is not None and os.environ.get("INDICADORES_SNAPSHOTS", "1") != "0"
+
+# Sube al cambiar los tipos del frame guardado (backend.frame_schema): los
+# snapshots anteriores dejan de usarse y el desalojo los elimina
+SNAPSHOT_FORMAT = 2
+
+_PARTITION = re.compile(r"\bdwsge\.\w+?_(20\d{2})_(0[1-9]|1[0-2])\b")
+_evict_lock = threading.Lock()
+
+
+def _month_closed(anio, periodo, today=None):
+    return month_closed(anio, periodo, today, SNAPSHOT_CLOSE_DAYS)
+
+
+def snapshot_partition(query):
+    """`anio_periodo` de la consulta si solo lee meses cerrados, si no `None`."""
+    partitions = set(_PARTITION.findall(query))
+    if not partitions or not all(_month_closed(anio, periodo) for anio, periodo in partitions):
+        return None
+    return "_".join(max(partitions))
+
+
+def _snapshot_path(partition, query):
+    digest = hashlib.sha1(f"{SNAPSHOT_FORMAT}:{query}".encode("utf-8")).hexdigest()
+    return os.path.join(SNAPSHOT_DIR, partition, f"{digest}.arrow")
+
+
+def _read(path):
+    table = feather.read_table(path, memory_map=True)
+    os.utime(path)  # marca de uso para el desalojo
+    return table.to_pandas(split_blocks=True)
+
+
+def _write(path, df):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        # Sin compresión: el archivo se mapea tal cual en memoria
+        feather.write_feather(df.reset_index(drop=True), tmp, compression="uncompressed")
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _evict():
+    with _evict_lock:
+        files = []
+        for root, _dirs, names in os.walk(SNAPSHOT_DIR):
+            for name in names:
+                if name.endswith(".arrow"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= SNAPSHOT_MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def snapshot_frame(query, loader):
+    """Resultado de `query` desde su snapshot; si no existe lo crea con `loader()`.
+
+    Consultas que tocan el mes en curso (o ninguna partición mensual) van
+    directo a `loader`. Los resultados vacíos no se guardan: la partición
+    podría estar aún sin cargar.
+    """
+    partition = snapshot_partition(query) if SNAPSHOT_ENABLED else None
+    if partition is None:
+        return loader()
+    path = _snapshot_path(partition, query)
+    if os.path.isfile(path):
+        try:
+            df = _read(path)
+            cache_event("snapshots", True)
+            return df
+        except Exception as e:
+            print(f"Snapshot ilegible, se consulta el DW: {path}: {e}")
+    cache_event("snapshots", False)
+    df = loader()
+    if df is not None and not df.empty:
+        try:
+            _write(path, df)
+            _evict()
+        except Exception as e:
+            # Tipos que Arrow no admite (columnas object mixtas, nombres repetidos)
+            print(f"No se pudo guardar el snapshot {path}: {e}")
+    return df
+
+
+def clear_snapshots(anio=None, periodo=None):
+    """Elimina los snapshots de un mes (o todos); devuelve los directorios borrados."""
+    if periodo and not anio:
+        # Sin año el filtro no aplica y se borraría todo
+        raise ValueError("periodo requiere anio")
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    prefix = f"{anio}_{periodo}" if periodo else f"{anio}_"
+    removed = []
+    for name in os.listdir(SNAPSHOT_DIR):
+        if anio and not name.startswith(prefix):
+            continue
+        shutil.rmtree(os.path.join(SNAPSHOT_DIR, name), ignore_errors=True)
+        removed.append(name)
+    return removed
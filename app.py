@@ -1,20 +1,51 @@
 from flask import Flask
 import sys
+import importlib
+import click
 from extensions import db, login_manager
 from routes import register_routes
-from backend.audit_logging import init_app as init_audit
+from backend.audit_logging import init_app as init_audit, create_table, register_page_view_audit
 
 from view_logs import register_logs_blueprint
 from sqlalchemy import text
-from dashboard import create_dash_app as create_dash_main
-from dashboard_eme import create_dash_app as create_dash_eme
-from dashboard_nm import create_dash_app as create_dash_nm
-from dashboard_diag import create_dash_app as create_dash_diag
+from dash_registry import print_callback_report
+from startup import LazyDashDispatcher, StartupProfile, import_time_report
+from backend import compression, metrics, profiler, sql_tagging, static_assets, vendor_assets
 import os
 from werkzeug.security import generate_password_hash, check_password_hash
+from backend.models import invalidate_user_cache
+
+
+# Prefijo -> módulo con `create_dash_app(flask_app, url_base_pathname)`.
+# Se importan al construir cada app: pandas/plotly/Indicadores no se cargan
+# hasta entonces en modo FAST_START.
+DASH_APPS = [
+    ('/dashboard/', 'dashboard'),
+    ('/dashboard_alt/', 'dashboard_eme'),
+    ('/dashboard_nm/', 'dashboard_nm'),
+    ('/diag_cap/', 'dashboard_diag'),
+]
+# Carpeta `assets/` compartida por las cuatro apps Dash
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+
+
+def _env_flag(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def create_dash(module_name, server, url_base_pathname):
+    module = importlib.import_module(module_name)
+    dash_app = module.create_dash_app(server, url_base_pathname=url_base_pathname)
+    metrics.register_dash_app(dash_app)
+    # Bundles de Dash desde una sola URL para las cuatro apps
+    return vendor_assets.share_component_suites(dash_app)
 
 
 def create_app():
+    profile = StartupProfile(enabled=_env_flag('STARTUP_PROFILE'))
     app = Flask(__name__)
 
     # =============================
@@ -39,39 +70,194 @@ def create_app():
         "pool_pre_ping": True,
     }
 
+    # Segundos que load_user reutiliza los datos de un usuario (0 = sin cache)
+    app.config['USER_CACHE_TTL'] = 300
+
+    # =============================
+    # AUDITORÍA (ESCRITURA ASÍNCRONA POR LOTES)
+    # =============================
+    app.config['AUDIT_ASYNC'] = True
+    app.config['AUDIT_QUEUE_SIZE'] = 10000
+    app.config['AUDIT_BATCH_SIZE'] = 200
+    app.config['AUDIT_FLUSH_INTERVAL'] = 1.0
+    app.config['AUDIT_DROP_POLICY'] = 'drop_newest'
+    app.config['AUDIT_MAX_RETRIES'] = 3
+    app.config['AUDIT_PAGE_VIEWS'] = False
+
+    # =============================
+    # COMPRESIÓN DE RESPUESTAS
+    # =============================
+    app.config['COMPRESS_ENABLED'] = _env_flag('COMPRESS_ENABLED', True)
+    app.config['COMPRESS_MIN_SIZE'] = 1024
+    app.config['COMPRESS_GZIP_LEVEL'] = 6
+    app.config['COMPRESS_BR_LEVEL'] = 5
+
+    # =============================
+    # MÉTRICAS
+    # =============================
+    # Token para el scraper de Prometheus (además de la sesión de admin)
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+    # =============================
+    # ARRANQUE
+    # =============================
+    # FAST_START: sin ping ni DDL al iniciar (usar `flask init-db`) y apps
+    # Dash construidas al primer acceso a su prefijo o por el hilo de precarga.
+    app.config['FAST_START'] = _env_flag('FAST_START')
+    app.config['SCHEMA_ON_STARTUP'] = _env_flag('SCHEMA_ON_STARTUP', not app.config['FAST_START'])
+    app.config['DASH_LAZY'] = _env_flag('DASH_LAZY', app.config['FAST_START'])
+    app.config['DASH_WARMUP'] = _env_flag('DASH_WARMUP', True)
+
     # =============================
     # INICIALIZAR EXTENSIONES
     # =============================
-    db.init_app(app)
-    login_manager.init_app(app)
+    with profile.stage('extensiones'):
+        db.init_app(app)
+        login_manager.init_app(app)
 
     # =============================
     # REGISTRAR RUTAS
     # =============================
-    register_routes(app)
-    register_logs_blueprint(app)
+    with profile.stage('rutas'):
+        register_routes(app)
+        register_logs_blueprint(app)
+
+    # CSS/JS precomprimidos (`flask compress-static`) para static/ y assets/
+    static_roots = {'/static/': app.static_folder}
+    static_roots.update({f'{prefix}assets/': ASSETS_DIR for prefix, _ in DASH_APPS})
+    compression.init_app(app, static_roots)
+    compression.register_commands(app, [app.static_folder, ASSETS_DIR])
+
+    # Imágenes con hash + WebP/AVIF (`flask build-static`) y caché inmutable
+    asset_dirs = {f'{prefix}assets/': ASSETS_DIR for prefix, _ in DASH_APPS}
+    static_assets.init_app(app, asset_dirs)
+    static_assets.register_commands(app, asset_dirs)
+
+    # Bootstrap / iconos / Inter locales (`flask vendor-assets`) y ruta única
+    # para los bundles de Dash
+    vendor_assets.init_app(app)
+
+    # /metrics (Prometheus): callbacks, consultas, pools y cachés
+    metrics.init_app(app)
+    # Comentario SQL con app/callback/consulta/request_id y log de consultas lentas
+    sql_tagging.init_app(app)
+    # Perfilado a pedido de admins (X-Profile / ?profile=1), ver /logs/profiles
+    profiler.init_app(app)
 
     # =============================
     # INICIALIZACIÓN DE BD
     # =============================
-    with app.app_context():
+    with profile.stage('base de datos'), app.app_context():
         try:
-            db.session.execute(text('SELECT 1'))
-            init_audit(app, ensure_table=True)
-            db.create_all()
-            print("Conexión a PostgreSQL exitosa.")
+            schema = app.config['SCHEMA_ON_STARTUP']
+            if schema:
+                db.session.execute(text('SELECT 1'))
+            init_audit(app, ensure_table=schema)
+            if schema:
+                db.create_all()
+                print("Conexión a PostgreSQL exitosa.")
         except Exception as e:
             print("Error al conectar a PostgreSQL:", e)
             raise
 
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Crea las tablas de la aplicación y de auditoría si no existen."""
+        create_table(app)
+        db.create_all()
+        click.echo('Esquema de base de datos verificado.')
+
+    @app.cli.command('import-profile')
+    @click.option('--module', default='app', help='Módulo a importar en un intérprete nuevo.')
+    @click.option('--top', type=int, default=25, help='Filas a mostrar.')
+    def import_profile_command(module, top):
+        """Muestra los imports más lentos (python -X importtime)."""
+        for cumulative, own, name in import_time_report(module, top):
+            click.echo(f'{cumulative:8.3f}s {own:8.3f}s  {name}')
+
+    @app.cli.command('snapshots-clear')
+    @click.option('--anio', default=None, help='Año de la partición (por defecto todas).')
+    @click.option('--periodo', default=None, help='Mes (01-12) dentro de --anio.')
+    def snapshots_clear_command(anio, periodo):
+        """Borra los snapshots Arrow de Indicadores (p. ej. tras recargar un mes)."""
+        from Indicadores.page_factory.snapshots import clear_snapshots
+        if periodo and not anio:
+            raise click.UsageError('--periodo requiere --anio')
+        removed = clear_snapshots(anio, periodo)
+        click.echo(f"Snapshots eliminados: {', '.join(removed) or 'ninguno'}")
+
+    @app.cli.command('diag-export-parquet')
+    @click.option('--suffix', multiple=True, help='Partición <anio>_<periodo> a (re)exportar; por defecto los meses cerrados sin export final.')
+    @click.option('--force', is_flag=True, help='Reexportar todas las particiones.')
+    @click.option('--no-dimensions', is_flag=True, help='No reexportar las tablas de dimensiones.')
+    def diag_export_parquet_command(suffix, force, no_dimensions):
+        """Exporta el DW a Parquet para los reportes de diagnóstico en DuckDB."""
+        from backend import diag_duckdb
+        from Indicadores.page_factory.common import create_connection
+        engine = create_connection()
+        if engine is None:
+            raise click.ClickException('No se pudo conectar a DW_ESTADISTICA')
+        for table, rows in diag_duckdb.export_parquet(
+            engine, suffixes=list(suffix), force=force, dimensions=not no_dimensions
+        ):
+            click.echo(f'{table}: {rows} filas')
+
+    @app.cli.command('fetch-benchmark')
+    @click.option('--rows', type=int, default=500_000, help='Filas del mes sintético.')
+    @click.option('--repeat', type=int, default=3, help='Repeticiones por lector (se informa la mejor).')
+    def fetch_benchmark_command(rows, repeat):
+        """Compara psycopg2 / connectorx / ADBC leyendo un mes sintético del DW."""
+        from backend import arrow_fetch
+        from Indicadores.page_factory.common import create_connection
+        engine = create_connection()
+        if engine is None:
+            raise click.ClickException('No se pudo conectar a DW_ESTADISTICA')
+        click.echo(f"{'lector':<12} {'dtypes':<8} {'segundos':>9} {'filas':>9} {'memoria MB':>11}")
+        for backend, dtypes, seconds, count, memory in arrow_fetch.benchmark(engine, rows, repeat):
+            click.echo(f'{backend:<12} {dtypes:<8} {seconds:9.3f} {count:9d} {memory / 1e6:11.1f}')
+
     # =============================
     # DASHBOARDS
     # =============================
-    create_dash_main(app, url_base_pathname='/dashboard/')
-    create_dash_eme(app, url_base_pathname='/dashboard_alt/')
-    create_dash_nm(app, url_base_pathname='/dashboard_nm/')
-    create_dash_diag(app, url_base_pathname='/diag_cap/')
-    
+    if app.config['DASH_LAZY']:
+        def dash_server():
+            # Servidor propio por app Dash: Flask no admite rutas nuevas
+            # una vez atendida la primera petición de `app`.
+            server = Flask(__name__, static_folder=None)
+            server.config.from_mapping(app.config)
+            # Solo load_user consulta la BD desde aquí: pool pequeño
+            server.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+                **app.config['SQLALCHEMY_ENGINE_OPTIONS'], 'pool_size': 5,
+            }
+            db.init_app(server)
+            login_manager.init_app(server)
+            if app.config['AUDIT_PAGE_VIEWS']:
+                register_page_view_audit(server)
+            compression.init_app(server, static_roots)
+            static_assets.init_app(server, asset_dirs)
+            metrics.instrument_dash(server)
+            sql_tagging.instrument_requests(server)
+            profiler.instrument_requests(server)
+            return server
+
+        def build(prefix):
+            server = dash_server()
+            return server, create_dash(dict(DASH_APPS)[prefix], server, prefix)
+
+        dispatcher = LazyDashDispatcher(
+            app, [(prefix, build) for prefix, _ in DASH_APPS],
+            on_build=lambda dash_app: print_callback_report([dash_app])
+        )
+        app.wsgi_app = dispatcher
+        app.extensions['lazy_dash'] = dispatcher
+        if app.config['DASH_WARMUP']:
+            dispatcher.start_warmup()
+    else:
+        dash_apps = []
+        for prefix, module_name in DASH_APPS:
+            with profile.stage(f'dash {prefix}'):
+                dash_apps.append(create_dash(module_name, app, prefix))
+        print_callback_report(dash_apps)
 
     # =============================
     # HELPER DE PASSWORD
@@ -106,12 +292,14 @@ def create_app():
             user.password = new_hash
             db.session.add(user)
             db.session.commit()
+            invalidate_user_cache(user.id)
             return True
 
         return False
 
     app.verify_and_migrate_password = verify_and_migrate_password
 
+    profile.report()
     return app
 
 
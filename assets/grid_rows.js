@@ -0,0 +1,20 @@
+// Grillas con rowModelType="infinite": los bloques los sirve un callback.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    grid: {
+        // Descarta los bloques en caché cuando cambian los parámetros de la
+        // página (la grilla se reutiliza y no vuelve a pedir filas sola).
+        // Argumentos: valores de los disparadores y, al final, el id de la grilla.
+        refreshInfinite: function () {
+            var gridId = arguments[arguments.length - 1];
+            try {
+                var api = dash_ag_grid.getApi(gridId);
+                if (api) {
+                    api.purgeInfiniteCache();
+                }
+            } catch (e) {
+                // La grilla aún no está montada: pedirá su primer bloque al montarse
+            }
+            return window.dash_clientside.no_update;
+        }
+    }
+});
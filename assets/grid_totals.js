@@ -0,0 +1,45 @@
+// Totales de fila fija calculados en el navegador (sin ida y vuelta al servidor).
+// Uso desde dashGridOptions:
+//   {"onFilterChanged": {"function": "dashAgGridFunctions.pinnedTotal(params, {...})"}}
+var dagfuncs = (window.dashAgGridFunctions = window.dashAgGridFunctions || {});
+
+function formatNumber(value, decimals) {
+    return value.toLocaleString("en-US", {
+        minimumFractionDigits: decimals,
+        maximumFractionDigits: decimals
+    });
+}
+
+// opts: labelField, label, filteredLabel, sumField, decimals, row (campos fijos)
+dagfuncs.pinnedTotal = function (params, opts) {
+    var api = params.api;
+    var count = 0;
+    var sum = 0;
+    api.forEachNodeAfterFilter(function (node) {
+        if (node.group || !node.data) {
+            return;
+        }
+        count += 1;
+        if (opts.sumField) {
+            var value = parseFloat(node.data[opts.sumField]);
+            if (!isNaN(value)) {
+                sum += value;
+            }
+        }
+    });
+
+    var decimals = opts.decimals || 0;
+    var total = opts.sumField ? sum : count;
+    var label = (opts.filteredLabel && api.isAnyFilterPresent()) ? opts.filteredLabel : opts.label;
+    var row = Object.assign({}, opts.row || {});
+    row[opts.labelField] = label + ": " + (opts.thousands === false ? String(total) : formatNumber(total, decimals));
+    if (opts.sumField) {
+        row[opts.sumField] = decimals ? total : Math.round(total);
+    }
+
+    if (api.setGridOption) {
+        api.setGridOption("pinnedBottomRowData", [row]);
+    } else {
+        api.setPinnedBottomRowData([row]);
+    }
+};
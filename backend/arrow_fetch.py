@@ -0,0 +1,184 @@
+"""Arrow-native reads from the warehouse, with `pd.read_sql` as fallback.
+
+`pd.read_sql` over psycopg2 builds a Python tuple per row and object
+columns before pandas sees the data. connectorx and ADBC read the Postgres
+wire format straight into Arrow columns. `fetch_arrow` / `fetch_frame` pick
+the reader per call (`backend=`), defaulting to `DW_FETCH_BACKEND`:
+
+- `auto` (default): connectorx, then ADBC, then psycopg2, whichever is installed
+- `connectorx` / `adbc` / `psycopg2`: force one reader
+
+Any error in an Arrow reader falls back to psycopg2 for that call. Bound
+parameters (`:name`) are rendered as SQL literals for the Arrow readers.
+They open their own connection per call, outside the SQLAlchemy pool.
+
+`fetch_frame(..., dtype_backend="pyarrow")` returns Arrow-backed pandas
+dtypes. The default keeps numpy/object columns, as the existing loaders
+expect.
+
+`flask fetch-benchmark` compares the readers on a synthetic month.
+"""
+import logging
+import os
+import time
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from backend.sql_tagging import annotate, record_if_slow
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow es opcional: sin él solo psycopg2
+    pa = None
+
+try:
+    import connectorx as cx
+except ImportError:
+    cx = None
+
+try:
+    import adbc_driver_postgresql.dbapi as adbc_pg
+except ImportError:
+    adbc_pg = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = os.environ.get('DW_FETCH_BACKEND', 'auto').strip().lower()
+
+# Render de literales sin duplicar '%' (paramstyle de psycopg2)
+_LITERAL_DIALECT = postgresql.dialect(paramstyle='named')
+
+
+def available_backends():
+    backends = []
+    if pa is not None and cx is not None:
+        backends.append('connectorx')
+    if pa is not None and adbc_pg is not None:
+        backends.append('adbc')
+    backends.append('psycopg2')
+    return backends
+
+
+def resolve_backend(backend=None):
+    backend = (backend or DEFAULT_BACKEND).strip().lower()
+    available = available_backends()
+    if backend == 'auto':
+        return available[0]
+    if backend not in available:
+        logger.warning('Lector %s no disponible, se usa psycopg2', backend)
+        return 'psycopg2'
+    return backend
+
+
+def _uri(engine):
+    return engine.url.set(drivername='postgresql').render_as_string(hide_password=False)
+
+
+def _render(query, params):
+    if isinstance(query, str) and not params:
+        return query
+    stmt = text(query) if isinstance(query, str) else query
+    if params:
+        stmt = stmt.bindparams(**params)
+    return str(stmt.compile(dialect=_LITERAL_DIALECT, compile_kwargs={'literal_binds': True}))
+
+
+def _read_arrow(backend, query, engine, params):
+    # Fuera de SQLAlchemy: la etiqueta y el registro de lentas se hacen aquí
+    sql = annotate(_render(query, params))
+    start = time.perf_counter()
+    if backend == 'connectorx':
+        table = cx.read_sql(_uri(engine), sql, return_type='arrow')
+    else:
+        with adbc_pg.connect(_uri(engine)) as conn, conn.cursor() as cur:
+            cur.execute(sql)
+            table = cur.fetch_arrow_table()
+    record_if_slow(engine, sql, None, time.perf_counter() - start)
+    return table
+
+
+def _bound(query, params):
+    # pd.read_sql pasa un str tal cual al driver: `:name` necesita text()
+    return text(query) if isinstance(query, str) and params else query
+
+
+def _try_arrow(query, engine, params, backend):
+    backend = resolve_backend(backend)
+    if backend == 'psycopg2':
+        return None
+    try:
+        return _read_arrow(backend, query, engine, params)
+    except Exception as exc:
+        logger.warning('Lectura con %s falló, se usa psycopg2: %s', backend, exc)
+        return None
+
+
+def fetch_arrow(query, engine, params=None, backend=None):
+    """Result of `query` as a `pyarrow.Table`."""
+    if pa is None:
+        raise RuntimeError('pyarrow no está instalado')
+    table = _try_arrow(query, engine, params, backend)
+    if table is not None:
+        return table
+    return pa.Table.from_pandas(pd.read_sql(_bound(query, params), engine, params=params), preserve_index=False)
+
+
+def fetch_frame(query, engine, params=None, backend=None, dtype_backend=None):
+    """Drop-in for `pd.read_sql(query, engine, params=params)`.
+
+    `dtype_backend="pyarrow"` returns `pd.ArrowDtype` columns instead of
+    numpy/object ones.
+    """
+    table = _try_arrow(query, engine, params, backend)
+    if table is not None:
+        if dtype_backend == 'pyarrow':
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+        return table.to_pandas()
+    if dtype_backend:
+        return pd.read_sql(_bound(query, params), engine, params=params, dtype_backend=dtype_backend)
+    return pd.read_sql(_bound(query, params), engine, params=params)
+
+
+# ---------------------------------------------------------------------------
+# Benchmark (`flask fetch-benchmark`)
+# ---------------------------------------------------------------------------
+# Mes sintético con la forma de dw_consulta_externa_homologacion, generado
+# en el servidor (no requiere tablas)
+SYNTHETIC_MONTH_SQL = """
+    SELECT
+        'A' || lpad(mod(g, 120)::text, 2, '0') AS cod_servicio,
+        'Servicio ' || mod(g, 120) AS servhosdes,
+        'Agrupador ' || mod(g, 15) AS agrupador,
+        'Especialidad ' || mod(g, 60) AS especialidad,
+        lpad(mod(g, 4000)::text, 8, '0') AS dni_medico,
+        lpad(g::text, 8, '0') AS doc_paciente,
+        CASE WHEN mod(g, 2) = 0 THEN 'M' ELSE 'F' END AS sexo,
+        DATE '2025-01-01' + mod(g, 31) AS fecha_atencion,
+        mod(g, 90) AS anio_edad,
+        round(mod(g, 600) / 60.0, 2) AS horas_efec_def
+    FROM generate_series(1, {rows}) AS g
+"""
+
+
+def benchmark(engine, rows=500_000, repeat=3):
+    """Time every available reader on the synthetic month.
+
+    Returns `(backend, dtype_backend, best_seconds, rows, memory_bytes)`.
+    """
+    query = SYNTHETIC_MONTH_SQL.format(rows=int(rows))
+    results = []
+    for backend in available_backends():
+        for dtype_backend in (None, 'pyarrow'):
+            if dtype_backend == 'pyarrow' and pa is None:
+                continue
+            best = None
+            df = None
+            for _ in range(max(int(repeat), 1)):
+                start = time.perf_counter()
+                df = fetch_frame(query, engine, backend=backend, dtype_backend=dtype_backend)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results.append((backend, dtype_backend or 'numpy', best, len(df), int(df.memory_usage(deep=True).sum())))
+    return results
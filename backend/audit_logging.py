@@ -1,9 +1,18 @@
 import logging
+import os
+import threading
+import time
 import uuid
 from datetime import datetime
+import click
 from flask import request, has_request_context
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from flask_login import UserMixin, current_user, user_logged_in, user_logged_out
 from extensions import db
+from backend import audit_partitions
+from backend.audit_writer import AuditWriter, DROP_NEWEST
+from backend.user_agent import classify_user_agent
 from zoneinfo import ZoneInfo
 
 logger = logging.getLogger(__name__)
@@ -11,13 +20,19 @@ logger = logging.getLogger(__name__)
 # Zona horaria de Lima (UTC-5)
 LIMA_TZ = ZoneInfo("America/Lima")
 
+# Longitud máxima del User-Agent crudo que se guarda
+UA_MAX_LENGTH = 512
+
 
 class Logs_User(UserMixin, db.Model):
     """Modelo para almacenar eventos de auditoría de usuarios.
 
+    La tabla está particionada por mes sobre `fecha` (ver
+    `backend.audit_partitions`), por eso la PK en la base es (id, fecha).
+
     Campos:
       - id: PK
-      - ip_user: dirección IP única con sufijo UUID
+      - ip_user: dirección IP (con sufijo UUID solo en la tabla sin particionar)
       - user: nombre/username del usuario
       - log: descripción del evento (login, logout, etc)
       - peticiones: método HTTP (GET, POST, etc)
@@ -26,37 +41,129 @@ class Logs_User(UserMixin, db.Model):
       - status: estado del evento (success, error, denied)
       - user_role: rol del usuario (admin, user, etc)
       - navegador: información del navegador y OS
+      - user_agent: User-Agent crudo, para recalcular `navegador`
     """
     __tablename__ = 'Log_users'
     __table_args__ = {'schema': 'public'}
 
-    id = db.Column(db.Integer, primary_key=True)
-    ip_user = db.Column(db.String(100), unique=True, nullable=False)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    ip_user = db.Column(db.String(100), nullable=False)
     user = db.Column(db.String(255), nullable=True)
     log = db.Column(db.String(100), nullable=True)
     peticiones = db.Column(db.String(20), nullable=True)  # GET, POST, PUT, DELETE, etc
     urls = db.Column(db.String(500), nullable=True)
-    fecha = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(LIMA_TZ), nullable=False)
+    fecha = db.Column(db.DateTime(timezone=True), primary_key=True, default=lambda: datetime.now(LIMA_TZ), nullable=False)
     status = db.Column(db.String(50), nullable=True)  # success, error, denied
     user_role = db.Column(db.String(50), nullable=True)  # admin, user, etc
     navegador = db.Column(db.String(255), nullable=True)
+    user_agent = db.Column(db.String(UA_MAX_LENGTH), nullable=True)
+
+
+class Logs_Daily(db.Model):
+    """Conteo diario de eventos de auditoría (rollup de `Log_users`).
+
+    Una fila por (día Lima, rol, url, status). Los gráficos del visor de logs
+    se construyen sobre esta tabla para no recorrer todos los eventos.
+    Los valores NULL de la tabla de eventos se guardan como cadena vacía.
+    """
+    __tablename__ = 'Log_users_daily'
+    __table_args__ = {'schema': 'public'}
+
+    dia = db.Column(db.Date, primary_key=True)
+    user_role = db.Column(db.String(50), primary_key=True, default='')
+    urls = db.Column(db.String(500), primary_key=True, default='')
+    status = db.Column(db.String(50), primary_key=True, default='')
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+
+
+def _rollup_key(fecha, user_role, urls, status):
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(LIMA_TZ)
+    return (fecha.date(), user_role or '', urls or '', status or '')
+
+
+def bump_daily_rollup(bind, events):
+    """Suma `events` al rollup diario con un único upsert multi-fila.
+
+    `events` es un iterable de tuplas (fecha, user_role, urls, status).
+    `bind` puede ser una sesión o una conexión; no hace commit.
+    """
+    counts = {}
+    for fecha, user_role, urls, status in events:
+        key = _rollup_key(fecha, user_role, urls, status)
+        counts[key] = counts.get(key, 0) + 1
+    if not counts:
+        return
+    table = Logs_Daily.__table__
+    stmt = pg_insert(table).values([
+        {'dia': dia, 'user_role': role, 'urls': url, 'status': status, 'cantidad': n}
+        for (dia, role, url, status), n in counts.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.dia, table.c.user_role, table.c.urls, table.c.status],
+        set_={'cantidad': table.c.cantidad + stmt.excluded.cantidad},
+    )
+    bind.execute(stmt)
+
+
+def rebuild_daily_rollup(since=None):
+    """Recalcula el rollup diario desde `Log_users`.
+
+    Si se indica `since` (date), solo se recalculan los días desde esa fecha.
+    Debe ejecutarse dentro de un app context.
+    """
+    params = {}
+    where = ""
+    delete_where = ""
+    if since is not None:
+        params['since'] = since
+        where = "WHERE (fecha AT TIME ZONE 'America/Lima')::date >= :since"
+        delete_where = "WHERE dia >= :since"
+    db.session.execute(text(f'DELETE FROM public."Log_users_daily" {delete_where}'), params)
+    db.session.execute(text(f"""
+        INSERT INTO public."Log_users_daily" (dia, user_role, urls, status, cantidad)
+        SELECT (fecha AT TIME ZONE 'America/Lima')::date,
+               COALESCE(user_role, ''),
+               COALESCE(urls, ''),
+               COALESCE(status, ''),
+               COUNT(*)
+        FROM public."Log_users"
+        {where}
+        GROUP BY 1, 2, 3, 4
+    """), params)
+    db.session.commit()
 
 
 def create_table(app=None):
     """Create the `Log_users` table in the database if it does not exist.
 
-    If `app` is provided, runs inside the app context. Uses SQLAlchemy
-    metadata from `Logs_User` and `extensions.db`.
+    If `app` is provided, runs inside the app context. A new table is
+    created range-partitioned by month on `fecha`, with indexes on
+    `(fecha)`, `(urls, fecha)` and `("user", fecha)`, and partitions for the
+    current and next months. The daily rollup table is created too and
+    filled from existing events the first time.
     """
     if db is None:
         raise RuntimeError("extensions.db is not available; cannot create table")
 
     def _create():
+        global _legacy_ip_unique
         try:
-            Logs_User.__table__.create(bind=db.engine, checkfirst=True)
+            kind = audit_partitions.provision(db.engine)
+            _legacy_ip_unique = kind not in (None, 'p')
+            audit_partitions.ensure_columns(db.engine)
             logger.info("Log_users table ensured in the database")
         except Exception as e:
             logger.exception(f"Failed to create Log_users table: {e}")
+        try:
+            rollup_exists = inspect(db.engine).has_table(Logs_Daily.__tablename__, schema='public')
+            if not rollup_exists:
+                Logs_Daily.__table__.create(bind=db.engine, checkfirst=True)
+                rebuild_daily_rollup()
+                logger.info("Log_users_daily rollup created and backfilled")
+        except Exception as e:
+            logger.exception(f"Failed to create Log_users_daily table: {e}")
+            db.session.rollback()
 
     if app is not None:
         with app.app_context():
@@ -65,11 +172,110 @@ def create_table(app=None):
         _create()
 
 
+_audit_writer = None
+
+# La tabla Log_users original (sin particionar) tiene UNIQUE en ip_user;
+# mientras no se corra "flask audit-migrate" hay que seguir sufijando la IP
+_legacy_ip_unique = False
+
+# Rutas que no cuentan como vista de página al auditar páginas Dash
+_PAGE_VIEW_SKIP = ('/_dash-', '/assets/', '/_reload-hash', '/_favicon', '/static/')
+
+
+def get_audit_writer():
+    """Return the running `AuditWriter`, or None when writes are synchronous."""
+    return _audit_writer
+
+
+def start_audit_writer(app):
+    """Create and start the asynchronous audit writer from app config.
+
+    Config keys: `AUDIT_QUEUE_SIZE`, `AUDIT_BATCH_SIZE`,
+    `AUDIT_FLUSH_INTERVAL` (seconds), `AUDIT_MAX_RETRIES` and
+    `AUDIT_DROP_POLICY` (`drop_newest`, `drop_oldest` or `block`).
+    """
+    global _audit_writer
+    if _audit_writer is not None:
+        return _audit_writer
+    _audit_writer = AuditWriter(
+        app,
+        max_queue=app.config.get('AUDIT_QUEUE_SIZE', 10000),
+        batch_size=app.config.get('AUDIT_BATCH_SIZE', 200),
+        flush_interval=app.config.get('AUDIT_FLUSH_INTERVAL', 1.0),
+        drop_policy=app.config.get('AUDIT_DROP_POLICY', DROP_NEWEST),
+        max_retries=app.config.get('AUDIT_MAX_RETRIES', 3),
+    )
+    _audit_writer.start()
+    return _audit_writer
+
+
+def stop_audit_writer():
+    """Flush pending audit rows and stop the background writer."""
+    global _audit_writer
+    writer, _audit_writer = _audit_writer, None
+    if writer is not None:
+        writer.stop()
+
+
+def register_page_view_audit(app):
+    """Record a `page_view` audit row for every authenticated GET page load.
+
+    Dash internals (callbacks, assets, reload hash) are skipped. Rows go
+    through the asynchronous writer, so the request only pays an enqueue.
+    """
+    @app.after_request
+    def _audit_page_view(response):
+        if request.method != 'GET' or response.status_code >= 400:
+            return response
+        if any(part in request.path for part in _PAGE_VIEW_SKIP):
+            return response
+        if not getattr(current_user, 'is_authenticated', False):
+            return response
+        try:
+            record_audit(log_text='page_view')
+        except Exception:
+            logger.exception('Error recording page view')
+        return response
+
+
+_partition_timer = None
+
+
+def start_partition_maintenance(app):
+    """Create upcoming monthly partitions now and every `AUDIT_PARTITION_CHECK_HOURS`.
+
+    Runs in the app itself, so partitions keep appearing even when startup
+    skips `create_table` (`FAST_START` / `SCHEMA_ON_STARTUP=0`) and nobody
+    schedules `flask audit-retention`.
+    """
+    global _partition_timer
+    if _partition_timer is not None:
+        return _partition_timer
+    interval = float(app.config.get('AUDIT_PARTITION_CHECK_HOURS', 12)) * 3600
+
+    def _loop():
+        while True:
+            try:
+                with app.app_context():
+                    audit_partitions.maintain_partitions(db.engine)
+            except Exception:
+                logger.exception('Audit partition maintenance failed')
+            time.sleep(interval)
+
+    _partition_timer = threading.Thread(target=_loop, name='audit-partitions', daemon=True)
+    _partition_timer.start()
+    return _partition_timer
+
+
 def init_app(app, ensure_table: bool = False):
     """Initialize audit helper for the Flask app.
 
     - If `ensure_table` is True, attempts to create the table using
       `create_table(app)`.
+    - Unless `AUDIT_ASYNC` is False, starts the batched background writer.
+    - If `AUDIT_PAGE_VIEWS` is True, page loads are audited as well.
+    - Unless `AUDIT_PARTITION_MAINTENANCE` is False, upcoming monthly
+      partitions are created from a background thread.
     """
     # Ensure the module is imported and SQLAlchemy knows the model
     if ensure_table:
@@ -80,8 +286,54 @@ def init_app(app, ensure_table: bool = False):
     except Exception:
         logger.exception('Failed to register audit signals during init_app')
 
+    if app.config.get('AUDIT_ASYNC', True):
+        start_audit_writer(app)
+    if app.config.get('AUDIT_PAGE_VIEWS', False):
+        register_page_view_audit(app)
+    if app.config.get('AUDIT_PARTITION_MAINTENANCE', True):
+        start_partition_maintenance(app)
+
+    @app.cli.command('audit-rollup')
+    @click.option('--since', default=None, help='Recalcular solo desde esta fecha (YYYY-MM-DD).')
+    def audit_rollup_command(since):
+        """Recalcula la tabla Log_users_daily desde Log_users."""
+        since_date = datetime.strptime(since, '%Y-%m-%d').date() if since else None
+        rebuild_daily_rollup(since_date)
+        click.echo('Rollup diario de auditoría actualizado.')
+
+    @app.cli.command('audit-reclassify-ua')
+    @click.option('--chunk-size', type=int, default=5000, help='Filas por bloque.')
+    def audit_reclassify_ua_command(chunk_size):
+        """Recalcula la columna navegador desde el User-Agent guardado."""
+        scanned, updated = reclassify_user_agents(chunk_size)
+        click.echo(f'Filas revisadas: {scanned}, actualizadas: {updated}')
+
+    @app.cli.command('audit-migrate')
+    @click.option('--drop-legacy', is_flag=True, help='Eliminar Log_users_legacy al terminar.')
+    def audit_migrate_command(drop_legacy):
+        """Migra una tabla Log_users no particionada a particiones mensuales."""
+        copied = audit_partitions.migrate_legacy_table(db.engine, drop_legacy=drop_legacy)
+        click.echo(f'Filas migradas: {copied}')
+
+    @app.cli.command('audit-retention')
+    @click.option('--keep-months', type=int, default=None, help='Meses a conservar (AUDIT_RETENTION_MONTHS).')
+    @click.option('--archive-dir', default=None, help='Carpeta de archivos .csv.gz (AUDIT_ARCHIVE_DIR).')
+    def audit_retention_command(keep_months, archive_dir):
+        """Crea las particiones próximas y archiva/elimina las antiguas."""
+        keep = keep_months or app.config.get('AUDIT_RETENTION_MONTHS', 12)
+        target = archive_dir or app.config.get(
+            'AUDIT_ARCHIVE_DIR', os.path.join(app.instance_path, 'audit_archive')
+        )
+        audit_partitions.ensure_partitions(db.engine)
+        for path in audit_partitions.archive_old_partitions(db.engine, keep, target):
+            click.echo(f'Archivado: {path}')
+
 
-__all__ = ["Logs_User", "create_table", "init_app"]
+__all__ = [
+    "Logs_User", "Logs_Daily", "create_table", "init_app", "bump_daily_rollup", "rebuild_daily_rollup",
+    "get_audit_writer", "start_audit_writer", "stop_audit_writer", "register_page_view_audit",
+    "reclassify_user_agents", "start_partition_maintenance",
+]
 
 
 def _gather_request_ip():
@@ -95,96 +347,50 @@ def _gather_request_ip():
 
 def _detect_browser(user_agent):
     """Detecta el navegador y sistema operativo del User-Agent de forma precisa."""
-    if not user_agent:
-        return "Desconocido"
-    
-    import re
-    
-    browser_name = "Desconocido"
-    browser_version = ""
-    
-    # IMPORTANTE: El orden importa. Verificar Edge ANTES que Chrome
-    # porque los nuevos navegadores Edge contienen "Chrome" en el User-Agent
-    
-    # Edge (Chromium) - detectar primero
-    if re.search(r'Edg(?:e)?/(\d+)', user_agent):
-        match = re.search(r'Edg(?:e)?/(\d+)', user_agent)
-        if match:
-            browser_name = "Microsoft Edge"
-            browser_version = match.group(1)
-    # Edge (antiguo, basado en EdgeHTML)
-    elif "Edge" in user_agent:
-        match = re.search(r'Edge/(\d+)', user_agent)
-        if match:
-            browser_name = "Microsoft Edge (antiguo)"
-            browser_version = match.group(1)
-    # Chrome
-    elif re.search(r'Chrome/(\d+)', user_agent):
-        match = re.search(r'Chrome/(\d+)', user_agent)
-        if match:
-            browser_name = "Google Chrome"
-            browser_version = match.group(1)
-    # Firefox
-    elif re.search(r'Firefox/(\d+)', user_agent):
-        match = re.search(r'Firefox/(\d+)', user_agent)
-        if match:
-            browser_name = "Mozilla Firefox"
-            browser_version = match.group(1)
-    # Safari
-    elif re.search(r'Safari/(\d+)', user_agent):
-        match = re.search(r'Version/(\d+)', user_agent)
-        if match:
-            browser_name = "Apple Safari"
-            browser_version = match.group(1)
-    # Opera
-    elif re.search(r'OPR/(\d+)', user_agent):
-        match = re.search(r'OPR/(\d+)', user_agent)
-        if match:
-            browser_name = "Opera"
-            browser_version = match.group(1)
-    
-    # Detectar OS - más completo
-    os_name = "Desconocido"
-    
-    if re.search(r'Windows NT 11', user_agent):
-        os_name = "Windows 11"
-    elif re.search(r'Windows NT 10\.0', user_agent):
-        os_name = "Windows 10"
-    elif re.search(r'Windows NT 6\.3', user_agent):
-        os_name = "Windows 8.1"
-    elif re.search(r'Windows NT 6\.2', user_agent):
-        os_name = "Windows 8"
-    elif re.search(r'Windows NT 6\.1', user_agent):
-        os_name = "Windows 7"
-    elif re.search(r'Windows NT 5\.1', user_agent):
-        os_name = "Windows XP"
-    elif re.search(r'Mac OS X 10_(\d+)', user_agent):
-        match = re.search(r'Mac OS X 10_(\d+)', user_agent)
-        version = match.group(1) if match else "?"
-        os_name = f"macOS 10.{version}"
-    elif re.search(r'Mac OS X', user_agent):
-        os_name = "macOS"
-    elif re.search(r'Android (\d+)', user_agent):
-        match = re.search(r'Android (\d+)', user_agent)
-        version = match.group(1) if match else ""
-        os_name = f"Android {version}"
-    elif "Linux" in user_agent:
-        os_name = "Linux"
-    elif "iPhone" in user_agent or "iPad" in user_agent:
-        os_name = "iOS"
-    
-    # Formatear resultado
-    if browser_version:
-        result = f"{browser_name} v{browser_version} ({os_name})"
-    else:
-        result = f"{browser_name} ({os_name})"
-    
-    return result
+    return classify_user_agent(user_agent)
+
+
+
+def reclassify_user_agents(chunk_size=5000):
+    """Recalcula `navegador` desde el `user_agent` guardado, por bloques.
+
+    Recorre `Log_users` por id (keyset) y solo actualiza las filas cuyo
+    resultado cambió con las reglas actuales; hace commit por bloque. Las
+    filas anteriores a guardar el User-Agent crudo no se pueden recalcular.
+    Devuelve (filas revisadas, filas actualizadas).
+    """
+    last_id = 0
+    scanned = updated = 0
+    while True:
+        rows = db.session.execute(text(
+            'SELECT id, fecha, user_agent, navegador FROM public."Log_users" '
+            'WHERE id > :last_id AND user_agent IS NOT NULL '
+            'ORDER BY id LIMIT :limit'
+        ), {'last_id': last_id, 'limit': chunk_size}).fetchall()
+        if not rows:
+            break
+        changes = []
+        for row_id, fecha, user_agent, navegador in rows:
+            nuevo = classify_user_agent(user_agent)
+            if nuevo != navegador:
+                changes.append({'id': row_id, 'fecha': fecha, 'navegador': nuevo})
+        if changes:
+            db.session.execute(text(
+                'UPDATE public."Log_users" SET navegador = :navegador '
+                'WHERE id = :id AND fecha = :fecha'
+            ), changes)
+        db.session.commit()
+        scanned += len(rows)
+        updated += len(changes)
+        last_id = rows[-1][0]
+        logger.info('Reclassified user agents up to id %s (%s updated)', last_id, updated)
+    return scanned, updated
 
 
 def record_audit(log_text: str, user=None, ip: str | None = None, fecha: datetime | None = None, 
                  peticiones: str | None = None, urls: str | None = None, status: str = "success",
-                 user_role: str | None = None, navegador: str | None = None, commit: bool = True):
+                 user_role: str | None = None, navegador: str | None = None, commit: bool = True,
+                 user_agent: str | None = None):
     """Insert a log row into `Log_users`.
 
     - `log_text`: short textual description of the event
@@ -196,7 +402,12 @@ def record_audit(log_text: str, user=None, ip: str | None = None, fecha: datetim
     - `status`: event status (success, error, denied)
     - `user_role`: user role (admin, user, etc)
     - `navegador`: browser and OS info
+    - `user_agent`: raw User-Agent (taken from the request if omitted)
     - `commit`: if True, commit the DB session after insert
+
+    When the asynchronous writer is running (see `init_app`) and `commit`
+    is True, the row is queued and its dict is returned instead of an ORM
+    object; with `commit=False` the row joins the caller's session as before.
     """
     if db is None:
         logger.warning("DB not available, skipping audit record")
@@ -235,27 +446,40 @@ def record_audit(log_text: str, user=None, ip: str | None = None, fecha: datetim
             peticiones = request.method
         if urls is None:
             urls = request.path
+        if user_agent is None:
+            user_agent = request.headers.get('User-Agent', '')[:UA_MAX_LENGTH] or None
         if navegador is None:
-            navegador = _detect_browser(request.headers.get('User-Agent', ''))
+            navegador = _detect_browser(user_agent)
+
+    # The legacy (plain) Log_users table has a unique constraint on ip_user,
+    # so there a short uuid suffix avoids conflicts between records from the
+    # same IP. The partitioned table has no such constraint: plain IP.
+    ip_user = ip or 'unknown'
+    if _legacy_ip_unique:
+        ip_user = f"{ip_user}-{uuid.uuid4().hex[:8]}"
+    row = {
+        'ip_user': ip_user,
+        'user': uname,
+        'log': log_text,
+        'peticiones': peticiones,
+        'urls': urls,
+        'fecha': fecha_val,
+        'status': status,
+        'user_role': role,
+        'navegador': navegador,
+        'user_agent': user_agent,
+    }
+
+    # Con el escritor asíncrono activo, el request solo encola la fila
+    writer = _audit_writer
+    if writer is not None and writer.running and commit:
+        writer.submit(row)
+        return row
 
     try:
-        # ensure ip_user is unique (the DB currently enforces uniqueness), so
-        # append a short uuid suffix to avoid conflicts when multiple records
-        # come from the same IP.
-        suffix = uuid.uuid4().hex[:8]
-        ip_user_val = f"{ip or 'unknown'}-{suffix}"
-        rec = Logs_User(
-            ip_user=ip_user_val, 
-            user=uname, 
-            log=log_text, 
-            peticiones=peticiones,
-            urls=urls,
-            fecha=fecha_val,
-            status=status,
-            user_role=role,
-            navegador=navegador
-        )
+        rec = Logs_User(**row)
         db.session.add(rec)
+        bump_daily_rollup(db.session, [(fecha_val, role, urls, status)])
         if commit:
             db.session.commit()
         return rec
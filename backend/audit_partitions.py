@@ -0,0 +1,306 @@
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = 'Log_users'
+LEGACY_TABLE = 'Log_users_legacy'
+DEFAULT_PARTITION = 'Log_users_default'
+PARTITION_RE = re.compile(r'^Log_users_p(\d{4})(\d{2})$')
+# Lima no tiene horario de verano: los límites de mes se fijan en -05
+LIMA_OFFSET = '-05'
+LIMA_TZ = ZoneInfo('America/Lima')
+
+PARTITIONED_DDL = f'''
+CREATE TABLE IF NOT EXISTS public."{PARENT_TABLE}" (
+    id serial NOT NULL,
+    ip_user varchar(100) NOT NULL,
+    "user" varchar(255),
+    log varchar(100),
+    peticiones varchar(20),
+    urls varchar(500),
+    fecha timestamptz NOT NULL DEFAULT now(),
+    status varchar(50),
+    user_role varchar(50),
+    navegador varchar(255),
+    user_agent varchar(512),
+    PRIMARY KEY (id, fecha)
+) PARTITION BY RANGE (fecha)
+'''
+
+INDEX_DDL = (
+    f'CREATE INDEX IF NOT EXISTS ix_log_users_fecha ON public."{PARENT_TABLE}" (fecha)',
+    f'CREATE INDEX IF NOT EXISTS ix_log_users_urls_fecha ON public."{PARENT_TABLE}" (urls, fecha)',
+    f'CREATE INDEX IF NOT EXISTS ix_log_users_user_fecha ON public."{PARENT_TABLE}" ("user", fecha)',
+)
+
+COLUMNS = 'id, ip_user, "user", log, peticiones, urls, fecha, status, user_role, navegador, user_agent'
+
+# Columnas agregadas después de la creación original de la tabla
+ADDED_COLUMNS = (
+    ('user_agent', 'varchar(512)'),
+)
+
+
+def _month_start(value):
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        value = value.astimezone(LIMA_TZ)
+    return date(value.year, value.month, 1)
+
+
+def _add_months(value, months):
+    index = value.year * 12 + (value.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{PARENT_TABLE}_p{month.year:04d}{month.month:02d}'
+
+
+def table_kind(conn, name=PARENT_TABLE):
+    """Return pg_class.relkind for `public.<name>` ('r', 'p') or None."""
+    return conn.execute(text(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = 'public' AND c.relname = :name"
+    ), {'name': name}).scalar()
+
+
+def create_partitioned_table(conn):
+    """Create the partitioned parent, its indexes and the default partition."""
+    conn.execute(text(PARTITIONED_DDL))
+    for ddl in INDEX_DDL:
+        conn.execute(text(ddl))
+    conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS public."{DEFAULT_PARTITION}" '
+        f'PARTITION OF public."{PARENT_TABLE}" DEFAULT'
+    ))
+
+
+def ensure_columns(engine, table=PARENT_TABLE):
+    """Add columns introduced after the table was first created."""
+    with engine.begin() as conn:
+        if table_kind(conn, table) is None:
+            return
+        for name, ddl_type in ADDED_COLUMNS:
+            conn.execute(text(f'ALTER TABLE public."{table}" ADD COLUMN IF NOT EXISTS {name} {ddl_type}'))
+
+
+def _today():
+    return datetime.now(LIMA_TZ).date()
+
+
+def ensure_month_partition(conn, month):
+    """Create the partition for `month` if missing. Returns its name.
+
+    Rows of that month already in the DEFAULT partition (written while the
+    partition did not exist) are moved into the new one before attaching it;
+    otherwise Postgres refuses to create the partition.
+    """
+    start = _month_start(month)
+    end = _add_months(start, 1)
+    name = partition_name(start)
+    bounds = (
+        f"FOR VALUES FROM ('{start.isoformat()} 00:00:00{LIMA_OFFSET}') "
+        f"TO ('{end.isoformat()} 00:00:00{LIMA_OFFSET}')"
+    )
+    if table_kind(conn, name) is not None:
+        return name
+    window = {
+        'start': f'{start.isoformat()} 00:00:00{LIMA_OFFSET}',
+        'end': f'{end.isoformat()} 00:00:00{LIMA_OFFSET}',
+    }
+    # Bloquea DEFAULT hasta el ATTACH: nada nuevo cae ahí mientras se mueve
+    conn.execute(text(f'LOCK TABLE public."{DEFAULT_PARTITION}" IN ACCESS EXCLUSIVE MODE'))
+    stranded = conn.execute(text(
+        f'SELECT 1 FROM public."{DEFAULT_PARTITION}" WHERE fecha >= :start AND fecha < :end LIMIT 1'
+    ), window).first()
+    if stranded is None:
+        conn.execute(text(f'CREATE TABLE public."{name}" PARTITION OF public."{PARENT_TABLE}" {bounds}'))
+        return name
+
+    conn.execute(text(
+        f'CREATE TABLE public."{name}" (LIKE public."{PARENT_TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+    ))
+    moved = conn.execute(text(
+        f'WITH moved AS (DELETE FROM public."{DEFAULT_PARTITION}" '
+        f'WHERE fecha >= :start AND fecha < :end RETURNING {COLUMNS}) '
+        f'INSERT INTO public."{name}" ({COLUMNS}) SELECT {COLUMNS} FROM moved'
+    ), window).rowcount
+    conn.execute(text(f'ALTER TABLE public."{PARENT_TABLE}" ATTACH PARTITION public."{name}" {bounds}'))
+    logger.warning('Moved %s audit rows from %s into %s', moved, DEFAULT_PARTITION, name)
+    return name
+
+
+def ensure_partitions(engine, months_ahead=2, today=None):
+    """Make sure partitions exist from the current month to `months_ahead`."""
+    current = _month_start(today or _today())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = _add_months(current, offset)
+        try:
+            with engine.begin() as conn:
+                created.append(ensure_month_partition(conn, month))
+        except Exception:
+            logger.exception('Could not create audit partition for %s', month)
+    return created
+
+
+def maintain_partitions(engine, months_ahead=2):
+    """`ensure_partitions` when `Log_users` is partitioned; no-op otherwise."""
+    with engine.connect() as conn:
+        if table_kind(conn) != 'p':
+            return []
+    return ensure_partitions(engine, months_ahead)
+
+
+def provision(engine, months_ahead=2):
+    """Create the partitioned `Log_users` table when it does not exist yet.
+
+    An existing non-partitioned table is left untouched and a warning is
+    logged; use `migrate_legacy_table` to move it to the partitioned layout.
+    Returns the relkind found before provisioning.
+    """
+    with engine.begin() as conn:
+        kind = table_kind(conn)
+        if kind is None:
+            create_partitioned_table(conn)
+            logger.info('Partitioned Log_users table created')
+        elif kind != 'p':
+            logger.warning(
+                'Log_users is a plain table; run "flask audit-migrate" to move it '
+                'to monthly partitions'
+            )
+            return kind
+    ensure_partitions(engine, months_ahead)
+    return kind
+
+
+def migrate_legacy_table(engine, drop_legacy=False):
+    """Move an existing plain `Log_users` table into the partitioned layout.
+
+    The old table is renamed to `Log_users_legacy`, a partitioned table is
+    created, partitions are added for every month present, and rows are
+    copied month by month keeping their ids. The id sequence is advanced
+    past the highest copied id.
+    """
+    with engine.begin() as conn:
+        kind = table_kind(conn)
+        if kind == 'p':
+            logger.info('Log_users is already partitioned')
+            return 0
+        if kind is None:
+            create_partitioned_table(conn)
+            return 0
+        if table_kind(conn, LEGACY_TABLE) is not None:
+            raise RuntimeError(f'public."{LEGACY_TABLE}" already exists; resolve it before migrating')
+
+        legacy_seq = conn.execute(text(
+            f"SELECT pg_get_serial_sequence('public.\"{PARENT_TABLE}\"', 'id')"
+        )).scalar()
+        conn.execute(text(f'ALTER TABLE public."{PARENT_TABLE}" RENAME TO "{LEGACY_TABLE}"'))
+        if legacy_seq:
+            conn.execute(text(f'ALTER SEQUENCE {legacy_seq} RENAME TO "{LEGACY_TABLE}_id_seq"'))
+        conn.execute(text(f'ALTER INDEX IF EXISTS public."{PARENT_TABLE}_pkey" RENAME TO "{LEGACY_TABLE}_pkey"'))
+        conn.execute(text(
+            f'ALTER INDEX IF EXISTS public."{PARENT_TABLE}_ip_user_key" RENAME TO "{LEGACY_TABLE}_ip_user_key"'
+        ))
+        create_partitioned_table(conn)
+
+        for name, ddl_type in ADDED_COLUMNS:
+            conn.execute(text(f'ALTER TABLE public."{LEGACY_TABLE}" ADD COLUMN IF NOT EXISTS {name} {ddl_type}'))
+        bounds = conn.execute(text(
+            f'SELECT MIN(fecha), MAX(fecha) FROM public."{LEGACY_TABLE}"'
+        )).one()
+
+    copied = 0
+    if bounds[0] is not None:
+        month = _month_start(bounds[0])
+        last = _month_start(bounds[1])
+        while month <= last:
+            nxt = _add_months(month, 1)
+            with engine.begin() as conn:
+                ensure_month_partition(conn, month)
+                result = conn.execute(text(
+                    f'INSERT INTO public."{PARENT_TABLE}" ({COLUMNS}) '
+                    f'SELECT {COLUMNS} FROM public."{LEGACY_TABLE}" '
+                    f'WHERE fecha >= :start AND fecha < :end'
+                ), {
+                    'start': f'{month.isoformat()} 00:00:00{LIMA_OFFSET}',
+                    'end': f'{nxt.isoformat()} 00:00:00{LIMA_OFFSET}',
+                })
+                copied += result.rowcount or 0
+            logger.info('Migrated audit rows for %s', month.strftime('%Y-%m'))
+            month = nxt
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('public.\"{PARENT_TABLE}\"', 'id'), "
+            f'COALESCE((SELECT MAX(id) FROM public."{PARENT_TABLE}"), 0) + 1, false)'
+        ))
+        if drop_legacy:
+            conn.execute(text(f'DROP TABLE public."{LEGACY_TABLE}"'))
+    ensure_partitions(engine)
+    return copied
+
+
+def list_month_partitions(conn):
+    """Return [(month_date, name)] for the monthly partitions, oldest first."""
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "JOIN pg_namespace n ON n.oid = p.relnamespace "
+        "WHERE n.nspname = 'public' AND p.relname = :parent"
+    ), {'parent': PARENT_TABLE}).scalars().all()
+    partitions = []
+    for name in rows:
+        match = PARTITION_RE.match(name)
+        if match:
+            partitions.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(partitions)
+
+
+def archive_old_partitions(engine, keep_months, archive_dir, today=None):
+    """Detach partitions older than `keep_months`, dump them and drop them.
+
+    Each partition is written to `<archive_dir>/<partition>.csv.gz` with
+    `COPY ... TO STDOUT` before the table is dropped. The daily rollup is
+    not touched, so historical graphs keep their counts. Returns the list
+    of archive paths written.
+    """
+    cutoff = _add_months(_month_start(today or _today()), -int(keep_months))
+    os.makedirs(archive_dir, exist_ok=True)
+    with engine.connect() as conn:
+        old = [name for month, name in list_month_partitions(conn) if month < cutoff]
+
+    written = []
+    for name in old:
+        path = os.path.join(archive_dir, f'{name}.csv.gz')
+        with engine.begin() as conn:
+            conn.execute(text(f'ALTER TABLE public."{PARENT_TABLE}" DETACH PARTITION public."{name}"'))
+        raw = engine.raw_connection()
+        try:
+            with gzip.open(path, 'wb') as fh:
+                cursor = raw.cursor()
+                cursor.copy_expert(f'COPY public."{name}" TO STDOUT WITH CSV HEADER', fh)
+                cursor.close()
+            raw.commit()
+        finally:
+            raw.close()
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE public."{name}"'))
+        logger.info('Archived audit partition %s to %s', name, path)
+        written.append(path)
+    return written
+
+
+__all__ = [
+    "provision", "ensure_columns", "ensure_partitions", "maintain_partitions", "migrate_legacy_table",
+    "archive_old_partitions", "list_month_partitions", "partition_name",
+]
@@ -0,0 +1,199 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DROP_NEWEST = 'drop_newest'
+DROP_OLDEST = 'drop_oldest'
+BLOCK = 'block'
+DROP_POLICIES = (DROP_NEWEST, DROP_OLDEST, BLOCK)
+
+
+class AuditWriter:
+    """Bounded in-process queue with a background flusher for audit rows.
+
+    Request threads call `submit(row)` with a dict of `Log_users` column
+    values; a daemon thread drains the queue and writes each batch with one
+    multi-row INSERT (plus the daily rollup upsert) on its own connection.
+    A batch is written once it holds `batch_size` rows or `flush_interval`
+    seconds after its first row arrived. A failed batch is retried
+    `max_retries` times with exponential backoff before being counted as
+    failed.
+
+    When the queue is full the behaviour depends on `drop_policy`:
+      - `drop_newest`: discard the incoming row (never blocks the request)
+      - `drop_oldest`: discard the oldest queued row to make room
+      - `block`: wait up to `block_timeout` seconds, then discard
+    Every discarded row is counted in `stats()['dropped']`.
+    """
+
+    def __init__(self, app, max_queue=10000, batch_size=200, flush_interval=1.0,
+                 drop_policy=DROP_NEWEST, block_timeout=0.05, max_retries=3, retry_delay=0.5):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown audit drop policy: {drop_policy}")
+        self.app = app
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.drop_policy = drop_policy
+        self.block_timeout = float(block_timeout)
+        self.max_retries = max(0, int(max_retries))
+        self.retry_delay = float(retry_delay)
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._counters = {
+            'submitted': 0,
+            'written': 0,
+            'dropped': 0,
+            'failed': 0,
+            'retries': 0,
+            'batches': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=10.0):
+        """Stop the flusher and write whatever is still queued."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        if thread is not None and thread.is_alive():
+            # Sigue escribiendo (BD lenta): drenar aquí competiría con él
+            logger.warning('Audit writer still running after %.1fs; %s rows left queued',
+                           timeout, self._queue.qsize())
+            return
+        self._thread = None
+        # Anything enqueued after the thread exited is flushed here
+        self._drain()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def submit(self, row):
+        """Queue one audit row. Returns False if the row was dropped."""
+        self._incr('submitted')
+        try:
+            if self.drop_policy == BLOCK:
+                self._queue.put(row, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            pass
+
+        if self.drop_policy == DROP_OLDEST:
+            try:
+                self._queue.get_nowait()
+                self._incr('dropped')
+                self._queue.put_nowait(row)
+                return True
+            except (queue.Empty, queue.Full):
+                pass
+        self._incr('dropped')
+        return False
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._counters)
+        data['queue_depth'] = self._queue.qsize()
+        data['queue_max'] = self._queue.maxsize
+        return data
+
+    def _incr(self, key, amount=1):
+        with self._lock:
+            self._counters[key] += amount
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+    def _take_batch(self, wait):
+        """Up to `batch_size` rows: waits `wait` seconds for the first one and
+        then until `flush_interval` has passed since it arrived."""
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=wait) if wait else self._queue.get_nowait())
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + (self.flush_interval if wait else 0)
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0 and not self._stop.is_set():
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch(self.flush_interval)
+            if batch:
+                self._write_with_retry(batch)
+        self._drain()
+
+    def _drain(self):
+        while True:
+            batch = self._take_batch(0)
+            if not batch:
+                return
+            self._write_with_retry(batch)
+
+    def _write_with_retry(self, batch):
+        for attempt in range(self.max_retries + 1):
+            if self._write(batch):
+                return True
+            if attempt < self.max_retries:
+                self._incr('retries')
+                # Al detenerse no se espera: se reintenta de inmediato
+                self._stop.wait(self.retry_delay * 2 ** attempt)
+        self._incr('failed', len(batch))
+        logger.error('Dropped audit batch of %s rows after %s attempts',
+                     len(batch), self.max_retries + 1)
+        return False
+
+    def _write(self, batch):
+        """Write `batch` in one transaction; returns False on error."""
+        # Imported lazily to avoid a circular import with audit_logging
+        from backend.audit_logging import Logs_User, bump_daily_rollup
+        from extensions import db
+
+        started = time.perf_counter()
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(Logs_User.__table__.insert(), batch)
+                    bump_daily_rollup(conn, [
+                        (row['fecha'], row.get('user_role'), row.get('urls'), row.get('status'))
+                        for row in batch
+                    ])
+        except Exception:
+            logger.exception('Failed to write audit batch of %s rows', len(batch))
+            return False
+        self._incr('written', len(batch))
+        self._incr('batches')
+        logger.debug('Audit batch of %s rows written in %.1f ms',
+                     len(batch), (time.perf_counter() - started) * 1000)
+        return True
+
+
+__all__ = ["AuditWriter", "DROP_NEWEST", "DROP_OLDEST", "BLOCK"]
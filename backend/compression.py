@@ -0,0 +1,187 @@
+"""Response compression (gzip / brotli) for the Flask app and Dash servers.
+
+Dynamic responses (Dash callback JSON, layouts, HTML pages) are compressed
+in an `after_request` hook when the client accepts it, the content type is
+textual and the body is larger than `COMPRESS_MIN_SIZE`. Streamed responses
+(CSV exports) and file responses are left untouched.
+
+CSS/JS under `static/` and `assets/` are served from precompressed `.br` /
+`.gz` siblings written by `flask compress-static`.
+"""
+import gzip
+import logging
+import mimetypes
+import os
+
+import click
+from flask import request, send_file
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se usa gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIMETYPES = (
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/csv',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'image/svg+xml',
+)
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.json')
+
+# Extensión del archivo precomprimido por codificación
+ENCODING_SUFFIXES = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _accepted_encodings():
+    header = request.headers.get('Accept-Encoding', '')
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0'):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def _choose_encoding(accepted):
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress_bytes(data, encoding, level=None):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level if level is not None else 5)
+    return gzip.compress(data, compresslevel=level if level is not None else 6)
+
+
+def _add_vary(response):
+    vary = response.headers.get('Vary', '')
+    if 'accept-encoding' not in vary.lower():
+        response.headers['Vary'] = f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'
+
+
+def _precompressed_response(static_roots):
+    """Serve `<file>.br` / `<file>.gz` for static CSS/JS when available."""
+    path = request.path
+    for url_prefix, directory in static_roots.items():
+        if not path.startswith(url_prefix):
+            continue
+        relative = path[len(url_prefix):]
+        if not relative.endswith(PRECOMPRESS_EXTENSIONS):
+            return None
+        source = os.path.realpath(os.path.join(directory, relative))
+        if not source.startswith(os.path.realpath(directory) + os.sep) or not os.path.isfile(source):
+            return None
+        accepted = _accepted_encodings()
+        for encoding, suffix in ENCODING_SUFFIXES:
+            if encoding not in accepted:
+                continue
+            candidate = source + suffix
+            # Solo si está al día respecto al original
+            if os.path.isfile(candidate) and os.path.getmtime(candidate) >= os.path.getmtime(source):
+                mimetype = mimetypes.guess_type(source)[0] or 'application/octet-stream'
+                response = send_file(candidate, mimetype=mimetype, conditional=True,
+                                     max_age=None)
+                response.headers['Content-Encoding'] = encoding
+                _add_vary(response)
+                return response
+        return None
+    return None
+
+
+def init_app(app, static_roots=None):
+    """Enable response compression on `app`.
+
+    `static_roots` maps URL prefixes (e.g. '/static/', '/dashboard/assets/')
+    to directories whose precompressed CSS/JS should be served as-is.
+    """
+    app.config.setdefault('COMPRESS_ENABLED', True)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BR_LEVEL', 5)
+    static_roots = dict(static_roots or {})
+
+    if not app.config['COMPRESS_ENABLED']:
+        return
+
+    if static_roots:
+        @app.before_request
+        def _serve_precompressed():
+            if request.method in ('GET', 'HEAD'):
+                return _precompressed_response(static_roots)
+            return None
+
+    @app.after_request
+    def _compress_response(response):
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in app.config['COMPRESS_MIMETYPES']
+        ):
+            return response
+        # Streamed bodies (CSV exports) were filtered above; this is in memory
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+        encoding = _choose_encoding(_accepted_encodings())
+        _add_vary(response)
+        if encoding is None:
+            return response
+        level = app.config['COMPRESS_BR_LEVEL'] if encoding == 'br' else app.config['COMPRESS_GZIP_LEVEL']
+        response.set_data(compress_bytes(data, encoding, level))
+        response.headers['Content-Encoding'] = encoding
+        if response.headers.get('ETag'):
+            # La representación comprimida es distinta: ETag débil
+            etag, weak = response.get_etag()
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def precompress_directory(directory, min_size=1024):
+    """Write `.gz` (and `.br` if brotli is installed) next to CSS/JS files."""
+    written = []
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(PRECOMPRESS_EXTENSIONS):
+                continue
+            source = os.path.join(root, name)
+            if os.path.getsize(source) < min_size:
+                continue
+            with open(source, 'rb') as fh:
+                data = fh.read()
+            for encoding, suffix in ENCODING_SUFFIXES:
+                if encoding == 'br' and brotli is None:
+                    continue
+                target = source + suffix
+                if os.path.isfile(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+                    continue
+                level = 11 if encoding == 'br' else 9
+                with open(target, 'wb') as fh:
+                    fh.write(compress_bytes(data, encoding, level))
+                written.append(target)
+    return written
+
+
+def register_commands(app, directories):
+    @app.cli.command('compress-static')
+    def compress_static_command():
+        """Genera versiones .gz/.br de los CSS/JS de static/ y assets/."""
+        if brotli is None:
+            click.echo('brotli no está instalado: solo se generan .gz')
+        for directory in directories:
+            for path in precompress_directory(directory):
+                click.echo(f'Comprimido: {path}')
@@ -0,0 +1,183 @@
+"""Embedded DuckDB backend for the diag (`/diag_cap/`) ad-hoc reports.
+
+`flask diag-export-parquet` copies each monthly
+`dwsge.dw_consulta_externa_homologacion_<anio>_<periodo>` partition (only the
+columns the report uses, ordered by centro so Parquet row-group statistics
+can skip whole blocks) and the dimension tables to `DIAG_PARQUET_DIR`.
+
+`run_query(sql, params, table_suffix)` then runs the *same* report SQL in an
+in-process DuckDB: the `dwsge.*` names are views over `read_parquet(...)`, so
+filters are pushed down into the Parquet scan and the heavy exploratory
+queries no longer hit DW_ESTADISTICA. Values are exported as text, which is
+how the report shows them anyway (`sanitize_dataframe`).
+
+Only closed months (`backend.dw_periods.month_closed`) are exported, and an
+export is only used if it was written after its month closed: a month the
+DW is still loading always goes to Postgres.
+
+duckdb and pyarrow are optional; without them (or without the export for a
+month) the report keeps running on Postgres.
+"""
+import logging
+import os
+import re
+from datetime import date
+
+import pandas as pd
+
+from backend.dw_periods import month_closed
+
+try:
+    import duckdb
+except ImportError:  # duckdb es opcional: sin él se consulta Postgres
+    duckdb = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+PARQUET_DIR = os.environ.get(
+    'DIAG_PARQUET_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'parquet'),
+)
+# auto: DuckDB si hay export del mes; postgres lo desactiva
+ENGINE = os.environ.get('DIAG_REPORT_ENGINE', 'auto').strip().lower()
+# Hilos de DuckDB por consulta: no competir con los dashboards por la CPU
+THREADS = int(os.environ.get('DIAG_DUCKDB_THREADS', '4'))
+EXPORT_CHUNKSIZE = 200_000
+
+SCHEMA = 'dwsge'
+FACT_PREFIX = 'dw_consulta_externa_homologacion_'
+FACT_COLUMNS = (
+    'cod_oricentro', 'cod_centro', 'periodo', 'anio', 'cod_servicio', 'cod_actividad',
+    'cod_subactividad', 'dni_medico', 'acto_med', 'doc_paciente', 'anio_edad', 'sexo', 'cod_diag',
+)
+DIMENSION_TABLES = (
+    'sgss_cmdia10_chapter',
+    'sgss_cmsho10',
+    'sgss_cmcas10',
+    'sgss_cmace10',
+    'sgss_cmact10',
+    'sgss_cmras10',
+)
+
+_SUFFIX = re.compile(r'^\d{4}_\d{2}$')
+_NAMED_PARAM = re.compile(r'(?<!:):(\w+)')
+
+
+def _parquet_path(table):
+    return os.path.join(PARQUET_DIR, f'{table}.parquet')
+
+
+def _month_closed(table_suffix):
+    anio, periodo = table_suffix.split('_')
+    return month_closed(anio, periodo)
+
+
+def _export_final(table_suffix):
+    """True when the fact export exists and was written after its month closed."""
+    path = _parquet_path(f'{FACT_PREFIX}{table_suffix}')
+    if not os.path.isfile(path):
+        return False
+    anio, periodo = table_suffix.split('_')
+    return month_closed(anio, periodo, today=date.fromtimestamp(os.path.getmtime(path)))
+
+
+def available(table_suffix):
+    """True when DuckDB can answer reports for `table_suffix`."""
+    if ENGINE == 'postgres' or duckdb is None or not _SUFFIX.match(str(table_suffix or '')):
+        return False
+    if not _month_closed(table_suffix) or not _export_final(table_suffix):
+        return False
+    return all(os.path.isfile(_parquet_path(table)) for table in DIMENSION_TABLES)
+
+
+def run_query(sql, params, table_suffix):
+    """Run report `sql` (SQLAlchemy `:name` params) over the Parquet export."""
+    con = duckdb.connect(database=':memory:')
+    try:
+        con.execute(f'SET threads = {max(THREADS, 1)}')
+        con.execute(f'CREATE SCHEMA {SCHEMA}')
+        for table in (f'{FACT_PREFIX}{table_suffix}', *DIMENSION_TABLES):
+            path = _parquet_path(table).replace("'", "''")
+            con.execute(f"CREATE VIEW {SCHEMA}.{table} AS SELECT * FROM read_parquet('{path}')")
+        return con.execute(_NAMED_PARAM.sub(r'$\1', sql), params).df()
+    finally:
+        con.close()
+
+
+# ---------------------------------------------------------------------------
+# Export (`flask diag-export-parquet`)
+# ---------------------------------------------------------------------------
+def list_partitions(engine):
+    query = (
+        "SELECT table_name FROM information_schema.tables "
+        f"WHERE table_schema = '{SCHEMA}' AND table_name LIKE '{FACT_PREFIX}%%'"
+    )
+    names = pd.read_sql(query, engine)['table_name']
+    suffixes = (name[len(FACT_PREFIX):] for name in names)
+    return sorted(s for s in suffixes if _SUFFIX.match(s))
+
+
+def _export_table(engine, table, query):
+    """Stream `query` into `<table>.parquet` in chunks; returns rows written."""
+    target = _parquet_path(table)
+    tmp = f'{target}.tmp'
+    writer = None
+    schema = None
+    rows = 0
+    try:
+        for chunk in pd.read_sql(query, engine, chunksize=EXPORT_CHUNKSIZE):
+            # Texto como en el reporte; los nulos se mantienen nulos
+            chunk = chunk.astype('string')
+            table_chunk = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if writer is None:
+                schema = table_chunk.schema
+                writer = pq.ParquetWriter(tmp, schema, compression='zstd')
+            writer.write_table(table_chunk)
+            rows += len(chunk)
+        if writer is None:
+            return 0
+        writer.close()
+        writer = None
+        os.replace(tmp, target)
+        return rows
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def export_parquet(engine, suffixes=None, force=False, dimensions=True):
+    """Export closed fact partitions (default: the ones without a final export) and dimensions.
+
+    Months still open are skipped, even when listed in `suffixes`. Returns
+    a list of `(table, rows)`.
+    """
+    if pa is None:
+        raise RuntimeError('pyarrow no está instalado: no se puede exportar a Parquet')
+    os.makedirs(PARQUET_DIR, exist_ok=True)
+    exported = []
+    if dimensions:
+        for table in DIMENSION_TABLES:
+            exported.append((table, _export_table(engine, table, f'SELECT * FROM {SCHEMA}.{table}')))
+    for suffix in suffixes or list_partitions(engine):
+        if not _SUFFIX.match(suffix):
+            raise ValueError(f'Partición inválida: {suffix}')
+        table = f'{FACT_PREFIX}{suffix}'
+        if not _month_closed(suffix):
+            logger.info('Omitida %s: el mes sigue abierto en el DW', table)
+            continue
+        if not force and not suffixes and _export_final(suffix):
+            continue
+        columns = ', '.join(FACT_COLUMNS)
+        # Orden por centro/servicio: estadísticas por row group útiles para los filtros
+        query = f'SELECT {columns} FROM {SCHEMA}.{table} ORDER BY cod_centro, cod_servicio'
+        exported.append((table, _export_table(engine, table, query)))
+        logger.info('Exportada %s', table)
+    return exported
@@ -0,0 +1,23 @@
+"""When a monthly DW partition (`dwsge.<tabla>_<anio>_<periodo>`) is final.
+
+The warehouse keeps reloading a month for `MONTH_CLOSE_DAYS` days after it
+ends. Anything derived from a partition and kept (Indicadores snapshots,
+the diag Parquet export) is only safe once the month is closed.
+"""
+import os
+from datetime import date
+
+MONTH_CLOSE_DAYS = int(os.environ.get(
+    'DW_MONTH_CLOSE_DAYS', os.environ.get('INDICADORES_SNAPSHOT_CLOSE_DAYS', '15')
+))
+
+
+def month_closed(anio, periodo, today=None, close_days=None):
+    """True when the DW no longer reloads month `anio`/`periodo` as of `today`."""
+    today = today or date.today()
+    close_days = MONTH_CLOSE_DAYS if close_days is None else close_days
+    year, month = int(anio), int(periodo)
+    # Primer día del mes siguiente + días de gracia
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    months_after = (today.year - next_year) * 12 + today.month - next_month
+    return months_after > 0 or (months_after == 0 and today.day > close_days)
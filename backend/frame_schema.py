@@ -0,0 +1,110 @@
+"""Declared dtypes for the columns the warehouse (`dwsge`) queries return.
+
+`pd.read_sql` leaves labels such as `agrupador` or `servhosdes` as Python
+strings repeated on every row, dates as `'DD/MM/YYYY'` text and numbers
+wherever the driver put them. `apply_schema(df)` converts every column
+listed in `COLUMN_TYPES` once, right after the fetch:
+
+- `category`: labels (a few hundred distinct values over a whole month)
+- `int16` / `int32`: counters and ages, only when the column has no nulls
+- `float32` / `float64`: measures; hours stay float64 because they are
+  summed over a whole month and shown with two decimals
+- `date:<format>` / `date`: parsed to `datetime64`; values that do not
+  match the format are parsed without it, the rest become `NaT`
+
+Categorical columns need two precautions downstream: group with
+`observed=True` (otherwise several keys give their cartesian product) and
+fill nulls with `fill_label`, since `fillna` cannot add a new label.
+"""
+import numpy as np
+import pandas as pd
+
+COLUMN_TYPES = {
+    # Etiquetas
+    'agrupador': 'category',
+    'servhosdes': 'category',
+    'especialidad': 'category',
+    'actespnom': 'category',
+    'diagdes': 'category',
+    'cenasides': 'category',
+    'sexo': 'category',
+    # Conteos y edades
+    'anio_edad': 'int16',
+    'cantidad': 'int32',
+    'cantidad_medicos': 'int32',
+    # Medidas
+    'horas_efec_def': 'float64',
+    'total_horas': 'float64',
+    # Fechas
+    'fecha_atencion': 'date:%d/%m/%Y',
+    'fecha_prog': 'date',
+}
+
+
+def _to_category(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    if not pd.api.types.is_object_dtype(serie):
+        return serie
+    return serie.astype('category')
+
+
+def _to_int(serie, dtype):
+    numeric = pd.to_numeric(serie, errors='coerce')
+    if numeric.isna().any():
+        return numeric
+    bounds = np.iinfo(dtype)
+    if numeric.min() < bounds.min or numeric.max() > bounds.max:
+        return numeric
+    return numeric.astype(dtype)
+
+
+def _to_date(serie, fmt=None):
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    if fmt is None:
+        return pd.to_datetime(serie, errors='coerce')
+    parsed = pd.to_datetime(serie, format=fmt, errors='coerce')
+    retry = parsed.isna() & serie.notna()
+    if retry.any():
+        parsed.loc[retry] = pd.to_datetime(serie[retry], errors='coerce')
+    return parsed
+
+
+def convert_column(serie, kind):
+    """`serie` converted to the `COLUMN_TYPES` kind `kind`."""
+    if kind == 'category':
+        return _to_category(serie)
+    if kind in ('int16', 'int32'):
+        return _to_int(serie, kind)
+    if kind in ('float32', 'float64'):
+        return pd.to_numeric(serie, errors='coerce').astype(kind)
+    if kind == 'date':
+        return _to_date(serie)
+    if kind.startswith('date:'):
+        return _to_date(serie, kind[len('date:'):])
+    raise ValueError(f'Tipo de columna desconocido: {kind}')
+
+
+def apply_schema(df):
+    """Convert in place the columns of `df` declared in `COLUMN_TYPES`; returns `df`."""
+    if df is None or df.empty:
+        return df
+    for column in df.columns.intersection(list(COLUMN_TYPES)):
+        df[column] = convert_column(df[column], COLUMN_TYPES[column])
+    return df
+
+
+def fill_label(serie, label, blanks=False):
+    """`serie.fillna(label)` that also works on categorical columns.
+
+    `blanks=True` also replaces empty strings with `label`.
+    """
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.fillna(label)
+        return serie.replace('', label) if blanks else serie
+    if blanks and '' in serie.cat.categories:
+        serie = serie.cat.remove_categories([''])
+    if serie.isna().any() and label not in serie.cat.categories:
+        serie = serie.cat.add_categories([label])
+    return serie.fillna(label)
@@ -0,0 +1,353 @@
+"""In-process metrics exposed in Prometheus text format at `/metrics`.
+
+Recorded here:
+
+- `dash_callback_duration_seconds{app,callback}`: every
+  `_dash-update-component` request, keyed by the callback's output id
+  (`instrument_dash(server)` on each Flask server hosting Dash apps); only
+  apps passed to `register_dash_app` and output ids in their
+  `callback_map` become labels, anything else is `desconocido`
+- `db_query_duration_seconds{query}` / `db_query_rows_total{query}` /
+  `db_query_errors_total{query}`: named warehouse queries, through
+  `track_query(name, loader)` or `observe_query(...)`
+- `db_pool_*{database}`: checked-out / overflow / size of every live
+  SQLAlchemy engine and the time spent waiting for a pooled connection
+- `cache_requests_total{cache,result}` and `cache_hit_ratio{cache}`
+- gauges from `register_collector(fn)` (audit queue depth, user cache)
+
+Values live in the process: with several waitress processes each one is
+scraped on its own. `/metrics` answers to an admin session or, for the
+scraper, to `Authorization: Bearer <METRICS_TOKEN>`.
+"""
+import hmac
+import logging
+import math
+import threading
+import time
+import weakref
+
+from flask import Response, abort, current_app, g, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from backend.sql_tagging import dash_app_prefix, query_scope
+
+logger = logging.getLogger(__name__)
+
+# Segundos; cubren desde un callback trivial hasta un reporte pesado
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_HELP = {
+    'dash_callback_duration_seconds': ('histogram', 'Duración de los callbacks Dash.'),
+    'dash_callback_errors_total': ('counter', 'Callbacks Dash que respondieron 5xx.'),
+    'db_query_duration_seconds': ('histogram', 'Duración de las consultas con nombre.'),
+    'db_query_rows_total': ('counter', 'Filas devueltas por las consultas con nombre.'),
+    'db_query_errors_total': ('counter', 'Consultas con nombre que fallaron.'),
+    'db_pool_wait_seconds': ('histogram', 'Espera para obtener una conexión del pool.'),
+    'db_pool_checked_out': ('gauge', 'Conexiones en uso.'),
+    'db_pool_overflow': ('gauge', 'Conexiones por encima de pool_size.'),
+    'db_pool_size': ('gauge', 'pool_size configurado (suma de engines vivos).'),
+    'db_pool_engines': ('gauge', 'Engines SQLAlchemy vivos.'),
+    'cache_requests_total': ('counter', 'Consultas a caché por resultado (hit/miss).'),
+    'cache_hit_ratio': ('gauge', 'Proporción de aciertos de la caché.'),
+    'audit_queue_depth': ('gauge', 'Filas de auditoría en cola.'),
+    'audit_queue_max': ('gauge', 'Capacidad de la cola de auditoría.'),
+    'audit_rows_total': ('counter', 'Filas de auditoría por resultado.'),
+}
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'total', 'count')
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+        self.total += value
+        self.count += 1
+
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_collectors = []
+_engines = weakref.WeakSet()
+_dash_apps = {}
+UNKNOWN = 'desconocido'
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name, value, **labels):
+    """Add `value` to histogram `name`."""
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = _Histogram()
+        hist.observe(value)
+
+
+def inc(name, amount=1, **labels):
+    """Increase counter `name` by `amount`."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def register_collector(collector):
+    """`collector()` returns `[(name, labels, value)]` gauges read at scrape time."""
+    _collectors.append(collector)
+
+
+# ---------------------------------------------------------------------------
+# Consultas, cachés y pools
+# ---------------------------------------------------------------------------
+def observe_query(name, seconds, rows=None, error=False):
+    observe('db_query_duration_seconds', seconds, query=name)
+    if rows is not None:
+        inc('db_query_rows_total', rows, query=name)
+    if error:
+        inc('db_query_errors_total', query=name)
+
+
+def track_query(name, loader):
+    """`loader()` timed as query `name`; rows counted with `len()` of the result.
+
+    The statements it runs carry `query=<name>` in their SQL comment.
+    """
+    start = time.perf_counter()
+    try:
+        with query_scope(name):
+            result = loader()
+    except Exception:
+        observe_query(name, time.perf_counter() - start, error=True)
+        raise
+    rows = len(result) if result is not None and hasattr(result, '__len__') else None
+    observe_query(name, time.perf_counter() - start, rows)
+    return result
+
+
+def cache_event(cache, hit):
+    inc('cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+
+def _timed_checkout(pool, database):
+    do_get = pool._do_get
+
+    def _do_get():
+        start = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            observe('db_pool_wait_seconds', time.perf_counter() - start, database=database)
+
+    # Pool._do_get es interno pero estable (1.4 / 2.0): único punto con la espera real
+    pool._do_get = _do_get
+
+
+def watch_engine(engine):
+    """Include `engine`'s pool in the `db_pool_*` metrics (idempotent)."""
+    with _lock:
+        if engine in _engines:
+            return
+        _engines.add(engine)
+    if hasattr(engine.pool, '_do_get'):
+        _timed_checkout(engine.pool, engine.url.database or 'sin_nombre')
+
+
+def _on_engine_connect(conn, *args):
+    watch_engine(conn.engine)
+
+
+def _pool_gauges():
+    totals = {}
+    for engine in list(_engines):
+        database = engine.url.database or 'sin_nombre'
+        pool = engine.pool
+        stats = totals.setdefault(database, {'checked_out': 0, 'overflow': 0, 'size': 0, 'engines': 0})
+        stats['engines'] += 1
+        for key, attr in (('checked_out', 'checkedout'), ('overflow', 'overflow'), ('size', 'size')):
+            method = getattr(pool, attr, None)
+            if method is not None:
+                stats[key] += max(int(method()), 0)
+    gauges = []
+    for database, stats in totals.items():
+        labels = {'database': database}
+        gauges.extend([
+            ('db_pool_checked_out', labels, stats['checked_out']),
+            ('db_pool_overflow', labels, stats['overflow']),
+            ('db_pool_size', labels, stats['size']),
+            ('db_pool_engines', labels, stats['engines']),
+        ])
+    return gauges
+
+
+def _cache_ratios():
+    hits, totals = {}, {}
+    with _lock:
+        items = list(_counters.items())
+    for (name, labels), value in items:
+        if name != 'cache_requests_total':
+            continue
+        labels = dict(labels)
+        totals[labels['cache']] = totals.get(labels['cache'], 0) + value
+        if labels['result'] == 'hit':
+            hits[labels['cache']] = hits.get(labels['cache'], 0) + value
+    return [('cache_hit_ratio', {'cache': cache}, hits.get(cache, 0) / total)
+            for cache, total in totals.items() if total]
+
+
+# ---------------------------------------------------------------------------
+# Callbacks Dash
+# ---------------------------------------------------------------------------
+def register_dash_app(dash_app):
+    """Accept `dash_app`'s prefix and callbacks as metric labels."""
+    _dash_apps[dash_app.config.routes_pathname_prefix] = dash_app
+
+
+def _callback_labels():
+    # Prefijo y output vienen del cliente: solo valores conocidos, para no
+    # crear una serie por cada valor inventado
+    dash_app = _dash_apps.get(dash_app_prefix())
+    if dash_app is None:
+        return {'app': UNKNOWN, 'callback': UNKNOWN}
+    output = (request.get_json(silent=True) or {}).get('output')
+    callback = output if isinstance(output, str) and output in dash_app.callback_map else UNKNOWN
+    return {'app': dash_app.config.routes_pathname_prefix, 'callback': callback}
+
+
+def instrument_dash(server):
+    """Time the Dash callback requests served by `server`."""
+
+    @server.before_request
+    def _metrics_start():
+        if dash_app_prefix() is not None:
+            g._metrics_start = time.perf_counter()
+
+    @server.after_request
+    def _metrics_callback(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            labels = _callback_labels()
+            observe('dash_callback_duration_seconds', time.perf_counter() - start, **labels)
+            if response.status_code >= 500:
+                inc('dash_callback_errors_total', **labels)
+        return response
+
+
+# ---------------------------------------------------------------------------
+# Exposición
+# ---------------------------------------------------------------------------
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels, extra=None):
+    items = list(labels) + list((extra or {}).items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """All metrics in Prometheus text exposition format (0.0.4)."""
+    with _lock:
+        histograms = {k: (list(h.buckets), h.total, h.count) for k, h in _histograms.items()}
+        counters = dict(_counters)
+    gauges = _pool_gauges() + _cache_ratios()
+    for collector in _collectors:
+        try:
+            gauges.extend(collector())
+        except Exception as exc:
+            logger.warning('Colector de métricas falló: %s', exc)
+
+    samples = {}
+    for (name, labels), (buckets, total, count) in histograms.items():
+        lines = samples.setdefault(name, [])
+        for bound, value in zip(BUCKETS, buckets):
+            lines.append(f'{name}_bucket{_labels(labels, {"le": _number(bound)})} {value}')
+        lines.append(f'{name}_bucket{_labels(labels, {"le": "+Inf"})} {count}')
+        lines.append(f'{name}_sum{_labels(labels)} {_number(total)}')
+        lines.append(f'{name}_count{_labels(labels)} {count}')
+    for (name, labels), value in counters.items():
+        samples.setdefault(name, []).append(f'{name}{_labels(labels)} {_number(value)}')
+    for name, labels, value in gauges:
+        samples.setdefault(name, []).append(f'{name}{_labels(sorted(labels.items()))} {_number(value)}')
+
+    out = []
+    for name in sorted(samples):
+        kind, help_text = _HELP.get(name, ('gauge', ''))
+        if help_text:
+            out.append(f'# HELP {name} {help_text}')
+        out.append(f'# TYPE {name} {kind}')
+        out.extend(samples[name])
+    return '\n'.join(out) + '\n'
+
+
+def _authorized():
+    token = current_app.config.get('METRICS_TOKEN')
+    header = request.headers.get('Authorization', '')
+    if token and header.startswith('Bearer '):
+        return hmac.compare_digest(header[len('Bearer '):].strip(), token)
+    return current_user.is_authenticated and getattr(current_user, 'role', None) == 'admin'
+
+
+def _metrics_view():
+    if not _authorized():
+        abort(403)
+    return Response(render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _audit_gauges():
+    from backend.audit_logging import get_audit_writer
+
+    writer = get_audit_writer()
+    if writer is None:
+        return []
+    stats = writer.stats()
+    gauges = [
+        ('audit_queue_depth', {}, stats['queue_depth']),
+        ('audit_queue_max', {}, stats['queue_max']),
+    ]
+    for result in ('submitted', 'written', 'dropped', 'failed'):
+        gauges.append(('audit_rows_total', {'result': result}, stats[result]))
+    return gauges
+
+
+def _user_cache_gauges():
+    from backend.models import user_cache_stats
+
+    stats = user_cache_stats()
+    labels = {'cache': 'usuarios'}
+    return [
+        ('cache_requests_total', {**labels, 'result': 'hit'}, stats['hits']),
+        ('cache_requests_total', {**labels, 'result': 'miss'}, stats['misses']),
+        ('cache_hit_ratio', labels, stats['hit_ratio']),
+    ]
+
+
+def init_app(app):
+    """Register `/metrics`, Dash timing on `app`, the pool listener and the
+    audit queue / user cache gauges."""
+    app.add_url_rule('/metrics', 'metrics', _metrics_view)
+    instrument_dash(app)
+    if not _collectors:
+        register_collector(_audit_gauges)
+        register_collector(_user_cache_gauges)
+    if not event.contains(Engine, 'engine_connect', _on_engine_connect):
+        event.listen(Engine, 'engine_connect', _on_engine_connect)
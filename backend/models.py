@@ -1,4 +1,8 @@
+import threading
+import time
+
 from flask_login import UserMixin
+from sqlalchemy.orm import make_transient_to_detached
 from werkzeug.security import check_password_hash, generate_password_hash
 from extensions import db, login_manager
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
@@ -112,6 +116,100 @@ class User(UserMixin, db.Model):
             return s.zfill(3)
         return s
 
+class UserIdentityCache:
+    """Cache en memoria de los datos de usuario que usa `load_user`.
+
+    Guarda una copia de las columnas de `User` por id durante `ttl`
+    segundos. Cada request recibe su propia instancia reconstruida, así que
+    nunca se comparten objetos ORM entre hilos. Se debe invalidar
+    explícitamente al modificar un usuario (ver routes.py).
+    """
+
+    def __init__(self, ttl=300, max_entries=5000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            if entry is not None:
+                del self._entries[user_id]
+        return None
+
+    def put(self, user_id, values, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time.monotonic()
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[user_id] = (expires, values)
+
+    def invalidate(self, user_id=None):
+        """Elimina un usuario del cache, o todo el cache si `user_id` es None."""
+        with self._lock:
+            self.invalidations += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(int(user_id), None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'size': len(self._entries),
+                'hit_ratio': (self.hits / total) if total else 0.0,
+            }
+
+
+user_cache = UserIdentityCache()
+
+_USER_COLUMNS = [column.key for column in User.__table__.columns]
+
+
+def invalidate_user_cache(user_id=None):
+    user_cache.invalidate(user_id)
+
+
+def user_cache_stats():
+    return user_cache.stats()
+
+
+def _user_from_values(values):
+    user = User(**values)
+    # Marca la instancia como ya persistida (sin cambios pendientes) y la
+    # asocia a la sesión del request sin consultar la base de datos.
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
\ No newline at end of file
+    try:
+        key = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    ttl = current_app.config.get('USER_CACHE_TTL', user_cache.ttl)
+    if ttl:
+        values = user_cache.get(key)
+        if values is not None:
+            return _user_from_values(values)
+    user = User.query.get(key)
+    if user is not None and ttl:
+        user_cache.put(key, {col: getattr(user, col) for col in _USER_COLUMNS}, ttl=ttl)
+    return user
\ No newline at end of file
@@ -0,0 +1,239 @@
+"""On-demand profiling of single requests, for admins.
+
+An admin turns it on for:
+
+- one request: `X-Profile: 1` header or `?profile=1` query flag
+- a few minutes of Dash callbacks: `?profile=1` on a page (e.g.
+  `/dashboard/?profile=1`) also opens a session window of
+  `PROFILE_SESSION_MINUTES` during which every `_dash-update-component`
+  request of that session is profiled; `?profile=0` closes it
+
+The request runs under pyinstrument (sampling, HTML flame view) when it is
+installed, otherwise under cProfile (text report sorted by cumulative
+time). Only the request thread is sampled: queries fanned out to a thread
+pool show up as the wait on their futures. cProfile allows one active
+profiler per process (Python 3.12+), so with it concurrent callbacks are
+profiled one at a time and the rest run unprofiled. Reports are kept in
+`PROFILE_DIR` (the newest `PROFILE_KEEP`) with a JSON sidecar and listed
+at `/logs/profiles`.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import g, request, session
+from flask_login import current_user
+
+from backend.sql_tagging import current_tags, dash_app_prefix, dash_callback_id
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # pyinstrument es opcional: sin él, cProfile
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.environ.get(
+    'PROFILE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'profiles'),
+)
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '50'))
+PROFILE_SESSION_MINUTES = int(os.environ.get('PROFILE_SESSION_MINUTES', '10'))
+# Intervalo de muestreo de pyinstrument (segundos)
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', '0.001'))
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ARG = 'profile'
+SESSION_KEY = 'profile_until'
+
+_prune_lock = threading.Lock()
+# Un solo cProfile activo a la vez (sys.monitoring en 3.12+)
+_cprofile_lock = threading.Lock()
+
+
+def _is_admin():
+    return current_user.is_authenticated and getattr(current_user, 'role', None) == 'admin'
+
+
+def _flag(value):
+    return (value or '').strip().lower() in ('1', 'true', 'on', 'si')
+
+
+def _session_window():
+    until = session.get(SESSION_KEY)
+    if not until:
+        return False
+    if datetime.fromisoformat(until) < datetime.now():
+        session.pop(SESSION_KEY, None)
+        return False
+    return True
+
+
+def _wanted():
+    """Whether the current request is profiled; opens/closes the session window."""
+    arg = request.args.get(PROFILE_ARG)
+    if arg is None and PROFILE_HEADER not in request.headers and SESSION_KEY not in session:
+        return False
+    if not _is_admin():
+        return False
+    if arg is not None:
+        if not _flag(arg):
+            session.pop(SESSION_KEY, None)
+            return False
+        until = datetime.now() + timedelta(minutes=PROFILE_SESSION_MINUTES)
+        session[SESSION_KEY] = until.isoformat(timespec='seconds')
+        return True
+    if _flag(request.headers.get(PROFILE_HEADER)):
+        return True
+    return dash_app_prefix() is not None and _session_window()
+
+
+# ---------------------------------------------------------------------------
+# Perfilado
+# ---------------------------------------------------------------------------
+def _start():
+    """Started profiler, or None when this request cannot be profiled now."""
+    if Profiler is not None:
+        profiler = Profiler(interval=PROFILE_INTERVAL, async_mode='disabled')
+        profiler.start()
+        return profiler
+    if not _cprofile_lock.acquire(blocking=False):
+        return None
+    try:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    except Exception:
+        _cprofile_lock.release()
+        raise
+    return profiler
+
+
+def _stop(profiler):
+    if Profiler is not None:
+        profiler.stop()
+        return
+    try:
+        profiler.disable()
+    finally:
+        _cprofile_lock.release()
+
+
+def _report(profiler):
+    """`(extension, content)` of the stopped profiler."""
+    if Profiler is not None:
+        return 'html', profiler.output_html()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(80)
+    return 'txt', out.getvalue()
+
+
+def _slug(value):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', value).strip('_')[:80] or 'raiz'
+
+
+def _prune():
+    with _prune_lock:
+        metas = sorted(f for f in os.listdir(PROFILE_DIR) if f.endswith('.json'))
+        for meta in metas[:max(len(metas) - PROFILE_KEEP, 0)]:
+            stem = meta[:-len('.json')]
+            for ext in ('.json', '.html', '.txt'):
+                try:
+                    os.remove(os.path.join(PROFILE_DIR, stem + ext))
+                except FileNotFoundError:
+                    pass
+
+
+def _save(profiler, meta):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    ext, content = _report(profiler)
+    stem = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{_slug(meta['callback'] or meta['path'])}"
+    meta['file'] = f'{stem}.{ext}'
+    with open(os.path.join(PROFILE_DIR, meta['file']), 'w', encoding='utf-8') as fh:
+        fh.write(content)
+    with open(os.path.join(PROFILE_DIR, f'{stem}.json'), 'w', encoding='utf-8') as fh:
+        json.dump(meta, fh, ensure_ascii=False)
+    _prune()
+
+
+def list_profiles():
+    """Metadata of the stored reports, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, name), encoding='utf-8') as fh:
+                profiles.append(json.load(fh))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def profile_path(name):
+    """Path of stored report `name`, or None if it is not one of ours."""
+    if name != os.path.basename(name) or not name.endswith(('.html', '.txt')):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+# ---------------------------------------------------------------------------
+# Integración con Flask
+# ---------------------------------------------------------------------------
+def instrument_requests(server):
+    """Profile the requests of `server` that an admin flagged."""
+
+    @server.before_request
+    def _profile_start():
+        if not _wanted():
+            return
+        try:
+            profiler = _start()
+        except Exception as exc:
+            logger.warning('No se pudo iniciar el perfilador para %s: %s', request.path, exc)
+            return
+        if profiler is None:
+            logger.info('Perfilador ocupado: %s se atiende sin perfilar', request.path)
+            return
+        prefix = dash_app_prefix()
+        g._profile = {
+            'profiler': profiler,
+            'start': time.perf_counter(),
+            'meta': {
+                'fecha': datetime.now().isoformat(timespec='seconds'),
+                'path': request.full_path.rstrip('?'),
+                'dash': prefix,
+                'callback': dash_callback_id() if prefix is not None else None,
+                'user': getattr(current_user, 'username', None),
+                'request_id': current_tags().get('request_id'),
+                'motor': 'pyinstrument' if Profiler is not None else 'cProfile',
+            },
+        }
+
+    @server.teardown_request
+    def _profile_stop(exc=None):
+        state = g.pop('_profile', None)
+        if state is None:
+            return
+        profiler = state['profiler']
+        _stop(profiler)
+        meta = state['meta']
+        meta['ms'] = round((time.perf_counter() - state['start']) * 1000, 1)
+        meta['error'] = repr(exc) if exc is not None else None
+        try:
+            _save(profiler, meta)
+        except Exception as err:
+            logger.warning('No se pudo guardar el perfil de %s: %s', meta['path'], err)
+
+
+def init_app(app):
+    """Profile flagged requests served by `app`."""
+    instrument_requests(app)
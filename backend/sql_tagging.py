@@ -0,0 +1,290 @@
+"""SQL comments identifying who issued each statement, and a slow-query log.
+
+Every statement executed through SQLAlchemy (and the Arrow readers of
+`backend.arrow_fetch`) gets a sqlcommenter-style trailing comment:
+
+    SELECT ... /*app='sge',callback='...',dash='/dashboard/',query='consulta.atenciones',request_id='...'*/
+
+so `pg_stat_activity`, the Postgres log and `auto_explain` show the Dash
+app, callback, logical query name (`metrics.track_query`) and request id.
+Values are not url-encoded as in sqlcommenter: only `SAFE_TAG_CHARS` are
+kept (no `*`, quotes or `%`), so a value can neither close the comment
+nor break the driver's `%s` interpolation. The request id is always
+generated here; a client `X-Request-ID` is only kept if it is hex/uuid.
+The request tags live in context variables; code that fans out to worker
+threads wraps the job with `propagate(fn)`.
+
+Statements slower than `SLOW_QUERY_MS` are queued to a background thread
+that runs `EXPLAIN (FORMAT JSON)` (plan only, not ANALYZE) on its own
+connection and appends the entry as a JSON line to `SLOW_QUERY_LOG`
+(rotated). Admins browse it at `/logs/slow`.
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+APP_NAME = os.environ.get('SQL_TAG_APP', 'sge')
+SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', '2000'))
+SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', '1') != '0'
+SLOW_QUERY_LOG = os.environ.get(
+    'SLOW_QUERY_LOG',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'slow_queries.log'),
+)
+SLOW_QUERY_LOG_BYTES = 5 * 1024 * 1024
+# Consultas lentas pendientes de EXPLAIN; las que no caben se registran sin plan
+SLOW_QUERY_QUEUE = 200
+MAX_STATEMENT_CHARS = 20000
+MAX_TAG_CHARS = 200
+DASH_UPDATE = '_dash-update-component'
+SAFE_TAG_CHARS = r'A-Za-z0-9_.:/\-{}",'
+_UNSAFE_TAG_CHARS = re.compile(f'[^{SAFE_TAG_CHARS}]')
+_REQUEST_ID = re.compile(r'^[0-9a-fA-F-]{8,36}$')
+
+_request_tags = contextvars.ContextVar('sql_request_tags', default={})
+_query_name = contextvars.ContextVar('sql_query_name', default=None)
+
+_slow_logger = None
+_slow_queue = queue.Queue(maxsize=SLOW_QUERY_QUEUE)
+_worker = None
+_worker_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Etiquetas
+# ---------------------------------------------------------------------------
+def current_tags():
+    tags = {'app': APP_NAME, **_request_tags.get()}
+    name = _query_name.get()
+    if name:
+        tags['query'] = name
+    return tags
+
+
+@contextmanager
+def query_scope(name):
+    """Tag the statements run inside the block with query `name`."""
+    token = _query_name.set(name)
+    try:
+        yield
+    finally:
+        _query_name.reset(token)
+
+
+def propagate(fn):
+    """`fn` running with the caller's tags (for `ThreadPoolExecutor` jobs)."""
+    context = contextvars.copy_context()
+
+    def wrapper(*args, **kwargs):
+        # Un Context no se puede usar desde dos hilos a la vez: copia por llamada
+        return context.copy().run(fn, *args, **kwargs)
+
+    return wrapper
+
+
+def _clean(value):
+    # Lista blanca: sin '*' no hay '/*' ni '*/' posibles dentro del comentario
+    return _UNSAFE_TAG_CHARS.sub('', str(value))[:MAX_TAG_CHARS]
+
+
+def comment(tags=None):
+    tags = current_tags() if tags is None else tags
+    pairs = ','.join(f"{key}='{_clean(value)}'" for key, value in sorted(tags.items()))
+    return f'/*{pairs}*/'
+
+
+def annotate(statement, tags=None):
+    """`statement` with the tag comment appended."""
+    return f'{statement.rstrip().rstrip(";")} {comment(tags)}'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._sql_tagging_start = time.perf_counter()
+    return annotate(statement), parameters
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_sql_tagging_start', None)
+    if start is not None and not executemany:
+        record_if_slow(conn.engine, statement, parameters, time.perf_counter() - start)
+
+
+# ---------------------------------------------------------------------------
+# Consultas lentas
+# ---------------------------------------------------------------------------
+def _get_slow_logger():
+    global _slow_logger
+    if _slow_logger is None:
+        os.makedirs(os.path.dirname(SLOW_QUERY_LOG), exist_ok=True)
+        handler = RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_BYTES,
+                                      backupCount=1, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        slow = logging.getLogger('sge.slow_queries')
+        slow.setLevel(logging.INFO)
+        slow.propagate = False
+        slow.addHandler(handler)
+        _slow_logger = slow
+    return _slow_logger
+
+
+def _explain(engine, statement, parameters):
+    # Conexión DBAPI directa: el EXPLAIN no pasa por los eventos (ni se etiqueta
+    # ni vuelve a medirse)
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        try:
+            sql = f'EXPLAIN (FORMAT JSON) {statement}'
+            if parameters is None:
+                cursor.execute(sql)
+            else:
+                cursor.execute(sql, parameters)
+            plan = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+            raw.rollback()
+        return json.loads(plan) if isinstance(plan, str) else plan
+    finally:
+        raw.close()
+
+
+def _write_entry(entry, engine=None, parameters=None):
+    if engine is not None:
+        try:
+            entry['plan'] = _explain(engine, entry['statement'], parameters)
+        except Exception as exc:
+            entry['plan_error'] = str(exc)
+    try:
+        _get_slow_logger().info(json.dumps(entry, ensure_ascii=False, default=str))
+    except Exception as exc:
+        logger.warning('No se pudo escribir la consulta lenta: %s', exc)
+
+
+def _run_worker():
+    while True:
+        entry, engine, parameters = _slow_queue.get()
+        _write_entry(entry, engine, parameters)
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, name='slow-query-explain', daemon=True)
+            _worker.start()
+
+
+def _explainable(engine, statement):
+    return (
+        SLOW_QUERY_EXPLAIN
+        and engine is not None
+        and engine.dialect.name == 'postgresql'
+        and statement.lstrip().lower().startswith(('select', 'with'))
+    )
+
+
+def record_if_slow(engine, statement, parameters, seconds, tags=None):
+    """Log `statement` (with its plan, in the background) if over `SLOW_QUERY_MS`."""
+    if SLOW_QUERY_MS <= 0 or seconds * 1000 < SLOW_QUERY_MS:
+        return
+    entry = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'ms': round(seconds * 1000, 1),
+        'database': getattr(getattr(engine, 'url', None), 'database', None),
+        'tags': current_tags() if tags is None else tags,
+        'statement': statement[:MAX_STATEMENT_CHARS],
+    }
+    if not _explainable(engine, statement):
+        _write_entry(entry)
+        return
+    _ensure_worker()
+    try:
+        _slow_queue.put_nowait((entry, engine, parameters))
+    except queue.Full:
+        entry['plan_error'] = 'cola de EXPLAIN llena'
+        _write_entry(entry)
+
+
+def read_slow_queries(limit=200):
+    """Last `limit` entries of the slow-query log, newest first."""
+    entries = []
+    for path in (SLOW_QUERY_LOG, f'{SLOW_QUERY_LOG}.1'):
+        if not os.path.isfile(path):
+            continue
+        with open(path, encoding='utf-8') as fh:
+            lines = fh.readlines()
+        for line in reversed(lines):
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+            if len(entries) >= limit:
+                return entries
+    return entries
+
+
+# ---------------------------------------------------------------------------
+# Integración con Flask / SQLAlchemy
+# ---------------------------------------------------------------------------
+def dash_app_prefix():
+    """Prefix of the Dash app of a `_dash-update-component` request, else None."""
+    if not request.path.endswith(DASH_UPDATE):
+        return None
+    return request.path[:-len(DASH_UPDATE)] or '/'
+
+
+def dash_callback_id():
+    """Output id of the Dash callback of the current request."""
+    body = request.get_json(silent=True) or {}
+    return str(body.get('output') or 'desconocido')[:MAX_TAG_CHARS]
+
+
+def _request_id():
+    # X-Request-ID lo controla el cliente: solo se acepta hex/uuid
+    header = request.headers.get('X-Request-ID', '')
+    return header if _REQUEST_ID.match(header) else uuid.uuid4().hex[:16]
+
+
+def instrument_requests(server):
+    """Set the request tags for every request served by `server`."""
+
+    @server.before_request
+    def _sql_tags():
+        tags = {'request_id': _request_id()}
+        prefix = dash_app_prefix()
+        if prefix is not None:
+            tags['dash'] = prefix
+            tags['callback'] = dash_callback_id()
+        g._sql_tags_token = _request_tags.set(tags)
+
+    @server.teardown_request
+    def _sql_tags_reset(exc=None):
+        token = g.pop('_sql_tags_token', None)
+        if token is not None:
+            try:
+                _request_tags.reset(token)
+            except ValueError:  # token de otro contexto (hilo distinto)
+                pass
+
+
+def init_app(app):
+    """Tag every SQLAlchemy statement and the requests served by `app`."""
+    instrument_requests(app)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute, retval=True)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
@@ -0,0 +1,297 @@
+"""Fingerprinted static files, responsive image variants and cache headers.
+
+`flask build-static` copies images (and, for `static/`, CSS/JS) to a `dist/`
+folder with a content hash in the file name, generates resized WebP/AVIF
+variants when Pillow is installed, and writes `dist/manifest.json`. CSS
+files are copied last, with their `url()` references rewritten to the
+hashed copies, so a changed image also changes the name of the CSS that
+uses it.
+
+Templates use `static_url(filename)` and `picture(filename, ...)`; Dash
+layouts use `dash_asset_url(dash_app, filename)` for files in `assets/`.
+All fall back to the original file while the manifest has not been built.
+The manifest is re-read when its mtime changes, so a rebuild takes effect
+without restarting; layouts cached by the Dash apps include
+`dash_assets_version(dash_app)` in their cache key for the same reason.
+Files under `dist/` never change content, so they are served with
+`Cache-Control: immutable`.
+"""
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import re
+import shutil
+
+import click
+from flask import request, url_for
+from markupsafe import Markup, escape
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow es opcional: sin él solo se generan copias con hash
+    Image = None
+    features = None
+
+logger = logging.getLogger(__name__)
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+TEXT_EXTENSIONS = ('.css', '.js')
+VARIANT_WIDTHS = (160, 320, 640, 1280, 1920)
+HASH_LENGTH = 10
+IMMUTABLE = 'public, max-age=31536000, immutable'
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+EXTERNAL_URL = ('data:', 'http:', 'https:', '//', '#')
+
+_manifests = {}
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def _variant_formats():
+    if Image is None:
+        return ()
+    formats = [('webp', 'WEBP')]
+    try:
+        if features.check('avif'):
+            formats.append(('avif', 'AVIF'))
+    except ValueError:  # Pillow sin soporte AVIF (< 11.2)
+        pass
+    return tuple(formats)
+
+
+def _write_variants(source, target_dir, stem, digest, formats):
+    variants = {}
+    with Image.open(source) as img:
+        width, height = img.size
+        widths = [w for w in VARIANT_WIDTHS if w < width] + [width]
+        for ext, pil_format in formats:
+            entries = []
+            for target_width in widths:
+                name = f'{stem}.{digest}.{target_width}w.{ext}'
+                path = os.path.join(target_dir, name)
+                if not os.path.isfile(path):
+                    resized = img if target_width == width else img.resize(
+                        (target_width, round(height * target_width / width)), Image.LANCZOS
+                    )
+                    if resized.mode not in ('RGB', 'RGBA'):
+                        resized = resized.convert('RGBA')
+                    resized.save(path, pil_format, quality=80)
+                entries.append([f'{DIST_DIR}/{name}', target_width])
+            variants[ext] = entries
+    return variants, width, height
+
+
+def _css_target(url, base, url_prefix):
+    """`(path relative to the directory, absolute?)` of a CSS `url()`, or None."""
+    if url.startswith(EXTERNAL_URL):
+        return None
+    if url_prefix and url.startswith(url_prefix):
+        return url[len(url_prefix):], True
+    if url.startswith('/'):
+        return None
+    return posixpath.normpath(posixpath.join(base, url)), False
+
+
+def _rewrite_css(directory, relative, text, manifest, url_prefix):
+    """`text` of CSS file `relative` with its `url()` pointing at hashed copies.
+
+    The rewritten file lives in `dist/`, so relative references to files
+    without a hashed copy are re-pointed from there too.
+    """
+    base = posixpath.dirname(relative)
+
+    def replace(match):
+        quote, url = match.group(1), match.group(2).strip()
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        target = _css_target(path, base, url_prefix)
+        if target is None:
+            return match.group(0)
+        target, absolute = target
+        entry = manifest.get(target)
+        if entry is None:
+            if not os.path.isfile(os.path.join(directory, target)):
+                logger.warning('%s: url(%s) no existe en %s', relative, url, directory)
+            new = path if absolute else posixpath.relpath(target, DIST_DIR)
+        else:
+            new = url_prefix + entry['src'] if absolute else posixpath.relpath(entry['src'], DIST_DIR)
+        return f'url({quote}{new}{suffix}{quote})'
+
+    return CSS_URL.sub(replace, text)
+
+
+def build_directory(directory, include_text=True, url_prefix=None):
+    """Build `<directory>/dist` and its manifest; returns the manifest.
+
+    `url_prefix` is the URL under which `directory` is served (`/static/`),
+    used to rewrite absolute `url()` references in CSS files.
+    """
+    target_dir = os.path.join(directory, DIST_DIR)
+    os.makedirs(target_dir, exist_ok=True)
+    formats = _variant_formats()
+    extensions = IMAGE_EXTENSIONS + (TEXT_EXTENSIONS if include_text else ())
+    sources = []
+    for root, dirs, files in os.walk(directory):
+        # static/vendor/ ya se versiona con ?v=<hash> (backend.vendor_assets)
+        dirs[:] = [d for d in dirs if os.path.join(root, d) not in (target_dir, os.path.join(directory, 'vendor'))]
+        for name in sorted(files):
+            if name.lower().endswith(extensions):
+                source = os.path.join(root, name)
+                sources.append((source, os.path.relpath(source, directory).replace(os.sep, '/')))
+    # CSS al final: sus url() apuntan a las copias con hash ya generadas
+    sources.sort(key=lambda item: item[1].lower().endswith('.css'))
+
+    manifest = {}
+    by_hash = {}
+    for source, relative in sources:
+        stem, ext = os.path.splitext(os.path.basename(relative))
+        stem = stem.replace(' ', '_')
+        content = None
+        if ext.lower() == '.css':
+            with open(source, encoding='utf-8') as fh:
+                content = _rewrite_css(directory, relative, fh.read(), manifest, url_prefix).encode('utf-8')
+            digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+        else:
+            digest = file_hash(source)
+        # Archivos idénticos comparten la misma copia con hash
+        if digest in by_hash:
+            manifest[relative] = by_hash[digest]
+            continue
+        hashed = f'{stem}.{digest}{ext.lower()}'
+        path = os.path.join(target_dir, hashed)
+        if not os.path.isfile(path):
+            if content is None:
+                shutil.copyfile(source, path)
+            else:
+                with open(path, 'wb') as fh:
+                    fh.write(content)
+        entry = {'src': f'{DIST_DIR}/{hashed}'}
+        if formats and ext.lower() in IMAGE_EXTENSIONS:
+            try:
+                entry['variants'], entry['width'], entry['height'] = _write_variants(
+                    source, target_dir, stem, digest, formats
+                )
+            except Exception:
+                logger.exception('No se pudieron generar variantes de %s', relative)
+        manifest[relative] = by_hash[digest] = entry
+    with open(os.path.join(target_dir, MANIFEST_NAME), 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=1, ensure_ascii=False)
+    _manifests.pop(directory, None)
+    return manifest
+
+
+def _manifest_mtime(directory):
+    try:
+        return os.stat(os.path.join(directory, DIST_DIR, MANIFEST_NAME)).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def load_manifest(directory):
+    """Manifest of `directory` (empty if `build-static` was not run).
+
+    Cached until the manifest file changes, e.g. after a rebuild.
+    """
+    mtime = _manifest_mtime(directory)
+    cached = _manifests.get(directory)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(os.path.join(directory, DIST_DIR, MANIFEST_NAME), encoding='utf-8') as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        manifest = {}
+    _manifests[directory] = (mtime, manifest)
+    return manifest
+
+
+def hashed_name(directory, filename):
+    """Hashed path of `filename` relative to `directory`, or `filename`."""
+    entry = load_manifest(directory).get(filename)
+    return entry['src'] if entry else filename
+
+
+def dash_asset_url(dash_app, filename):
+    """`dash_app.get_asset_url` of the hashed copy of `filename` in its `assets/`."""
+    return dash_app.get_asset_url(hashed_name(dash_app.config.assets_folder, filename))
+
+
+def dash_assets_version(dash_app):
+    """Changes whenever the manifest of `dash_app`'s `assets/` is rebuilt."""
+    return _manifest_mtime(dash_app.config.assets_folder)
+
+
+def _srcset(entry, ext, url):
+    return ', '.join(f'{url(path)} {width}w' for path, width in entry.get('variants', {}).get(ext, ()))
+
+
+def init_app(app, asset_dirs=()):
+    """Register template helpers and immutable cache headers on `app`.
+
+    `asset_dirs` maps extra URL prefixes (Dash `assets/`) to directories
+    whose `dist/` files also get immutable cache headers.
+    """
+    static_dir = app.static_folder
+    immutable_prefixes = [f'{prefix}{DIST_DIR}/' for prefix in dict(asset_dirs)]
+    if static_dir:  # los servidores de las apps Dash no tienen static/
+        immutable_prefixes.append(f'{app.static_url_path}/{DIST_DIR}/')
+
+    def static_url(filename):
+        return url_for('static', filename=hashed_name(static_dir, filename))
+
+    def picture(filename, alt='', sizes='100vw', **attrs):
+        """`<picture>` with AVIF/WebP `srcset` and the hashed original as fallback."""
+        entry = load_manifest(static_dir).get(filename, {})
+        url = lambda path: url_for('static', filename=path)  # noqa: E731
+        sources = []
+        for ext in ('avif', 'webp'):
+            srcset = _srcset(entry, ext, url)
+            if srcset:
+                sources.append(
+                    f'<source type="image/{ext}" srcset="{escape(srcset)}" sizes="{escape(sizes)}" />'
+                )
+        img_attrs = {'src': static_url(filename), 'alt': alt, **attrs}
+        if entry.get('width'):
+            img_attrs.setdefault('width', entry['width'])
+            img_attrs.setdefault('height', entry['height'])
+        rendered = ' '.join(
+            f'{name.rstrip("_").replace("_", "-")}="{escape(value)}"' for name, value in img_attrs.items()
+        )
+        return Markup(f'<picture>{"".join(sources)}<img {rendered} /></picture>')
+
+    if static_dir:
+        @app.context_processor
+        def _static_helpers():
+            return {'static_url': static_url, 'picture': picture}
+
+    @app.after_request
+    def _immutable_cache(response):
+        if response.status_code == 200 and any(request.path.startswith(p) for p in immutable_prefixes):
+            response.headers['Cache-Control'] = IMMUTABLE
+        elif response.status_code == 200 and request.args.get('m') and '/assets/' in request.path:
+            # Dash añade ?m=<mtime> a los assets que incluye: también son inmutables
+            response.headers['Cache-Control'] = IMMUTABLE
+        return response
+
+
+def register_commands(app, asset_dirs=()):
+    @app.cli.command('build-static')
+    def build_static_command():
+        """Genera copias con hash y variantes WebP/AVIF de static/ y assets/."""
+        if Image is None:
+            click.echo('Pillow no está instalado: solo se generan copias con hash')
+        manifest = build_directory(app.static_folder, url_prefix=f'{app.static_url_path.rstrip("/")}/')
+        click.echo(f'static/: {len(manifest)} archivos')
+        for directory in dict.fromkeys(dict(asset_dirs).values()):
+            # En assets/ solo imágenes: Dash incluye automáticamente todo CSS/JS
+            manifest = build_directory(directory, include_text=False)
+            click.echo(f'{directory}: {len(manifest)} archivos')
@@ -0,0 +1,226 @@
+"""Fold warehouse results into running aggregates under a memory budget.
+
+The dashboard loaders only need counts, sums and distinct counts (per
+`agrupador` and in total) from results that, for the largest hospitals,
+reach hundreds of thousands of rows. `summarize_query` folds a statement
+into a `FrameSummary`:
+
+- by default it materializes the result with `fetch_frame` (the Arrow fast
+  path) and reduces it in one pass, as before
+- when the last result of the same statement and parameters did not fit
+  in the request's `MemoryBudget`, it reads with a server-side cursor in
+  chunks of `STREAM_CHUNK_ROWS` instead, reducing and dropping each chunk
+
+The size of each result is remembered per process, so the first read of a
+statement that turns out to be too large still materializes once; the
+trade-off keeps the common, small results on the fast path without a
+second round trip to estimate them.
+
+`DASHBOARD_STREAM` selects the mode: `auto` (default, as above), `always`
+(fold every chunk) or `never` (always `fetch_frame`).
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from backend.arrow_fetch import fetch_frame
+from backend.frame_schema import apply_schema
+
+logger = logging.getLogger(__name__)
+
+STREAM_MODE = os.environ.get('DASHBOARD_STREAM', 'auto').strip().lower()
+# Memoria (MB) que puede retener una petición del dashboard en frames sin reducir
+MEMORY_BUDGET_MB = int(os.environ.get('DASHBOARD_MEMORY_BUDGET_MB', '256'))
+STREAM_CHUNK_ROWS = int(os.environ.get('DASHBOARD_STREAM_CHUNK_ROWS', '50000'))
+# Tamaños recordados (consulta + parámetros) para decidir el modo en `auto`
+SIZE_HINTS_MAX = 1024
+
+_size_hints = OrderedDict()
+_hints_lock = threading.Lock()
+
+
+class MemoryBudget:
+    """Bytes of raw result frames one request may hold at the same time."""
+
+    def __init__(self, limit_mb=None):
+        limit_mb = MEMORY_BUDGET_MB if limit_mb is None else limit_mb
+        self.limit = int(limit_mb) * 1024 * 1024
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, nbytes):
+        with self._lock:
+            if self.used + nbytes > self.limit:
+                return False
+            self.used += nbytes
+            return True
+
+    def release(self, nbytes):
+        with self._lock:
+            self.used = max(self.used - nbytes, 0)
+
+
+def _object_index(serie):
+    # Índices categóricos de chunks distintos no se alinean entre sí
+    serie.index = serie.index.astype(object)
+    return serie
+
+
+class FrameSummary:
+    """Running reductions of one result.
+
+    - `rows`: row count
+    - `by_group()`: per `by` value, the row count, the sum of `value` or,
+      with `distinct_by_group=True`, the distinct count of `distinct`
+    - `total()`: sum of `value`
+    - `nunique()`: distinct count of `distinct` over the whole result
+    - `first`: first non-null value of that column
+    """
+
+    def __init__(self, by=None, value=None, distinct=None, distinct_by_group=False,
+                 first=None, dropna=True):
+        self.by = by
+        self.value = value
+        self.distinct = distinct
+        self.distinct_by_group = distinct_by_group
+        self.first_column = first
+        self.dropna = dropna
+        self.rows = 0
+        self.first = None
+        self._total = 0.0
+        self._groups = []
+        self._distinct = set()
+
+    def update(self, df):
+        """Fold `df` (already typed with `apply_schema`) into the summary."""
+        if df is None or df.empty:
+            return
+        self.rows += len(df)
+        if self.first is None and self.first_column in df:
+            values = df[self.first_column].dropna()
+            if not values.empty:
+                self.first = values.iloc[0]
+        if self.value in df:
+            self._total += float(df[self.value].sum())
+        if self.distinct in df and not self.distinct_by_group:
+            self._distinct.update(df[self.distinct].dropna().unique().tolist())
+        if self.by not in df:
+            return
+        if self.distinct_by_group:
+            if self.distinct in df:
+                # Pares (grupo, valor) únicos: se cuentan al final
+                self._groups.append(df[[self.by, self.distinct]].astype(object).drop_duplicates())
+            return
+        grouped = df.groupby(self.by, dropna=self.dropna, observed=True)
+        if self.value in df:
+            self._groups.append(_object_index(grouped[self.value].sum()))
+        else:
+            self._groups.append(_object_index(grouped.size()))
+
+    def __len__(self):
+        return self.rows
+
+    def total(self):
+        return self._total
+
+    def nunique(self):
+        return len(self._distinct)
+
+    def by_group(self, name='counts'):
+        """DataFrame `[by, name]` sorted by `name` descending."""
+        if not self._groups:
+            return pd.DataFrame(columns=[self.by, name])
+        if self.distinct_by_group:
+            pairs = pd.concat(self._groups, ignore_index=True).drop_duplicates()
+            folded = pairs.groupby(self.by, dropna=self.dropna)[self.distinct].nunique()
+        else:
+            folded = pd.concat(self._groups).groupby(level=0, dropna=self.dropna).sum()
+        return (
+            folded.rename_axis(self.by)
+            .reset_index(name=name)
+            .sort_values(name, ascending=False)
+            .reset_index(drop=True)
+        )
+
+
+def _frame_size(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _hint_key(stmt, params):
+    if isinstance(params, dict):
+        params = sorted(params.items())
+    return str(stmt), repr(params)
+
+
+def _size_hint(stmt, params):
+    """Bytes of the last result of `stmt` with `params`, or None."""
+    key = _hint_key(stmt, params)
+    with _hints_lock:
+        size = _size_hints.get(key)
+        if size is not None:
+            _size_hints.move_to_end(key)
+        return size
+
+
+def _remember_size(stmt, params, size):
+    key = _hint_key(stmt, params)
+    with _hints_lock:
+        _size_hints[key] = size
+        _size_hints.move_to_end(key)
+        while len(_size_hints) > SIZE_HINTS_MAX:
+            _size_hints.popitem(last=False)
+
+
+def _fetch_into(stmt, engine, params, summary, budget):
+    df = apply_schema(fetch_frame(stmt, engine, params=params))
+    size = _frame_size(df)
+    _remember_size(stmt, params, size)
+    if size > budget.limit:
+        logger.info('Resultado de %d MB excede el presupuesto (%d MB): la próxima lectura será por chunks',
+                    size // (1024 * 1024), budget.limit // (1024 * 1024))
+    summary.update(df)
+
+
+def _stream_into(stmt, engine, params, summary):
+    size = 0
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True, max_row_buffer=STREAM_CHUNK_ROWS)
+        for chunk in pd.read_sql(stmt, conn, params=params, chunksize=STREAM_CHUNK_ROWS):
+            chunk = apply_schema(chunk)
+            size += _frame_size(chunk)
+            summary.update(chunk)
+    _remember_size(stmt, params, size)
+
+
+def summarize_query(stmt, engine, params, summary, budget=None, mode=None):
+    """Fold the result of `stmt` into `summary`; returns `summary`.
+
+    `budget` (a `MemoryBudget`) is normally shared by every query of the
+    same request: in `auto` mode a result is materialized only when its
+    remembered size can be reserved (or is not known yet).
+    """
+    mode = (mode or STREAM_MODE).strip().lower()
+    if mode == 'never':
+        summary.update(apply_schema(fetch_frame(stmt, engine, params=params)))
+        return summary
+    if mode == 'always':
+        _stream_into(stmt, engine, params, summary)
+        return summary
+
+    budget = budget or MemoryBudget()
+    hint = _size_hint(stmt, params)
+    if hint is not None and not budget.reserve(hint):
+        logger.info('Presupuesto de memoria insuficiente (%d MB): lectura por chunks',
+                    budget.limit // (1024 * 1024))
+        _stream_into(stmt, engine, params, summary)
+        return summary
+    try:
+        _fetch_into(stmt, engine, params, summary, budget)
+    finally:
+        if hint is not None:
+            budget.release(hint)
+    return summary
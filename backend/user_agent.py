@@ -0,0 +1,76 @@
+import re
+from functools import lru_cache
+
+# Reglas de navegador, evaluadas en orden; la primera cuyo patrón de
+# detección coincide decide el resultado. El orden importa: Edge (Chromium)
+# contiene "Chrome" en el User-Agent, por eso se evalúa antes que Chrome.
+# Cada regla es (detección, nombre, patrón de versión); si el patrón de
+# versión es None se usa el grupo 1 de la detección, y si no coincide el
+# navegador queda como "Desconocido".
+BROWSER_RULES = (
+    (re.compile(r'Edg(?:e)?/(\d+)'), "Microsoft Edge", None),
+    (re.compile(r'Edge'), "Microsoft Edge (antiguo)", re.compile(r'Edge/(\d+)')),
+    (re.compile(r'Chrome/(\d+)'), "Google Chrome", None),
+    (re.compile(r'Firefox/(\d+)'), "Mozilla Firefox", None),
+    (re.compile(r'Safari/(\d+)'), "Apple Safari", re.compile(r'Version/(\d+)')),
+    (re.compile(r'OPR/(\d+)'), "Opera", None),
+)
+
+# Reglas de sistema operativo: (patrón, etiqueta). La etiqueta puede usar
+# {0} para el grupo 1 del patrón.
+OS_RULES = (
+    (re.compile(r'Windows NT 11'), "Windows 11"),
+    (re.compile(r'Windows NT 10\.0'), "Windows 10"),
+    (re.compile(r'Windows NT 6\.3'), "Windows 8.1"),
+    (re.compile(r'Windows NT 6\.2'), "Windows 8"),
+    (re.compile(r'Windows NT 6\.1'), "Windows 7"),
+    (re.compile(r'Windows NT 5\.1'), "Windows XP"),
+    (re.compile(r'Mac OS X 10_(\d+)'), "macOS 10.{0}"),
+    (re.compile(r'Mac OS X'), "macOS"),
+    (re.compile(r'Android (\d+)'), "Android {0}"),
+    (re.compile(r'Linux'), "Linux"),
+    (re.compile(r'iPhone|iPad'), "iOS"),
+)
+
+UNKNOWN = "Desconocido"
+CACHE_SIZE = 2048
+
+
+def _match_browser(user_agent):
+    for detect, name, version_re in BROWSER_RULES:
+        match = detect.search(user_agent)
+        if not match:
+            continue
+        if version_re is not None:
+            match = version_re.search(user_agent)
+            if not match:
+                return UNKNOWN, ""
+        return name, match.group(1)
+    return UNKNOWN, ""
+
+
+def _match_os(user_agent):
+    for pattern, label in OS_RULES:
+        match = pattern.search(user_agent)
+        if match:
+            return label.format(*match.groups())
+    return UNKNOWN
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def classify_user_agent(user_agent):
+    """Detecta el navegador y sistema operativo del User-Agent.
+
+    Devuelve textos como "Google Chrome v120 (Windows 10)". El resultado se
+    cachea por User-Agent completo, que se repite mucho entre registros.
+    """
+    if not user_agent:
+        return UNKNOWN
+    browser_name, browser_version = _match_browser(user_agent)
+    os_name = _match_os(user_agent)
+    if browser_version:
+        return f"{browser_name} v{browser_version} ({os_name})"
+    return f"{browser_name} ({os_name})"
+
+
+__all__ = ["classify_user_agent", "BROWSER_RULES", "OS_RULES"]
@@ -0,0 +1,272 @@
+"""Self-hosted front-end dependencies shared by the portal and the Dash apps.
+
+Bootstrap (CSS and JS bundle), Bootstrap Icons, Inter, jQuery and Select2
+live under `static/vendor/`, committed with the repository. `flask
+vendor-assets` downloads the pinned versions, rewrites the font URLs to
+local files and writes `static/vendor/manifest.json` (origin of each file
+and sha256 of everything written); `flask vendor-assets --check` verifies
+the committed copies against it.
+`vendor_stylesheets()` returns the `/static/vendor/...?v=<hash>` URLs of the
+Dash apps' `external_stylesheets` and templates use `vendor_url(path)`, so
+every app and the portal reuse one cached copy. A missing local file is
+logged and still served from its local URL; the CDN is used instead only
+with `VENDOR_CDN_FALLBACK=1`.
+
+Dash serves its renderer and component bundles under each app's own prefix
+(`/dashboard/_dash-component-suites/...`), so the browser downloads the same
+files four times. `share_component_suites(dash_app)` points an app's index
+page at one shared route served by the main Flask app.
+"""
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import re
+import sys
+import urllib.request
+from urllib.parse import urljoin, urlsplit
+
+import click
+from flask import abort, request
+
+from backend.static_assets import IMMUTABLE, file_hash
+
+logger = logging.getLogger(__name__)
+
+VENDOR_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'vendor')
+VENDOR_URL = '/static/vendor/'
+SHARED_SUITES_URL = '/_dash-shared/_dash-component-suites/'
+MANIFEST_NAME = 'manifest.json'
+# Usar el CDN si falta una copia local (solo para desarrollo)
+CDN_FALLBACK = os.environ.get('VENDOR_CDN_FALLBACK', '0').strip().lower() in ('1', 'true', 'on', 'si')
+
+# (ruta en static/vendor, origen): el orden es el de carga en las apps
+STYLESHEETS = (
+    ('bootstrap/bootstrap.min.css',
+     'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css'),
+    ('bootstrap-icons/bootstrap-icons.min.css',
+     'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.min.css'),
+    ('inter/inter.css',
+     'https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap'),
+)
+
+# Solo las usa el portal (templates/base.html), en este orden
+PORTAL_FILES = (
+    ('select2/select2.min.css',
+     'https://cdn.jsdelivr.net/npm/select2@4.1.0-rc.0/dist/css/select2.min.css'),
+    ('bootstrap/bootstrap.bundle.min.js',
+     'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js'),
+    ('jquery/jquery.min.js', 'https://code.jquery.com/jquery-3.6.0.min.js'),
+    ('select2/select2.min.js',
+     'https://cdn.jsdelivr.net/npm/select2@4.1.0-rc.0/dist/js/select2.min.js'),
+)
+VENDOR_FILES = dict(STYLESHEETS + PORTAL_FILES)
+
+# Google Fonts solo entrega woff2 a navegadores que lo anuncian
+USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+)
+_CSS_URL = re.compile(r'url\((["\']?)([^)"\']+)\1\)')
+_SOURCE_MAP = re.compile(r'/\*# sourceMappingURL=[^*]*\*/')
+_JS_SOURCE_MAP = re.compile(r'^//# sourceMappingURL=.*$', re.MULTILINE)
+
+_hashes = {}
+_warned = set()
+_dash_apps = []
+
+
+def _versioned(path):
+    local = os.path.join(VENDOR_DIR, path)
+    mtime = os.path.getmtime(local)
+    cached = _hashes.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _hashes[path] = (mtime, file_hash(local))
+    return f'{VENDOR_URL}{path}?v={cached[1]}'
+
+
+def vendor_url(path):
+    """URL of vendor file `path` (a `VENDOR_FILES` key).
+
+    Without a local copy the CDN is used only with `VENDOR_CDN_FALLBACK`;
+    otherwise the unversioned local URL is returned and the gap logged.
+    """
+    if os.path.isfile(os.path.join(VENDOR_DIR, path)):
+        return _versioned(path)
+    if path not in _warned:
+        _warned.add(path)
+        if CDN_FALLBACK:
+            logger.warning('Sin copia local de %s (ejecutar `flask vendor-assets`); se usa el CDN', path)
+        else:
+            logger.error('Sin copia local de %s: ejecutar `flask vendor-assets` y versionar static/vendor/', path)
+    return VENDOR_FILES[path] if CDN_FALLBACK else f'{VENDOR_URL}{path}'
+
+
+def vendor_stylesheets():
+    """`external_stylesheets` for the Dash apps (see `vendor_url`)."""
+    return [vendor_url(path) for path, _ in STYLESHEETS]
+
+
+# ---------------------------------------------------------------------------
+# Descarga (`flask vendor-assets`)
+# ---------------------------------------------------------------------------
+def _download(url):
+    req = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return resp.read()
+
+
+def _localize_css(css, origin, target_dir):
+    """Download every `url(...)` of `css` next to it and rewrite the reference."""
+    fetched = {}
+
+    def replace(match):
+        ref = match.group(2).strip()
+        if ref.startswith(('data:', '#')):
+            return match.group(0)
+        absolute = urljoin(origin, ref)
+        source = urlsplit(absolute)._replace(query='', fragment='').geturl()
+        if source not in fetched:
+            name = posixpath.basename(urlsplit(source).path)
+            path = os.path.join(target_dir, 'fonts', name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as fh:
+                fh.write(_download(source))
+            fetched[source] = f'fonts/{name}?v={file_hash(path)}'
+        return f'url("{fetched[source]}")'
+
+    return _SOURCE_MAP.sub('', _CSS_URL.sub(replace, css)), list(fetched)
+
+
+def fetch_vendor(directory=VENDOR_DIR):
+    """Download the pinned stylesheets (with their fonts) and scripts into `directory`."""
+    written = []
+    for path, origin in VENDOR_FILES.items():
+        target = os.path.join(directory, path)
+        target_dir = os.path.dirname(target)
+        os.makedirs(target_dir, exist_ok=True)
+        content = _download(origin).decode('utf-8')
+        fonts = []
+        if path.endswith('.css'):
+            content, fonts = _localize_css(content, origin, target_dir)
+        else:
+            content = _JS_SOURCE_MAP.sub('', content)
+        with open(target, 'w', encoding='utf-8') as fh:
+            fh.write(content)
+        written.append((path, len(fonts)))
+    _write_manifest(directory)
+    _hashes.clear()
+    return written
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _local_files(directory):
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            relative = os.path.relpath(os.path.join(root, name), directory).replace(os.sep, '/')
+            if relative != MANIFEST_NAME:
+                yield relative
+
+
+def _write_manifest(directory):
+    manifest = {
+        'sources': VENDOR_FILES,
+        'files': {path: _sha256(os.path.join(directory, path)) for path in sorted(_local_files(directory))},
+    }
+    with open(os.path.join(directory, MANIFEST_NAME), 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+
+
+def check_vendor(directory=VENDOR_DIR):
+    """Problems of the local copies against `manifest.json`; empty if all match."""
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), encoding='utf-8') as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return [f'{MANIFEST_NAME}: no existe o es ilegible']
+    problems = []
+    if manifest.get('sources') != VENDOR_FILES:
+        problems.append(f'{MANIFEST_NAME}: versiones distintas a VENDOR_FILES')
+    files = manifest.get('files', {})
+    for path in VENDOR_FILES:
+        if path not in files:
+            problems.append(f'{path}: falta en {MANIFEST_NAME}')
+    for path, digest in files.items():
+        local = os.path.join(directory, path)
+        if not os.path.isfile(local):
+            problems.append(f'{path}: no existe')
+        elif _sha256(local) != digest:
+            problems.append(f'{path}: contenido distinto al del manifest')
+    return problems
+
+
+# ---------------------------------------------------------------------------
+# Bundles de Dash compartidos
+# ---------------------------------------------------------------------------
+def share_component_suites(dash_app):
+    """Serve `dash_app`'s renderer/component bundles from the shared route."""
+    own = f'{dash_app.config.requests_pathname_prefix}_dash-component-suites/'
+    interpolate_index = dash_app.interpolate_index
+
+    def shared_index(**kwargs):
+        for key, attr in (('scripts', 'src'), ('css', 'href')):
+            if kwargs.get(key):
+                kwargs[key] = kwargs[key].replace(f'{attr}="{own}', f'{attr}="{SHARED_SUITES_URL}')
+        return interpolate_index(**kwargs)
+
+    dash_app.interpolate_index = shared_index
+    _dash_apps.append(dash_app)
+    return dash_app
+
+
+def _serve_shared_suite(package_name, fingerprinted_path):
+    from dash.fingerprint import check_fingerprint
+
+    path_in_pkg, _ = check_fingerprint(fingerprinted_path)
+    # Solo lo que alguna app registró al generar su index, como hace Dash
+    for dash_app in _dash_apps:
+        if path_in_pkg in dash_app.registered_paths.get(package_name, ()) and package_name in sys.modules:
+            return dash_app.serve_component_suites(package_name, fingerprinted_path)
+    abort(404)
+
+
+def init_app(app):
+    """Register the shared bundle route, `vendor_url` for templates and cache headers."""
+    app.add_url_rule(
+        f'{SHARED_SUITES_URL}<string:package_name>/<path:fingerprinted_path>',
+        'dash_shared_suites', _serve_shared_suite,
+    )
+
+    @app.context_processor
+    def _vendor_helpers():
+        return {'vendor_url': vendor_url}
+
+    @app.after_request
+    def _vendor_cache(response):
+        if response.status_code == 200 and request.args.get('v') and request.path.startswith(VENDOR_URL):
+            response.headers['Cache-Control'] = IMMUTABLE
+        return response
+
+    @app.cli.command('vendor-assets')
+    @click.option('--check', is_flag=True, help='Solo verificar static/vendor/ contra manifest.json.')
+    def vendor_assets_command(check):
+        """Descarga Bootstrap, Bootstrap Icons, Inter, jQuery y Select2 a static/vendor/."""
+        if check:
+            problems = check_vendor()
+            for problem in problems:
+                click.echo(problem)
+            if problems:
+                raise SystemExit(1)
+            click.echo('static/vendor/ coincide con manifest.json')
+            return
+        for path, fonts in fetch_vendor():
+            click.echo(f'{path}: {fonts} fuentes' if path.endswith('.css') else path)
+        click.echo(f'Versionar static/vendor/ (incluido {MANIFEST_NAME})')
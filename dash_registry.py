@@ -0,0 +1,119 @@
+"""Registro de callbacks de las páginas de Indicadores por aplicación Dash.
+
+Las páginas de `Indicadores` usan `callback` (y `clientside_callback`) de
+este módulo en lugar de los de `dash`. El decorador no registra nada de forma global: solo guarda
+la definición bajo el módulo que la declara. Luego cada aplicación Dash
+llama a `bind_indicator_pages(dash_app, modulos)` y los callbacks de esos
+módulos se registran únicamente en esa aplicación, de modo que el
+`_dash-dependencies` de cada app solo contiene sus propias páginas.
+
+Una página puede declarar con `require_callbacks` que sus callbacks viven en
+otro módulo (p. ej. las familias de `Indicadores.page_factory`); ese módulo
+se asocia a la misma aplicación al hacer el bind de la página.
+"""
+import importlib
+import sys
+import threading
+
+_pending = {}
+_bound = {}
+_requires = {}
+_lock = threading.Lock()
+
+
+def callback(*args, **kwargs):
+    """Drop-in de `dash.callback` que difiere el registro hasta el bind."""
+    def decorator(func):
+        with _lock:
+            _pending.setdefault(func.__module__, []).append((args, kwargs, func))
+        return func
+    return decorator
+
+
+def clientside_callback(clientside_function, *args, stacklevel=1, **kwargs):
+    """Drop-in de `dash.clientside_callback` con el mismo registro diferido.
+
+    Se asocia al módulo que llama; los helpers que registran en nombre de
+    otro módulo pasan `stacklevel=2` (como `warnings.warn`).
+    """
+    module_name = sys._getframe(stacklevel).f_globals.get('__name__')
+    with _lock:
+        _pending.setdefault(module_name, []).append((args, kwargs, clientside_function))
+
+
+def require_callbacks(module_name, *dependencies):
+    """Declara que `module_name` necesita los callbacks de `dependencies`."""
+    with _lock:
+        required = _requires.setdefault(module_name, [])
+        required.extend(dep for dep in dependencies if dep not in required)
+
+
+def _app_name(dash_app):
+    return dash_app.config.get('routes_pathname_prefix') or dash_app.config.get('url_base_pathname') or '/'
+
+
+def bind_indicator_pages(dash_app, module_names):
+    """Importa `module_names` y registra sus callbacks en `dash_app`.
+
+    Un módulo solo puede quedar asociado a una aplicación; si ya fue
+    asociado a otra, se omite y se informa. Devuelve la lista de módulos
+    asociados a `dash_app` en esta llamada.
+    """
+    app_name = _app_name(dash_app)
+    bound = []
+
+    def _bind_module(mod_name):
+        with _lock:
+            owner = _bound.get(mod_name)
+            if owner is not None:
+                if owner != app_name:
+                    print(f"[Dash Pages] {mod_name} ya está asociado a {owner}; se omite en {app_name}")
+                return False
+            _bound[mod_name] = app_name
+            definitions = _pending.pop(mod_name, [])
+
+        for args, kwargs, func in definitions:
+            if callable(func):
+                dash_app.callback(*args, **kwargs)(func)
+            else:
+                dash_app.clientside_callback(func, *args, **kwargs)
+        print(f"[Dash Pages] Página importada: {mod_name} ({len(definitions)} callbacks en {app_name})")
+        return True
+
+    for mod_name in module_names:
+        try:
+            importlib.import_module(mod_name)
+        except Exception as exc:
+            print(f"[Dash Pages] Error importando {mod_name}: {exc}")
+            continue
+
+        if not _bind_module(mod_name):
+            continue
+        bound.append(mod_name)
+        with _lock:
+            dependencies = list(_requires.get(mod_name, ()))
+        for dep in dependencies:
+            _bind_module(dep)
+    return bound
+
+
+def callback_report(dash_apps):
+    """Devuelve [(prefijo, callbacks, páginas)] para las apps indicadas."""
+    with _lock:
+        pages_by_app = {}
+        for app_name in _bound.values():
+            pages_by_app[app_name] = pages_by_app.get(app_name, 0) + 1
+    report = []
+    for dash_app in dash_apps:
+        app_name = _app_name(dash_app)
+        report.append((app_name, len(dash_app.callback_map), pages_by_app.get(app_name, 0)))
+    return report
+
+
+def print_callback_report(dash_apps):
+    for app_name, callbacks, pages in callback_report(dash_apps):
+        print(f"[Dash] {app_name}: {callbacks} callbacks, {pages} páginas de Indicadores")
+    with _lock:
+        unbound = sorted(_pending)
+    if unbound:
+        print(f"[Dash] Módulos con callbacks sin aplicación: {', '.join(unbound)}")
@@ -1,6 +1,5 @@
 import io
-import importlib
-import pkgutil
+import json
 from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from functools import lru_cache
@@ -16,14 +15,59 @@ from flask_login import current_user
 from sqlalchemy import create_engine, text
 
 import secure_code as sc
+from backend.arrow_fetch import fetch_frame
+from backend.metrics import track_query
+from backend.sql_tagging import propagate
+from backend.stream_agg import FrameSummary, MemoryBudget, summarize_query
+from backend.static_assets import dash_asset_url, dash_assets_version
+from backend.vendor_assets import vendor_stylesheets
+from dash_registry import bind_indicator_pages
+
+# Páginas de Indicadores servidas por esta app (/dashboard/dash/...). Los
+# enlaces de dashboard_nm también apuntan aquí, por eso las páginas *_nm_*
+# se asocian a esta app y no a la de dashboard_nm.
+INDICATOR_PAGES = (
+    "diferimiento",
+    "total_atenciones",
+    "total_atenciones_a_d",
+    "total_atenciones_a_m",
+    "total_atenciones_m_c",
+    "total_atenciones_m_o",
+    "total_atenciones_m_p",
+    "total_atenciones_nm_en",
+    "total_atenciones_nm_nu",
+    "total_atenciones_nm_ob",
+    "total_atenciones_nm_pd",
+    "total_atenciones_nm_pp",
+    "total_atenciones_nm_ps",
+    "total_atenciones_nm_pt",
+    "total_atenciones_nm_ts",
+    "total_atendidos",
+    "total_citados",
+    "total_desercion",
+    "total_horas_efectivas",
+    "total_horas_efectivas_a_d",
+    "total_horas_efectivas_a_m",
+    "total_horas_efectivas_m_c",
+    "total_horas_efectivas_m_o",
+    "total_horas_efectivas_m_p",
+    "total_horas_programadas",
+    "total_horas_programadas_a_d",
+    "total_horas_programadas_a_m",
+    "total_horas_programadas_m_c",
+    "total_horas_programadas_m_o",
+    "total_horas_programadas_m_p",
+    "total_medicos",
+    "total_medicos_a_d",
+    "total_medicos_a_m",
+    "total_medicos_m_c",
+    "total_medicos_m_o",
+    "total_medicos_m_p",
+)
 
 
 def create_dash_app(flask_app, url_base_pathname='/dashboard/'):
-    external_stylesheets = [
-        dbc.themes.BOOTSTRAP,
-        "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.css",
-        "https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap",
-    ]
+    external_stylesheets = vendor_stylesheets()
 
     BRAND = "#0064AF"
     BRAND_SOFT = "#D7E9FF"
@@ -102,24 +146,7 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard/'):
 
     def _import_indicator_pages():
         pkg_name = f"{__package__}.Indicadores" if __package__ else "Indicadores"
-        try:
-            pkg = importlib.import_module(pkg_name)
-        except Exception as exc:
-            print(f"[Dash Pages] No se pudo importar el paquete '{pkg_name}': {exc}")
-            return
-
-        def _import_children(package, package_name):
-            for module in pkgutil.iter_modules(package.__path__):
-                mod_name = f"{package_name}.{module.name}"
-                try:
-                    loaded_module = importlib.import_module(mod_name)
-                    print(f"[Dash Pages] Página importada: {mod_name}")
-                    if module.ispkg:
-                        _import_children(loaded_module, mod_name)
-                except Exception as exc:
-                    print(f"[Dash Pages] Error importando {mod_name}: {exc}")
-
-        _import_children(pkg, pkg_name)
+        bind_indicator_pages(dash_app, [f"{pkg_name}.{name}" for name in INDICATOR_PAGES])
 
     dash_app = Dash(
         __name__,
@@ -236,11 +263,13 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard/'):
 
         return dbc.Container(summary_sections, fluid=True)
 
-    def build_tab_panel(tab_config):
-        periodo_options = [
-            {'label': row['mes'], 'value': row['periodo']}
-            for _, row in df_period.iterrows()
-        ]
+    periodo_options = [
+        {'label': mes, 'value': periodo}
+        for mes, periodo in zip(df_period['mes'], df_period['periodo'])
+    ]
+
+    @lru_cache(maxsize=None)
+    def build_tab_content(tab_config):
         controls = html.Div([
             html.I(
                 className="bi bi-calendar3 dashboard-control-icon",
@@ -330,38 +359,44 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard/'):
             ),
         ], className='dashboard-control-bar', style={**CONTROL_BAR_STYLE})
 
+        return html.Div([
+            controls,
+            dbc.Tooltip("Volver a la página anterior", target=tab_config.back_button_id, placement='bottom', style={'zIndex': 9999}),
+            dbc.Tooltip("Buscar datos", target=tab_config.search_button_id, placement='bottom', style={'zIndex': 9999}),
+            dbc.Tooltip("Descargar Excel", target=tab_config.download_button_id, placement='bottom', style={'zIndex': 9999}),
+            dbc.Row([
+                dbc.Col(
+                    html.Div(
+                        dcc.Loading(
+                            className='dashboard-loading-inline',
+                            parent_className='dashboard-loading-parent',
+                            parent_style={'width': '100%'},
+                            type='default',
+                            style={'width': '100%'},
+                            children=html.Div(id=tab_config.summary_container_id)
+                        ),
+                        className='dashboard-loading-shell'
+                    ),
+                    width=12
+                )
+            ]),
+            html.Br(),
+            dbc.Row([dbc.Col(html.Div(id=tab_config.charts_container_id), width=12)]),
+            html.Br(),
+        ], id=f'tab-{tab_config.key}-content')
+
+    def build_tab_panel(tab_config, loaded=False):
+        # Solo la pestaña inicial trae su contenido; el resto se genera al
+        # activarla por primera vez (load_tab_content)
         return dcc.Tab(
             label=tab_config.label,
             value=tab_config.value,
             style=TAB_STYLE,
             selected_style=TAB_SELECTED_STYLE,
-            children=[
-                html.Div([
-                    controls,
-                    dbc.Tooltip("Volver a la página anterior", target=tab_config.back_button_id, placement='bottom', style={'zIndex': 9999}),
-                    dbc.Tooltip("Buscar datos", target=tab_config.search_button_id, placement='bottom', style={'zIndex': 9999}),
-                    dbc.Tooltip("Descargar Excel", target=tab_config.download_button_id, placement='bottom', style={'zIndex': 9999}),
-                    dbc.Row([
-                        dbc.Col(
-                            html.Div(
-                                dcc.Loading(
-                                    className='dashboard-loading-inline',
-                                    parent_className='dashboard-loading-parent',
-                                    parent_style={'width': '100%'},
-                                    type='default',
-                                    style={'width': '100%'},
-                                    children=html.Div(id=tab_config.summary_container_id)
-                                ),
-                                className='dashboard-loading-shell'
-                            ),
-                            width=12
-                        )
-                    ]),
-                    html.Br(),
-                    dbc.Row([dbc.Col(html.Div(id=tab_config.charts_container_id), width=12)]),
-                    html.Br(),
-                ], id=f'tab-{tab_config.key}-content')
-            ]
+            children=html.Div(
+                build_tab_content(tab_config) if loaded else None,
+                id=f'tab-{tab_config.key}-lazy'
+            )
         )
 
     def build_required_params_message(message=None):
@@ -2079,6 +2114,16 @@ CASE WHEN cod_tipo_paciente = '4' THEN '2' ELSE '1' END AS cod_tipo_paciente,
                 }
 
 
+    # Reducciones que el loader necesita de cada consulta (backend.stream_agg)
+    LOADER_SUMMARIES = {
+        "atenciones": dict(by='agrupador', distinct='dni_medico', first='cenasides'),
+        "horas_efectivas": dict(by='agrupador', value='horas_efec_def', dropna=False),
+        "horas_programadas": dict(by='agrupador', value='total_horas', dropna=False),
+        "citados": dict(by='agrupador'),
+        "desercion": dict(by='agrupador'),
+        "medicos_agrup": dict(by='agrupador', distinct='dni_medico', distinct_by_group=True),
+    }
+
     def _load_dashboard_data(periodo, anio, codcas, engine, query_builder, tipo_asegurado_value):
         if not periodo or not codcas or not anio:
             return None
@@ -2092,105 +2137,63 @@ CASE WHEN cod_tipo_paciente = '4' THEN '2' ELSE '1' END AS cod_tipo_paciente,
         builder_payload = query_builder(anio_str, periodo_str, params)
         queries = builder_payload.get("queries", [])
         results = {}
+        # Presupuesto compartido por las consultas de esta petición
+        budget = MemoryBudget()
+        # consulta.atenciones, complementaria.horas_efectivas, ... en /metrics
+        group = query_builder.__name__.replace("build_queries_", "")
 
         def run_query(job):
             key, stmt, job_params = job
-            return key, pd.read_sql(stmt, engine, params=job_params)
+            summary = FrameSummary(**LOADER_SUMMARIES.get(key, {}))
+            return key, track_query(
+                f"{group}.{key}", lambda: summarize_query(stmt, engine, job_params, summary, budget)
+            )
 
         with ThreadPoolExecutor(max_workers=len(queries)) as executor:
-            for key, df in executor.map(run_query, queries):
-                results[key] = df
+            for key, summary in executor.map(propagate(run_query), queries):
+                results[key] = summary
 
         patient_stmt = builder_payload.get("primeras_consultas_query")
         df7 = (
-            pd.read_sql(patient_stmt, engine, params={"codcas": codcas, "periodo_sql": periodo_sql})
+            fetch_frame(patient_stmt, engine, params={"codcas": codcas, "periodo_sql": periodo_sql})
             if patient_stmt is not None else pd.DataFrame()
         )
         patient_agr_stmt = builder_payload.get("primeras_consultas_agrupador_query")
         df8 = (
-            pd.read_sql(patient_agr_stmt, engine, params={"codcas": codcas, "periodo_sql": periodo_sql})
+            fetch_frame(patient_agr_stmt, engine, params={"codcas": codcas, "periodo_sql": periodo_sql})
             if patient_agr_stmt is not None else pd.DataFrame()
         )
 
-        atenciones_df = results.get("atenciones", pd.DataFrame())
-        horas_efectivas_df = results.get("horas_efectivas", pd.DataFrame())
-        if not horas_efectivas_df.empty and 'horas_efec_def' in horas_efectivas_df:
-            horas_efectivas_df['horas_efec_def'] = pd.to_numeric(
-                horas_efectivas_df['horas_efec_def'], errors='coerce'
-            ).fillna(0)
-        horas_efectivas_df_agru = (
-            horas_efectivas_df.groupby('agrupador', dropna=False)['horas_efec_def']
-            .sum()
-            .reset_index(name='counts')
-            .sort_values('counts', ascending=False)
-            if (
-                not horas_efectivas_df.empty
-                and 'agrupador' in horas_efectivas_df
-                and 'horas_efec_def' in horas_efectivas_df
-            )
-            else pd.DataFrame(columns=['agrupador', 'counts'])
-        )
-        horas_programadas_df = results.get("horas_programadas", pd.DataFrame())
-        citados_df = results.get("citados", pd.DataFrame())
-        citados_df_agru = (
-            citados_df.groupby(["agrupador"])
-            .size()
-            .reset_index(name='counts')
-            .sort_values('counts', ascending=False)
-            if not citados_df.empty else pd.DataFrame(columns=['agrupador', 'counts'])
-        )
-        desercion_df = results.get("desercion", pd.DataFrame())
-        desercion_agru = (
-            desercion_df.groupby(["agrupador"])
-            .size()
-            .reset_index(name='counts')
-            .sort_values('counts', ascending=False)
-            if not desercion_df.empty else pd.DataFrame(columns=['agrupador', 'counts'])
-        ) 
-        medicos_agr = results.get("medicos_agrup", pd.DataFrame())
-
-        if not horas_programadas_df.empty and 'total_horas' in horas_programadas_df:
-            horas_programadas_df['total_horas'] = pd.to_numeric(horas_programadas_df['total_horas'], errors='coerce').fillna(0)
-
-        nombre_centro_values = atenciones_df['cenasides'].dropna().unique() if 'cenasides' in atenciones_df else []
-        nombre_centro = nombre_centro_values[0] if len(nombre_centro_values) > 0 else codcas
-
-        total_atenciones = len(atenciones_df)
-        total_atenciones_agru = (
-            atenciones_df.groupby(["agrupador"])
-            .size()
-            .reset_index(name='counts')
-            .sort_values('counts', ascending=False)
-            if not atenciones_df.empty else pd.DataFrame(columns=['agrupador', 'counts'])
-        )
+        empty = FrameSummary(by='agrupador')
+        atenciones = results.get("atenciones", empty)
+        horas_efectivas = results.get("horas_efectivas", empty)
+        horas_programadas = results.get("horas_programadas", empty)
+        citados = results.get("citados", empty)
+        desercion = results.get("desercion", empty)
+        medicos_agr = results.get("medicos_agrup", empty)
+
+        nombre_centro = atenciones.first if atenciones.first is not None else codcas
+
+        total_atenciones = atenciones.rows
+        total_atenciones_agru = atenciones.by_group()
 
         total_consultantes = int(df7['cantidad'].iloc[0]) if not df7.empty else 0
         total_consultantes_por_servicio = (
             df8.rename(columns={"cantidad": "counts"}) if not df8.empty else pd.DataFrame(columns=['agrupador', 'counts'])
         )
 
-        total_medicos = atenciones_df['dni_medico'].nunique() if 'dni_medico' in atenciones_df else 0
-        medicos_por_agrupador = (
-            medicos_agr.groupby('agrupador')['dni_medico']
-            .nunique()
-            .reset_index(name='counts')
-            .sort_values('counts', ascending=False)
-            if not medicos_agr.empty else pd.DataFrame(columns=['agrupador', 'counts'])
-        )
-
-        total_horas_efectivas = float(horas_efectivas_df['horas_efec_def'].sum()) if 'horas_efec_def' in horas_efectivas_df else 0
-        total_horas_programadas = float(horas_programadas_df['total_horas'].sum()) if 'total_horas' in horas_programadas_df else 0
+        total_medicos = atenciones.nunique()
+        medicos_por_agrupador = medicos_agr.by_group()
 
-        horas_programadas_por_agrupador = (
-            horas_programadas_df.groupby('agrupador', dropna=False)['total_horas']
-            .sum()
-            .reset_index(name='counts')
-            .sort_values('counts', ascending=False)
-            if 'agrupador' in horas_programadas_df else pd.DataFrame(columns=['agrupador', 'counts'])
-        )
+        total_horas_efectivas = horas_efectivas.total()
+        total_horas_programadas = horas_programadas.total()
+        horas_efectivas_df_agru = horas_efectivas.by_group()
+        horas_programadas_por_agrupador = horas_programadas.by_group()
 
-        total_citados = len(citados_df)
-        total_desercion_citas = len(desercion_df)
+        citados_df_agru = citados.by_group()
+        desercion_agru = desercion.by_group()
+        total_citados = citados.rows
+        total_desercion_citas = desercion.rows
 
         stats = {
             'total_atenciones': total_atenciones,
@@ -2425,121 +2428,129 @@ CASE WHEN cod_tipo_paciente = '4' THEN '2' ELSE '1' END AS cod_tipo_paciente,
         output.seek(0)
         return dcc.send_bytes(output.getvalue(), f"reporte_{codcas}_{anio}_{periodo}.xlsx")
 
-    def serve_layout():
-        if not has_request_context():
-            return html.Div()
-
-        if getattr(current_user, "is_authenticated", False):
-            header = html.Div([
-                html.Img(
-                    src=dash_app.get_asset_url('logo.png'),
-                    style={
-                        'width': '120px',
-                        'height': '60px',
-                        'objectFit': 'contain',
-                        'marginRight': '16px'
-                    }
-                ),
+    @lru_cache(maxsize=16)
+    def build_authenticated_layout(role, assets_version):
+        # El layout no depende de la petición: se arma una vez por rol y se
+        # reutiliza en cada carga de página. `assets_version` cambia con
+        # `flask build-static` y fuerza a rearmarlo con los nuevos nombres
+        header = html.Div([
+            html.Img(
+                src=dash_asset_url(dash_app, 'logo.png'),
+                style={
+                    'width': '120px',
+                    'height': '60px',
+                    'objectFit': 'contain',
+                    'marginRight': '16px'
+                }
+            ),
+            html.Div([
                 html.Div([
                     html.Div([
-                        html.Div([
-                            html.I(className="bi bi-hospital", style={'fontSize': '30px', 'color': BRAND, 'marginRight': '10px'}),
-                            html.H2(
-                                "Consulta externa - Médicas",
-                                style={
-                                    'color': BRAND,
-                                    'fontFamily': FONT_FAMILY,
-                                    'fontSize': '26px',
-                                    'fontWeight': 800,
-                                    'margin': '0'
-                                }
-                            ),
-                        ], style={'display': 'flex', 'alignItems': 'center', 'gap': '8px'}),
-                        dbc.Button(
-                            [html.I(className="bi bi-file-earmark-arrow-down me-2"), "Ficha técnica"],
-                            id='download-ficha-tecnica-button',
-                            color='light',
-                            outline=True,
-                            size='sm',
+                        html.I(className="bi bi-hospital", style={'fontSize': '30px', 'color': BRAND, 'marginRight': '10px'}),
+                        html.H2(
+                            "Consulta externa - Médicas",
                             style={
-                                'borderColor': BRAND,
                                 'color': BRAND,
                                 'fontFamily': FONT_FAMILY,
-                                'fontWeight': '600',
-                                'borderRadius': '8px',
-                                'padding': '4px 12px'
+                                'fontSize': '26px',
+                                'fontWeight': 800,
+                                'margin': '0'
                             }
                         ),
-                        dcc.Download(id='download-ficha-tecnica')
-                    ], style={'display': 'flex', 'alignItems': 'center', 'gap': '12px', 'flexWrap': 'wrap'}),
-                    dbc.Tooltip(
-                        "Descargar ficha técnica",
-                        target='download-ficha-tecnica-button',
-                        placement='bottom',
-                        style={'zIndex': 9999}
-                    ),
-                    html.P(
-                        f"Informacion actualizada al 31/01/2026 | Sistema de Gestion Estadística",
+                    ], style={'display': 'flex', 'alignItems': 'center', 'gap': '8px'}),
+                    dbc.Button(
+                        [html.I(className="bi bi-file-earmark-arrow-down me-2"), "Ficha técnica"],
+                        id='download-ficha-tecnica-button',
+                        color='light',
+                        outline=True,
+                        size='sm',
                         style={
-                            'color': MUTED,
+                            'borderColor': BRAND,
+                            'color': BRAND,
                             'fontFamily': FONT_FAMILY,
-                            'fontSize': '13px',
-                            'margin': '6px 0 0 0'
+                            'fontWeight': '600',
+                            'borderRadius': '8px',
+                            'padding': '4px 12px'
                         }
-                    )
-                ], style={
-                    'display': 'flex',
-                    'flexDirection': 'column',
-                    'justifyContent': 'center'
-                })
+                    ),
+                    dcc.Download(id='download-ficha-tecnica')
+                ], style={'display': 'flex', 'alignItems': 'center', 'gap': '12px', 'flexWrap': 'wrap'}),
+                dbc.Tooltip(
+                    "Descargar ficha técnica",
+                    target='download-ficha-tecnica-button',
+                    placement='bottom',
+                    style={'zIndex': 9999}
+                ),
+                html.P(
+                    f"Informacion actualizada al 31/01/2026 | Sistema de Gestion Estadística",
+                    style={
+                        'color': MUTED,
+                        'fontFamily': FONT_FAMILY,
+                        'fontSize': '13px',
+                        'margin': '6px 0 0 0'
+                    }
+                )
             ], style={
                 'display': 'flex',
-                'alignItems': 'center',
-                'padding': '16px 20px',
-                'backgroundColor': CARD_BG,
-                'borderRadius': '16px',
-                'boxShadow': '0 8px 20px rgba(0,0,0,0.08)',
-                'gap': '14px'
+                'flexDirection': 'column',
+                'justifyContent': 'center'
             })
+        ], style={
+            'display': 'flex',
+            'alignItems': 'center',
+            'padding': '16px 20px',
+            'backgroundColor': CARD_BG,
+            'borderRadius': '16px',
+            'boxShadow': '0 8px 20px rgba(0,0,0,0.08)',
+            'gap': '14px'
+        })
+
+        tabs_component = dcc.Tabs(
+            id='dashboard-tabs',
+            value=DASHBOARD_TABS[0].value,
+            children=[build_tab_panel(tab, loaded=(i == 0)) for i, tab in enumerate(DASHBOARD_TABS)],
+            style={'backgroundColor': 'transparent', 'marginBottom': '0'},
+            content_style={'padding': '0', 'border': 'none', 'marginTop': '-1px'}
+        )
 
-            tabs_component = dcc.Tabs(
-                id='dashboard-tabs',
-                value=DASHBOARD_TABS[0].value,
-                children=[build_tab_panel(tab) for tab in DASHBOARD_TABS],
-                style={'backgroundColor': 'transparent', 'marginBottom': '0'},
-                content_style={'padding': '0', 'border': 'none', 'marginTop': '-1px'}
+        main_dashboard = html.Div([
+            header,
+            html.Br(),
+            tabs_component,
+            dcc.Store(id='dashboard-tabs-loaded', data=[DASHBOARD_TABS[0].key])
+        ], id='main-dashboard-content')
+
+        content = html.Div([
+            dcc.Location(id='url', refresh=True),
+            main_dashboard,
+            html.Div(
+                children=dash.page_container,
+                id='page-container-wrapper',
+                style={'display': 'none'}
             )
+        ], style={
+            'marginTop': '10px',
+            'width': '100%',
+            'padding': '0'
+        })
 
-            main_dashboard = html.Div([
-                header,
-                html.Br(),
-                tabs_component
-            ], id='main-dashboard-content')
-
-            content = html.Div([
-                dcc.Location(id='url', refresh=True),
-                main_dashboard,
-                html.Div(
-                    children=dash.page_container,
-                    id='page-container-wrapper',
-                    style={'display': 'none'}
-                )
-            ], style={
-                'marginTop': '10px',
-                'width': '100%',
-                'padding': '0'
-            })
+        return dbc.Container([content], fluid=True, style={
+            'backgroundImage': "url('/static/76824.jpg')",
+            'backgroundSize': 'cover',
+            'backgroundPosition': 'center center',
+            'backgroundRepeat': 'no-repeat',
+            'backgroundAttachment': 'fixed',
+            'minHeight': '100vh',
+            'padding': '18px 12px 26px 12px',
+            'fontFamily': FONT_FAMILY
+        })
 
-            return dbc.Container([content], fluid=True, style={
-                'backgroundImage': "url('/static/76824.jpg')",
-                'backgroundSize': 'cover',
-                'backgroundPosition': 'center center',
-                'backgroundRepeat': 'no-repeat',
-                'backgroundAttachment': 'fixed',
-                'minHeight': '100vh',
-                'padding': '18px 12px 26px 12px',
-                'fontFamily': FONT_FAMILY
-            })
+    def serve_layout():
+        if not has_request_context():
+            return html.Div()
+
+        if getattr(current_user, "is_authenticated", False):
+            return build_authenticated_layout(getattr(current_user, "role", None), dash_assets_version(dash_app))
 
         return html.Div([
             html.H3('No autenticado'),
@@ -2601,10 +2612,36 @@ CASE WHEN cod_tipo_paciente = '4' THEN '2' ELSE '1' END AS cod_tipo_paciente,
             return {'display': 'none'}, {'display': 'block'}
         return {'display': 'block'}, {'display': 'none'}
 
+    lazy_tabs = DASHBOARD_TABS[1:]
+
+    @dash_app.callback(
+        *[Output(f'tab-{tab.key}-lazy', 'children') for tab in lazy_tabs],
+        Output('dashboard-tabs-loaded', 'data'),
+        Input('dashboard-tabs', 'value'),
+        State('dashboard-tabs-loaded', 'data'),
+        prevent_initial_call=True
+    )
+    def load_tab_content(tab_value, loaded):
+        loaded = loaded or [DASHBOARD_TABS[0].key]
+        updates = [dash.no_update] * len(lazy_tabs)
+        for index, tab in enumerate(lazy_tabs):
+            if tab.value == tab_value and tab.key not in loaded:
+                updates[index] = build_tab_content(tab)
+                return updates + [loaded + [tab.key]]
+        return updates + [dash.no_update]
+
     primary_filters = DASHBOARD_TABS[0].filter_ids
 
+    # Copia de filtros entre pestañas en el navegador (sin ida y vuelta al servidor)
+    sync_filters_js = (
+        "function(periodo, anio, tipo) {"
+        f" return [periodo, anio, tipo || {json.dumps(DEFAULT_TIPO_ASEGURADO)}]; "
+        "}"
+    )
+
     def register_filter_sync(target_filters):
-        @dash_app.callback(
+        dash_app.clientside_callback(
+            sync_filters_js,
             Output(target_filters.periodo, 'value'),
             Output(target_filters.anio, 'value'),
             Output(target_filters.tipo, 'value'),
@@ -2612,8 +2649,6 @@ CASE WHEN cod_tipo_paciente = '4' THEN '2' ELSE '1' END AS cod_tipo_paciente,
             Input(primary_filters.anio, 'value'),
             Input(primary_filters.tipo, 'value')
         )
-        def _sync_filters(periodo_value, anio_value, tipo_asegurado_value, _target=target_filters):
-            return periodo_value, anio_value, tipo_asegurado_value or DEFAULT_TIPO_ASEGURADO
 
     for tab_config in DASHBOARD_TABS[1:]:
         register_filter_sync(tab_config.filter_ids)
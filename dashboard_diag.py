@@ -10,6 +10,12 @@ from flask import has_request_context
 from flask_login import current_user
 from sqlalchemy import create_engine, text
 
+from backend import diag_duckdb
+from backend.arrow_fetch import fetch_frame
+from backend.metrics import track_query
+from backend.static_assets import dash_asset_url
+from backend.vendor_assets import vendor_stylesheets
+
 
 def create_dash_app(flask_app, url_base_pathname="/diag_cap/"):
     brand = "#0064AF"
@@ -45,11 +51,7 @@ def create_dash_app(flask_app, url_base_pathname="/diag_cap/"):
         "padding": "18px",
     }
 
-    external_stylesheets = [
-        dbc.themes.BOOTSTRAP,
-        "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.css",
-        "https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap",
-    ]
+    external_stylesheets = vendor_stylesheets()
 
     dash_app = Dash(
         __name__,
@@ -453,12 +455,18 @@ def create_dash_app(flask_app, url_base_pathname="/diag_cap/"):
                 sql = f"{sql}\nLIMIT {limit_value}"
             except (TypeError, ValueError):
                 pass
+        params = {k: str(v) for k, v in params.items()}
+        if diag_duckdb.available(table_suffix):
+            # Mes exportado a Parquet: no se consulta el DW
+            try:
+                return track_query('diag.reporte_duckdb', lambda: diag_duckdb.run_query(sql, params, table_suffix)), None
+            except Exception as exc:  # pragma: no cover - se reintenta en Postgres
+                print(f"[Diag Report] Error en DuckDB, se usa Postgres: {exc}")
         engine = create_connection()
         if engine is None:
             return None, "No se pudo establecer conexión con la base de datos."
         try:
-            with engine.connect() as conn:
-                df = pd.read_sql_query(text(sql), conn, params={k: str(v) for k, v in params.items()})
+            df = track_query('diag.reporte', lambda: fetch_frame(text(sql), engine, params=params))
             return df, None
         except Exception as exc:  # pragma: no cover - query issues logged
             print(f"[Diag Report] Error ejecutando consulta: {exc}")
@@ -468,7 +476,7 @@ def create_dash_app(flask_app, url_base_pathname="/diag_cap/"):
         return html.Div(
             [
                 html.Img(
-                    src=dash_app.get_asset_url("logo.png"),
+                    src=dash_asset_url(dash_app, "logo.png"),
                     style={"width": "120px", "height": "60px", "objectFit": "contain", "marginRight": "16px"},
                 ),
                 html.Div(
@@ -11,6 +11,10 @@ import os  # agregado
 import dash
 from urllib.parse import quote_plus
 
+from backend.metrics import track_query
+from backend.static_assets import dash_asset_url
+from backend.vendor_assets import vendor_stylesheets
+
 # Importar páginas de detalle
 from Indicadores import ate_topicos_1
 from Indicadores import ate_topicos_2
@@ -20,11 +24,7 @@ from Indicadores import ate_topicos_5
 
 
 def create_dash_app(flask_app, url_base_pathname='/dashboard_alt/'):
-    external_stylesheets = [
-        dbc.themes.BOOTSTRAP,
-        "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.css",
-        "https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap"
-    ]
+    external_stylesheets = vendor_stylesheets()
 
     # Paleta y estilos consistentes con dashboard.py
     BRAND = "#0064AF"
@@ -207,7 +207,7 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard_alt/'):
                 html.Div([
                     html.Div([
                         html.Img(
-                            src=dash_app.get_asset_url('logo.png'),
+                            src=dash_asset_url(dash_app, 'logo.png'),
                             style={
                                 'width': '120px',
                                 'height': '60px',
@@ -609,14 +609,14 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard_alt/'):
                     END
                     ) IN {codasegu_clause}
             """
-        df_defunciones = pd.read_sql(query_defunciones, engine)
+        df_defunciones = track_query('eme.defunciones', lambda: pd.read_sql(query_defunciones, engine))
         defunciones_data = len(df_defunciones)
 
-        df = pd.read_sql(query, engine)
+        df = track_query('eme.atenciones', lambda: pd.read_sql(query, engine))
         if not query.strip():
             return html.Div("No se definió la consulta SQL para este dashboard."), html.Div()
 
-        df = pd.read_sql(query, engine)
+        df = track_query('eme.atenciones', lambda: pd.read_sql(query, engine))
         if df.empty:
             return html.Div([
                 html.I(className="bi bi-inbox", style={
@@ -719,7 +719,7 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard_alt/'):
         for prioridad in ['1', '2', '3', '4', '5']:
             query_prioridad = query_base + f" and cod_prioridad_n = '{prioridad}'"
             try:
-                df_prioridad = pd.read_sql(query_prioridad, engine)
+                df_prioridad = track_query('eme.prioridad', lambda: pd.read_sql(query_prioridad, engine))
                 topic_col = 'topico_ses' if 'topico_ses' in df_prioridad.columns else 'des_estandar'
                 df_prioridad_tabla = (
                     df_prioridad
@@ -770,7 +770,7 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard_alt/'):
 
         def obtener_total_estancia(query, etiqueta):
             try:
-                df_estancia = pd.read_sql(query, engine)
+                df_estancia = track_query('eme.estancia', lambda: pd.read_sql(query, engine))
                 if df_estancia.empty or 'total' not in df_estancia.columns:
                     return 0
                 return int(df_estancia['total'].sum())
@@ -990,7 +990,7 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard_alt/'):
             and cod_centro = '{codcas}'
             and cod_prioridad_n != '0'
         """
-        df = pd.read_sql(query, engine)
+        df = track_query('eme.descarga_prioridad', lambda: pd.read_sql(query, engine))
         if df.empty:
             return None
         df = df.astype(str)
@@ -1,6 +1,5 @@
 ﻿import io
-import importlib
-import pkgutil
+import json
 from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from functools import lru_cache
@@ -16,14 +15,16 @@ from flask_login import current_user
 from sqlalchemy import create_engine, text
 
 import secure_code as sc
+from backend.arrow_fetch import fetch_frame
+from backend.metrics import track_query
+from backend.sql_tagging import propagate
+from backend.frame_schema import apply_schema
+from backend.static_assets import dash_asset_url, dash_assets_version
+from backend.vendor_assets import vendor_stylesheets
 
 
 def create_dash_app(flask_app, url_base_pathname='/dashboard_nm/'):
-    external_stylesheets = [
-        dbc.themes.BOOTSTRAP,
-        "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.css",
-        "https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap",
-    ]
+    external_stylesheets = vendor_stylesheets()
 
     BRAND = "#0064AF"
     BRAND_SOFT = "#D7E9FF"
@@ -101,22 +102,6 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard_nm/'):
     df_period = pd.DataFrame({'mes': meses, 'periodo': valores})
     tipo_asegurado_options = [{'label': tipo, 'value': tipo} for tipo in tipo_asegurado]
 
-    def _import_indicator_pages():
-        pkg_name = f"{__package__}.Indicadores" if __package__ else "Indicadores"
-        try:
-            pkg = importlib.import_module(pkg_name)
-        except Exception as exc:
-            print(f"[Dash Pages] No se pudo importar el paquete '{pkg_name}': {exc}")
-            return
-
-        for module in pkgutil.iter_modules(pkg.__path__):
-            mod_name = f"{pkg_name}.{module.name}"
-            try:
-                importlib.import_module(mod_name)
-                print(f"[Dash Pages] Página importada: {mod_name}")
-            except Exception as exc:
-                print(f"[Dash Pages] Error importando {mod_name}: {exc}")
-
     dash_app = Dash(
         __name__,
         server=flask_app,
@@ -124,14 +109,10 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard_nm/'):
         suppress_callback_exceptions=True,
         requests_pathname_prefix=url_base_pathname,
         routes_pathname_prefix=url_base_pathname,
-        use_pages=True,
-        pages_folder=""
     )
 
     dash_app.title = "SIEST"
 
-    _import_indicator_pages()
-
     @dataclass(frozen=True)
     class FilterIds:
         periodo: str
@@ -233,11 +214,13 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard_nm/'):
 
         return dbc.Container(summary_sections, fluid=True)
 
-    def build_tab_panel(tab_config):
-        periodo_options = [
-            {'label': row['mes'], 'value': row['periodo']}
-            for _, row in df_period.iterrows()
-        ]
+    periodo_options = [
+        {'label': mes, 'value': periodo}
+        for mes, periodo in zip(df_period['mes'], df_period['periodo'])
+    ]
+
+    @lru_cache(maxsize=None)
+    def build_tab_content(tab_config):
         controls = html.Div([
             html.I(
                 className="bi bi-calendar3 dashboard-control-icon",
@@ -327,38 +310,44 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard_nm/'):
             ),
         ], className='dashboard-control-bar', style={**CONTROL_BAR_STYLE})
 
+        return html.Div([
+            controls,
+            dbc.Tooltip("Volver a la página anterior", target=tab_config.back_button_id, placement='bottom', style={'zIndex': 9999}),
+            dbc.Tooltip("Buscar datos", target=tab_config.search_button_id, placement='bottom', style={'zIndex': 9999}),
+            dbc.Tooltip("Descargar Excel", target=tab_config.download_button_id, placement='bottom', style={'zIndex': 9999}),
+            dbc.Row([
+                dbc.Col(
+                    html.Div(
+                        dcc.Loading(
+                            className='dashboard-loading-inline',
+                            parent_className='dashboard-loading-parent',
+                            parent_style={'width': '100%'},
+                            type='default',
+                            style={'width': '100%'},
+                            children=html.Div(id=tab_config.summary_container_id)
+                        ),
+                        className='dashboard-loading-shell'
+                    ),
+                    width=12
+                )
+            ]),
+            html.Br(),
+            dbc.Row([dbc.Col(html.Div(id=tab_config.charts_container_id), width=12)]),
+            html.Br(),
+        ], id=f'tab-{tab_config.key}-content')
+
+    def build_tab_panel(tab_config, loaded=False):
+        # Solo la pestaña inicial trae su contenido; el resto se genera al
+        # activarla por primera vez (load_tab_content)
         return dcc.Tab(
             label=tab_config.label,
             value=tab_config.value,
             style=TAB_STYLE,
             selected_style=TAB_SELECTED_STYLE,
-            children=[
-                html.Div([
-                    controls,
-                    dbc.Tooltip("Volver a la página anterior", target=tab_config.back_button_id, placement='bottom', style={'zIndex': 9999}),
-                    dbc.Tooltip("Buscar datos", target=tab_config.search_button_id, placement='bottom', style={'zIndex': 9999}),
-                    dbc.Tooltip("Descargar Excel", target=tab_config.download_button_id, placement='bottom', style={'zIndex': 9999}),
-                    dbc.Row([
-                        dbc.Col(
-                            html.Div(
-                                dcc.Loading(
-                                    className='dashboard-loading-inline',
-                                    parent_className='dashboard-loading-parent',
-                                    parent_style={'width': '100%'},
-                                    type='default',
-                                    style={'width': '100%'},
-                                    children=html.Div(id=tab_config.summary_container_id)
-                                ),
-                                className='dashboard-loading-shell'
-                            ),
-                            width=12
-                        )
-                    ]),
-                    html.Br(),
-                    dbc.Row([dbc.Col(html.Div(id=tab_config.charts_container_id), width=12)]),
-                    html.Br(),
-                ], id=f'tab-{tab_config.key}-content')
-            ]
+            children=html.Div(
+                build_tab_content(tab_config) if loaded else None,
+                id=f'tab-{tab_config.key}-lazy'
+            )
         )
 
     def build_required_params_message(message=None):
@@ -1678,12 +1667,16 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard_nm/'):
         queries = builder_payload.get("queries", [])
         results = {}
 
+        group = query_builder.__name__.replace("build_queries_", "")
+
         def run_query(job):
             key, stmt, job_params = job
-            return key, pd.read_sql(stmt, engine, params=job_params)
+            return key, track_query(
+                f"nm.{group}.{key}", lambda: apply_schema(fetch_frame(stmt, engine, params=job_params))
+            )
 
         with ThreadPoolExecutor(max_workers=len(queries)) as executor:
-            for key, df in executor.map(run_query, queries):
+            for key, df in executor.map(propagate(run_query), queries):
                 results[key] = df
 
         atenciones_df = results.get("atenciones", pd.DataFrame())
@@ -1711,7 +1704,7 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard_nm/'):
             if frame.empty or 'actespnom' not in frame:
                 return pd.DataFrame(columns=['agrupador', 'counts'])
             return (
-                frame.groupby('actespnom', dropna=False)
+                frame.groupby('actespnom', dropna=False, observed=True)
                 .size()
                 .reset_index(name='counts')
                 .rename(columns={'actespnom': 'agrupador'})
@@ -1752,7 +1745,7 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard_nm/'):
         atenciones_psicologia_df = results.get("psicologia_total", pd.DataFrame())
         patient_stmt = builder_payload.get("primeras_consultas_query")
         primeras_consultas_df = (
-            pd.read_sql(patient_stmt, engine, params={"codcas": codcas, "periodo_sql": periodo_sql})
+            fetch_frame(patient_stmt, engine, params={"codcas": codcas, "periodo_sql": periodo_sql})
             if patient_stmt is not None else pd.DataFrame()
         )
         total_psicologia_consultantes = int(primeras_consultas_df['cantidad'].iloc[0]) if not primeras_consultas_df.empty else 0
@@ -2155,121 +2148,124 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard_nm/'):
         return dcc.send_bytes(output.getvalue(), filename)
 
 
-    def serve_layout():
-        if not has_request_context():
-            return html.Div()
-
-        if getattr(current_user, "is_authenticated", False):
-            header = html.Div([
-                html.Img(
-                    src=dash_app.get_asset_url('logo.png'),
-                    style={
-                        'width': '120px',
-                        'height': '60px',
-                        'objectFit': 'contain',
-                        'marginRight': '16px'
-                    }
-                ),
+    @lru_cache(maxsize=16)
+    def build_authenticated_layout(role, assets_version):
+        # El layout no depende de la petición: se arma una vez por rol y se
+        # reutiliza en cada carga de página. `assets_version` cambia con
+        # `flask build-static` y fuerza a rearmarlo con los nuevos nombres
+        header = html.Div([
+            html.Img(
+                src=dash_asset_url(dash_app, 'logo.png'),
+                style={
+                    'width': '120px',
+                    'height': '60px',
+                    'objectFit': 'contain',
+                    'marginRight': '16px'
+                }
+            ),
+            html.Div([
                 html.Div([
                     html.Div([
-                        html.Div([
-                            html.I(className="bi bi-hospital", style={'fontSize': '30px', 'color': BRAND, 'marginRight': '10px'}),
-                            html.H2(
-                                "Consulta externa - No médicas",
-                                style={
-                                    'color': BRAND,
-                                    'fontFamily': FONT_FAMILY,
-                                    'fontSize': '26px',
-                                    'fontWeight': 800,
-                                    'margin': '0'
-                                }
-                            ),
-                        ], style={'display': 'flex', 'alignItems': 'center', 'gap': '8px'}),
-                        dbc.Button(
-                            [html.I(className="bi bi-file-earmark-arrow-down me-2"), "Ficha técnica"],
-                            id='download-ficha-tecnica-button-nm',
-                            color='light',
-                            outline=True,
-                            size='sm',
+                        html.I(className="bi bi-hospital", style={'fontSize': '30px', 'color': BRAND, 'marginRight': '10px'}),
+                        html.H2(
+                            "Consulta externa - No médicas",
                             style={
-                                'borderColor': BRAND,
                                 'color': BRAND,
                                 'fontFamily': FONT_FAMILY,
-                                'fontWeight': '600',
-                                'borderRadius': '8px',
-                                'padding': '4px 12px'
+                                'fontSize': '26px',
+                                'fontWeight': 800,
+                                'margin': '0'
                             }
                         ),
-                        dcc.Download(id='download-ficha-tecnica-nm')
-                    ], style={'display': 'flex', 'alignItems': 'center', 'gap': '12px', 'flexWrap': 'wrap'}),
-                    dbc.Tooltip(
-                        "Descargar ficha técnica",
-                        target='download-ficha-tecnica-button-nm',
-                        placement='bottom',
-                        style={'zIndex': 9999}
-                    ),
-                    html.P(
-                        f"Informacion actualizada al 31/01/2026 | Sistema de Gestion Estadística",
+                    ], style={'display': 'flex', 'alignItems': 'center', 'gap': '8px'}),
+                    dbc.Button(
+                        [html.I(className="bi bi-file-earmark-arrow-down me-2"), "Ficha técnica"],
+                        id='download-ficha-tecnica-button-nm',
+                        color='light',
+                        outline=True,
+                        size='sm',
                         style={
-                            'color': MUTED,
+                            'borderColor': BRAND,
+                            'color': BRAND,
                             'fontFamily': FONT_FAMILY,
-                            'fontSize': '13px',
-                            'margin': '6px 0 0 0'
+                            'fontWeight': '600',
+                            'borderRadius': '8px',
+                            'padding': '4px 12px'
                         }
-                    )
-                ], style={
-                    'display': 'flex',
-                    'flexDirection': 'column',
-                    'justifyContent': 'center'
-                })
+                    ),
+                    dcc.Download(id='download-ficha-tecnica-nm')
+                ], style={'display': 'flex', 'alignItems': 'center', 'gap': '12px', 'flexWrap': 'wrap'}),
+                dbc.Tooltip(
+                    "Descargar ficha técnica",
+                    target='download-ficha-tecnica-button-nm',
+                    placement='bottom',
+                    style={'zIndex': 9999}
+                ),
+                html.P(
+                    f"Informacion actualizada al 31/01/2026 | Sistema de Gestion Estadística",
+                    style={
+                        'color': MUTED,
+                        'fontFamily': FONT_FAMILY,
+                        'fontSize': '13px',
+                        'margin': '6px 0 0 0'
+                    }
+                )
             ], style={
                 'display': 'flex',
-                'alignItems': 'center',
-                'padding': '16px 20px',
-                'backgroundColor': CARD_BG,
-                'borderRadius': '16px',
-                'boxShadow': '0 8px 20px rgba(0,0,0,0.08)',
-                'gap': '14px'
+                'flexDirection': 'column',
+                'justifyContent': 'center'
             })
+        ], style={
+            'display': 'flex',
+            'alignItems': 'center',
+            'padding': '16px 20px',
+            'backgroundColor': CARD_BG,
+            'borderRadius': '16px',
+            'boxShadow': '0 8px 20px rgba(0,0,0,0.08)',
+            'gap': '14px'
+        })
 
-            tabs_component = dcc.Tabs(
-                id='dashboard-tabs',
-                value=DASHBOARD_TABS[0].value,
-                children=[build_tab_panel(tab) for tab in DASHBOARD_TABS],
-                style={'backgroundColor': 'transparent', 'marginBottom': '0'},
-                content_style={'padding': '0', 'border': 'none', 'marginTop': '-1px'}
-            )
+        tabs_component = dcc.Tabs(
+            id='dashboard-tabs',
+            value=DASHBOARD_TABS[0].value,
+            children=[build_tab_panel(tab, loaded=(i == 0)) for i, tab in enumerate(DASHBOARD_TABS)],
+            style={'backgroundColor': 'transparent', 'marginBottom': '0'},
+            content_style={'padding': '0', 'border': 'none', 'marginTop': '-1px'}
+        )
 
-            main_dashboard = html.Div([
-                header,
-                html.Br(),
-                tabs_component
-            ], id='main-dashboard-content')
-
-            content = html.Div([
-                dcc.Location(id='url', refresh=True),
-                main_dashboard,
-                html.Div(
-                    children=dash.page_container,
-                    id='page-container-wrapper',
-                    style={'display': 'none'}
-                )
-            ], style={
-                'marginTop': '10px',
-                'width': '100%',
-                'padding': '0'
-            })
+        main_dashboard = html.Div([
+            header,
+            html.Br(),
+            tabs_component,
+            dcc.Store(id='dashboard-tabs-loaded', data=[DASHBOARD_TABS[0].key])
+        ], id='main-dashboard-content')
 
-            return dbc.Container([content], fluid=True, style={
-                'backgroundImage': "url('/static/76824.jpg')",
-                'backgroundSize': 'cover',
-                'backgroundPosition': 'center center',
-                'backgroundRepeat': 'no-repeat',
-                'backgroundAttachment': 'fixed',
-                'minHeight': '100vh',
-                'padding': '18px 12px 26px 12px',
-                'fontFamily': FONT_FAMILY
-            })
+        content = html.Div([
+            dcc.Location(id='url', refresh=True),
+            main_dashboard,
+        ], style={
+            'marginTop': '10px',
+            'width': '100%',
+            'padding': '0'
+        })
+
+        return dbc.Container([content], fluid=True, style={
+            'backgroundImage': "url('/static/76824.jpg')",
+            'backgroundSize': 'cover',
+            'backgroundPosition': 'center center',
+            'backgroundRepeat': 'no-repeat',
+            'backgroundAttachment': 'fixed',
+            'minHeight': '100vh',
+            'padding': '18px 12px 26px 12px',
+            'fontFamily': FONT_FAMILY
+        })
+
+    def serve_layout():
+        if not has_request_context():
+            return html.Div()
+
+        if getattr(current_user, "is_authenticated", False):
+            return build_authenticated_layout(getattr(current_user, "role", None), dash_assets_version(dash_app))
 
         return html.Div([
             html.H3('No autenticado'),
@@ -2320,21 +2316,36 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard_nm/'):
     for tab_config in DASHBOARD_TABS:
         register_summary_callback(tab_config)
 
+    lazy_tabs = DASHBOARD_TABS[1:]
+
     @dash_app.callback(
-        Output('main-dashboard-content', 'style'),
-        Output('page-container-wrapper', 'style'),
-        Input('url', 'pathname')
+        *[Output(f'tab-{tab.key}-lazy', 'children') for tab in lazy_tabs],
+        Output('dashboard-tabs-loaded', 'data'),
+        Input('dashboard-tabs', 'value'),
+        State('dashboard-tabs-loaded', 'data'),
+        prevent_initial_call=True
     )
-    def toggle_main_content(pathname):
-        base = url_base_pathname.rstrip('/') + '/'
-        if pathname and pathname.startswith(f"{base}dash/"):
-            return {'display': 'none'}, {'display': 'block'}
-        return {'display': 'block'}, {'display': 'none'}
+    def load_tab_content(tab_value, loaded):
+        loaded = loaded or [DASHBOARD_TABS[0].key]
+        updates = [dash.no_update] * len(lazy_tabs)
+        for index, tab in enumerate(lazy_tabs):
+            if tab.value == tab_value and tab.key not in loaded:
+                updates[index] = build_tab_content(tab)
+                return updates + [loaded + [tab.key]]
+        return updates + [dash.no_update]
 
     primary_filters = DASHBOARD_TABS[0].filter_ids
 
+    # Copia de filtros entre pestañas en el navegador (sin ida y vuelta al servidor)
+    sync_filters_js = (
+        "function(periodo, anio, tipo) {"
+        f" return [periodo, anio, tipo || {json.dumps(DEFAULT_TIPO_ASEGURADO)}]; "
+        "}"
+    )
+
     def register_filter_sync(target_filters):
-        @dash_app.callback(
+        dash_app.clientside_callback(
+            sync_filters_js,
             Output(target_filters.periodo, 'value'),
             Output(target_filters.anio, 'value'),
             Output(target_filters.tipo, 'value'),
@@ -2342,8 +2353,6 @@ def create_dash_app(flask_app, url_base_pathname='/dashboard_nm/'):
             Input(primary_filters.anio, 'value'),
             Input(primary_filters.tipo, 'value')
         )
-        def _sync_filters(periodo_value, anio_value, tipo_asegurado_value, _target=target_filters):
-            return periodo_value, anio_value, tipo_asegurado_value or DEFAULT_TIPO_ASEGURADO
 
     for tab_config in DASHBOARD_TABS[1:]:
         register_filter_sync(tab_config.filter_ids)
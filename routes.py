@@ -6,6 +6,7 @@ from sqlalchemy import func
 from flask import current_app
 from bi import get_bi_url
 from backend.models import dashboard_code_for_user
+from backend.models import invalidate_user_cache
 from secure_code import encode_code, decode_code
 from backend.centro_asistencial import get_centro_asistencial
 from backend.centro_asistencial import get_centro_asistencial_by_code_red
@@ -103,6 +104,7 @@ def register_routes(app):
 				new_user.role = role
 				db.session.add(new_user)
 				db.session.commit()
+				invalidate_user_cache(new_user.id)
 				flash('Usuario creado exitosamente', 'success')
 				return redirect(url_for('main.index'))
 		
@@ -162,6 +164,7 @@ def register_routes(app):
 
 			db.session.add(usuario)
 			db.session.commit()
+			invalidate_user_cache(usuario.id)
 			flash('Usuario actualizado correctamente.', 'success')
 			return redirect(url_for('main.manage_users', field=search_field_post, q=search_query_post))
 
@@ -216,6 +219,7 @@ def register_routes(app):
 					current_user.set_password(new_password)
 					db.session.add(current_user)
 					db.session.commit()
+					invalidate_user_cache(current_user.id)
 					flash('Contraseña actualizada correctamente.', 'success')
 					return redirect(url_for('main.index'))
 
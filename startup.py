@@ -0,0 +1,134 @@
+"""Arranque rápido: apps Dash perezosas y perfil de tiempos de arranque.
+
+En modo `FAST_START` la app Flask principal sirve login y rutas propias de
+inmediato; cada app Dash (y sus páginas de Indicadores) se construye la
+primera vez que se pide su prefijo, o antes si el hilo de precarga llega
+primero.
+
+Flask no permite registrar rutas después de atender la primera petición,
+así que cada app Dash perezosa vive en su propio servidor Flask (mismo
+SECRET_KEY, `db` y `login_manager`) y `LazyDashDispatcher` le reenvía las
+peticiones de su prefijo a nivel WSGI.
+"""
+import re
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupProfile:
+    """Cronometra las etapas de `create_app` y las imprime si está activo."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - t0))
+
+    def report(self):
+        if not self.enabled:
+            return
+        total = time.perf_counter() - self._start
+        print(f"[startup] Perfil de arranque ({total:.2f}s):")
+        for name, seconds in self.stages:
+            print(f"[startup]   {seconds:7.3f}s  {name}")
+
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(.+)$")
+
+
+def import_time_report(module="app", top=25, env=None):
+    """Importa `module` en un intérprete nuevo con `-X importtime`.
+
+    Devuelve una lista [(cumulativo_s, propio_s, modulo)] ordenada por tiempo
+    acumulado, limitada a `top` filas.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, name = match.groups()
+            rows.append((int(cumulative_us) / 1e6, int(self_us) / 1e6, name.strip()))
+    if proc.returncode != 0 and not rows:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import falló")
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+class LazyDashDispatcher:
+    """Middleware WSGI que construye cada app Dash al primer acceso.
+
+    `factories` es una lista de (prefijo, factory); `factory(prefix)` debe
+    devolver `(server, dash_app)` ya configurados. Las rutas que la app
+    principal ya atiende (p. ej. `/dashboard/` exacto) siguen yendo a ella,
+    igual que en el modo normal donde se registran primero.
+    """
+
+    def __init__(self, app, factories, on_build=None):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.factories = dict(factories)
+        self.on_build = on_build
+        self.servers = {}
+        # Un solo candado: las apps comparten estado global de Dash
+        # (page_registry, callbacks pendientes de dash_registry)
+        self._lock = threading.Lock()
+        # Prefijos más largos primero: '/dashboard_nm/' antes que '/dashboard/'
+        self._prefixes = sorted(self.factories, key=len, reverse=True)
+
+    def get_server(self, prefix):
+        server = self.servers.get(prefix)
+        if server is not None:
+            return server
+        with self._lock:
+            server = self.servers.get(prefix)
+            if server is None:
+                t0 = time.perf_counter()
+                server, dash_app = self.factories[prefix](prefix)
+                self.servers[prefix] = server
+                print(f"[startup] Dash {prefix} construido en {time.perf_counter() - t0:.2f}s")
+                if self.on_build:
+                    self.on_build(dash_app)
+        return server
+
+    def start_warmup(self):
+        """Construye en segundo plano las apps que aún no se pidieron."""
+        def _warm():
+            for prefix in self.factories:
+                try:
+                    self.get_server(prefix)
+                except Exception as e:
+                    print(f"[startup] Error precargando Dash {prefix}: {e}")
+
+        thread = threading.Thread(target=_warm, name="dash-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def _prefix_for(self, environ):
+        path = environ.get("PATH_INFO", "")
+        for prefix in self._prefixes:
+            if path.startswith(prefix):
+                adapter = self.app.url_map.bind_to_environ(environ)
+                if adapter.test(path, environ.get("REQUEST_METHOD", "GET")):
+                    return None
+                return prefix
+        return None
+
+    def __call__(self, environ, start_response):
+        prefix = self._prefix_for(environ)
+        if prefix is None:
+            return self.wsgi_app(environ, start_response)
+        return self.get_server(prefix).wsgi_app(environ, start_response)
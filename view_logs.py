@@ -1,12 +1,16 @@
-from flask import Blueprint, render_template_string
+from flask import Blueprint, render_template_string, request, jsonify, send_file, stream_with_context
 from flask_login import login_required, current_user
-from backend.audit_logging import Logs_User
-from sqlalchemy import desc
+from backend.audit_logging import Logs_User, Logs_Daily, LIMA_TZ
+from backend.profiler import PROFILE_KEEP, PROFILE_SESSION_MINUTES, list_profiles, profile_path
+from backend.sql_tagging import SLOW_QUERY_MS, read_slow_queries
+from sqlalchemy import desc, func
 from extensions import db
-from datetime import datetime
+from datetime import datetime, timedelta
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+import csv
+import io
 import json
 from flask import Response
 
@@ -47,8 +51,108 @@ def format_datetime(dt_obj):
         return str(dt_obj)
 
 
-def generate_logs_html(logs, total, graphs=None):
-    """Genera el HTML completo con estilos inline para mostrar los logs y gráficos."""
+# Script de la tabla de logs: pide páginas a /logs/data usando el último id
+# recibido como cursor y las agrega al final del <tbody>.
+LOGS_TABLE_SCRIPT = """
+        document.addEventListener('DOMContentLoaded', function() {
+            var form = document.getElementById('logsFilterForm');
+            var tbody = document.getElementById('logsTableBody');
+            var loadMore = document.getElementById('logsLoadMore');
+            var nextCursor = null;
+            var loading = false;
+            var METODO_COLORS = {GET: '#0d6efd', POST: '#198754', PUT: '#fd7e14', DELETE: '#dc3545', PATCH: '#6c757d'};
+            var ESTADO_COLORS = {success: '#28a745', error: '#dc3545', denied: '#ffc107'};
+
+            function cell(text, style) {
+                var td = document.createElement('td');
+                td.textContent = text;
+                if (style) { td.setAttribute('style', style); }
+                return td;
+            }
+
+            function badgeCell(text, color) {
+                var td = document.createElement('td');
+                var span = document.createElement('span');
+                span.className = 'badge';
+                span.style.backgroundColor = color;
+                span.textContent = text;
+                td.appendChild(span);
+                return td;
+            }
+
+            function renderRow(log) {
+                var tr = document.createElement('tr');
+                var metodo = log.peticiones || 'N/A';
+                var estado = log.status || 'success';
+                var evento = document.createElement('td');
+                var eventoSpan = document.createElement('span');
+                eventoSpan.className = 'log-event';
+                eventoSpan.textContent = log.log || '';
+                evento.appendChild(eventoSpan);
+                tr.appendChild(cell(log.id));
+                tr.appendChild(cell(log.ip || 'N/A'));
+                tr.appendChild(cell(log.user || 'Anónimo'));
+                tr.appendChild(evento);
+                tr.appendChild(badgeCell(metodo, METODO_COLORS[metodo] || '#6c757d'));
+                tr.appendChild(cell(log.urls || 'N/A', 'font-size: 11px; max-width: 200px; overflow: hidden; text-overflow: ellipsis;'));
+                tr.appendChild(cell(log.navegador || 'N/A', 'font-size: 11px;'));
+                tr.appendChild(badgeCell(estado, ESTADO_COLORS[estado] || '#6c757d'));
+                tr.appendChild(cell(log.user_role || 'N/A'));
+                tr.appendChild(cell(log.fecha || ''));
+                return tr;
+            }
+
+            function showMessage(text) {
+                tbody.innerHTML = '';
+                var tr = document.createElement('tr');
+                var td = cell(text, 'text-align: center; padding: 2rem;');
+                td.colSpan = 10;
+                tr.appendChild(td);
+                tbody.appendChild(tr);
+            }
+
+            function fetchPage(reset) {
+                if (loading) { return; }
+                loading = true;
+                var params = new URLSearchParams(new FormData(form));
+                if (!reset && nextCursor !== null) { params.set('cursor', nextCursor); }
+                fetch('/logs/data?' + params.toString(), {credentials: 'same-origin'})
+                    .then(function(resp) { return resp.json(); })
+                    .then(function(payload) {
+                        if (reset) { tbody.innerHTML = ''; }
+                        var rows = payload.rows || [];
+                        rows.forEach(function(log) { tbody.appendChild(renderRow(log)); });
+                        if (reset && rows.length === 0) { showMessage('No hay registros de logs'); }
+                        nextCursor = payload.next_cursor;
+                        loadMore.style.display = nextCursor === null ? 'none' : 'inline-block';
+                    })
+                    .catch(function() { showMessage('Error cargando registros'); })
+                    .then(function() { loading = false; });
+            }
+
+            form.addEventListener('submit', function(ev) {
+                ev.preventDefault();
+                nextCursor = null;
+                // La exportación CSV usa los mismos filtros que la tabla
+                var exportLink = document.getElementById('exportCsvLink');
+                if (exportLink) {
+                    exportLink.href = '/logs/export_csv?' + new URLSearchParams(new FormData(form)).toString();
+                }
+                fetchPage(true);
+            });
+            loadMore.addEventListener('click', function() { fetchPage(false); });
+            fetchPage(true);
+        });
+"""
+
+
+def generate_logs_html(total, graphs=None):
+    """Genera el HTML completo con estilos inline para mostrar los logs y gráficos.
+
+    La tabla se entrega vacía: el navegador la llena por páginas desde
+    `/logs/data`, por lo que el tamaño de la página no depende del volumen
+    de la tabla `Log_users`.
+    """
     
     if graphs is None:
         graphs = {'graph1': None, 'graph2': None}
@@ -92,7 +196,7 @@ def generate_logs_html(logs, total, graphs=None):
                 var conteo = {{}};
                 filtrados.forEach(function(d) {{
                     var rol = (d.user_role || 'sin_rol').trim();
-                    conteo[rol] = (conteo[rol] || 0) + 1;
+                    conteo[rol] = (conteo[rol] || 0) + (parseInt(d.cantidad, 10) || 0);
                 }});
 
                 var roles = Object.keys(conteo);
@@ -304,45 +408,6 @@ def generate_logs_html(logs, total, graphs=None):
             }
         });
         """
-    # Generar filas de la tabla
-    rows_html = ""
-    if logs:
-        for log in logs:
-            # Extraer solo la IP sin el UUID
-            ip_display = log.ip_user.split('-')[0] if log.ip_user and '-' in log.ip_user else (log.ip_user or 'N/A')
-            # Formatear la fecha
-            fecha_formateada = format_datetime(log.fecha)
-            
-            # Badge de método HTTP
-            metodo = log.peticiones or 'N/A'
-            metodo_color = {
-                'GET': '#0d6efd', 'POST': '#198754', 'PUT': '#fd7e14', 
-                'DELETE': '#dc3545', 'PATCH': '#6c757d'
-            }.get(metodo, '#6c757d')
-            
-            # Badge de estado
-            estado = log.status or 'success'
-            estado_color = {
-                'success': '#28a745', 'error': '#dc3545', 'denied': '#ffc107'
-            }.get(estado, '#6c757d')
-            
-            rows_html += f"""
-            <tr>
-                <td>{log.id}</td>
-                <td>{ip_display}</td>
-                <td>{log.user or 'Anónimo'}</td>
-                <td><span class="log-event">{log.log}</span></td>
-                <td><span class="badge" style="background-color: {metodo_color};">{metodo}</span></td>
-                <td style="font-size: 11px; max-width: 200px; overflow: hidden; text-overflow: ellipsis;">{log.urls or 'N/A'}</td>
-                <td style="font-size: 11px;">{log.navegador or 'N/A'}</td>
-                <td><span class="badge" style="background-color: {estado_color};">{estado}</span></td>
-                <td>{log.user_role or 'N/A'}</td>
-                <td>{fecha_formateada}</td>
-            </tr>
-            """
-    else:
-        rows_html = '<tr><td colspan="10" style="text-align: center; padding: 2rem;">No hay registros de logs</td></tr>'
-    
     html_content = f"""
     <!DOCTYPE html>
     <html lang="es">
@@ -568,6 +633,30 @@ def generate_logs_html(logs, total, graphs=None):
                 background: #146c43;
                 transform: translateY(-2px);
             }}
+            .logs-filters {{
+                justify-content: flex-start;
+                margin-bottom: 12px;
+            }}
+            .logs-filter-input {{
+                padding: 8px 10px;
+                border: 1px solid #ced4da;
+                border-radius: 8px;
+                font-size: 13px;
+                min-width: 140px;
+            }}
+            .btn-filter {{
+                padding: 8px 16px;
+                border: none;
+                border-radius: 8px;
+                background: #0064AF;
+                color: white;
+                font-size: 13px;
+                font-weight: 600;
+                cursor: pointer;
+            }}
+            .btn-filter:hover {{
+                background: #004d8c;
+            }}
             .btn-back {{
                 background: #0064AF;
                 box-shadow: 0 4px 12px rgba(0,100,175,0.2);
@@ -759,7 +848,9 @@ def generate_logs_html(logs, total, graphs=None):
                 </div>
                 <div class="header-actions">
                     <a href="/" class="btn-back">← Volver al inicio</a>
-                    <a href="/logs/export_csv" class="btn-export" role="button">Exportar CSV</a>
+                    <a href="/logs/export_csv" id="exportCsvLink" class="btn-export" role="button">Exportar CSV</a>
+                    <a href="/logs/slow" class="btn-back" role="button">Consultas lentas</a>
+                    <a href="/logs/profiles" class="btn-back" role="button">Perfiles</a>
                 </div>
             </div>
             <!-- Estadísticas -->
@@ -812,6 +903,20 @@ def generate_logs_html(logs, total, graphs=None):
             <!-- Tabla de Logs -->
             <div class="content-card">
                 <div class="section-title">📋 Registro Detallado de Logs</div>
+                <form id="logsFilterForm" class="filters-row logs-filters">
+                    <input type="text" name="user" class="logs-filter-input" placeholder="Usuario">
+                    <input type="text" name="role" class="logs-filter-input" placeholder="Rol">
+                    <select name="status" class="logs-filter-input">
+                        <option value="">Todos los estados</option>
+                        <option value="success">success</option>
+                        <option value="error">error</option>
+                        <option value="denied">denied</option>
+                    </select>
+                    <input type="text" name="url" class="logs-filter-input" placeholder="URL">
+                    <input type="date" name="date_from" class="logs-filter-input" title="Desde">
+                    <input type="date" name="date_to" class="logs-filter-input" title="Hasta">
+                    <button type="submit" class="btn-filter">Filtrar</button>
+                </form>
                 <div class="logs-table-wrapper">
                     <table class="logs-table">
                         <thead>
@@ -828,16 +933,20 @@ def generate_logs_html(logs, total, graphs=None):
                                 <th>Fecha/Hora</th>
                             </tr>
                         </thead>
-                        <tbody>
-                            {rows_html}
+                        <tbody id="logsTableBody">
+                            <tr><td colspan="10" style="text-align: center; padding: 2rem;">Cargando registros...</td></tr>
                         </tbody>
                     </table>
                 </div>
+                <div class="logs-actions">
+                    <button type="button" id="logsLoadMore" class="btn-filter" style="display: none;">Cargar más</button>
+                </div>
             </div>
             <!-- (Botón movido al header) -->
         </div>
         <script>
             {graphs_script}
+            {LOGS_TABLE_SCRIPT}
         </script>
     </body>
     </html>
@@ -846,71 +955,108 @@ def generate_logs_html(logs, total, graphs=None):
     return html_content
 
 
-def generate_graphs(logs):
-    """Genera gráficos Plotly basados en los logs.
+def generate_graphs():
+    """Genera gráficos Plotly basados en el rollup diario de logs.
     
-    Retorna un diccionario con los gráficos serializados.
+    Retorna un diccionario con los gráficos serializados. Los datos de
+    filtrado embebidos tienen una fila por (día, rol), no por evento.
     """
-    if not logs or len(logs) == 0:
-        print("DEBUG: No hay logs para generar gráficos")
-        return {'graph1': None, 'graph2': None}
-    
-    # Convertir a DataFrame
-    df = pd.DataFrame([{
-        'user': log.user or 'Anónimo',
-        'log': log.log or 'evento',
-        'status': getattr(log, 'status', 'success') or 'success',
-        'peticiones': getattr(log, 'peticiones', 'N/A') or 'N/A',
-        'user_role': getattr(log, 'user_role', 'sin_rol') or 'sin_rol',
-        'urls': getattr(log, 'urls', '') or '',
-        'fecha_dt': getattr(log, 'fecha', None)
-    } for log in logs])
-    
-  
-    
     try:
+        # Conteos diarios de /login por rol
+        login_rows = (
+            db.session.query(Logs_Daily.dia, Logs_Daily.user_role, func.sum(Logs_Daily.cantidad))
+            .filter(Logs_Daily.urls == '/login')
+            .group_by(Logs_Daily.dia, Logs_Daily.user_role)
+            .order_by(Logs_Daily.dia)
+            .all()
+        )
+        if not login_rows:
+            print("DEBUG: No hay logs para generar gráficos")
+            return {'graph1': None, 'graph2': None}
+
+        df_login = pd.DataFrame(login_rows, columns=['dia', 'user_role', 'cantidad'])
+        df_login['user_role'] = df_login['user_role'].replace('', 'sin_rol')
+        df_login['cantidad'] = df_login['cantidad'].astype(int)
+        dia_dt = pd.to_datetime(df_login['dia'])
+        df_login['fecha'] = dia_dt.dt.strftime('%d/%m/%Y')
+        df_login['mes'] = dia_dt.dt.strftime('%m')
+        df_login['anio'] = dia_dt.dt.strftime('%Y')
+
         # GRÁFICO 1: Cantidad de logs por rol (solo URL = /login)
-        df_login = df[df['urls'] == '/login'].copy()
-
-        # Agregar columnas de fecha/mes/año para filtros
-        if not df_login.empty:
-            df_login['fecha_dt'] = pd.to_datetime(df_login['fecha_dt'], errors='coerce')
-            df_login['fecha'] = df_login['fecha_dt'].dt.strftime('%d/%m/%Y')
-            df_login['mes'] = df_login['fecha_dt'].dt.strftime('%m')
-            df_login['anio'] = df_login['fecha_dt'].dt.strftime('%Y')
+        eventos_por_rol = (
+            df_login.groupby('user_role')['cantidad'].sum().sort_values(ascending=False)
+        )
+        roles_list = eventos_por_rol.index.tolist()
+        valores_list = eventos_por_rol.values.tolist()
+
+        # Crear colores según el rol
+        colors_list = ['#0064AF' if str(r).strip() == 'admin' else '#4C78A8' if str(r).strip() == 'user' else '#9D755D' 
+                       for r in roles_list]
+
+        # Usar graph_objects para gráfico de barras vertical
+        fig1 = go.Figure()
+        fig1.add_trace(go.Bar(
+            x=roles_list,
+            y=valores_list,
+            text=valores_list,
+            textposition='outside',
+            marker=dict(color=colors_list),
+            hovertemplate='<b>%{x}</b><br>Logs: %{y}<extra></extra>'
+        ))
         
-        if len(df_login) == 0:
-            print("DEBUG: No hay logs de login para el gráfico 1")
-            graph1_json = None
-        else:
-            eventos_por_rol = df_login['user_role'].value_counts().sort_values(ascending=False)
-            
-            
-            # Convertir a listas para asegurar compatibilidad
-            import numpy as np
-            roles_list = eventos_por_rol.index.tolist()
-            valores_list = eventos_por_rol.values.tolist()
-            
-            
-            # Crear colores según el rol
-            colors_list = ['#0064AF' if str(r).strip() == 'admin' else '#4C78A8' if str(r).strip() == 'user' else '#9D755D' 
-                           for r in roles_list]
-            
-            
-            # Usar graph_objects para gráfico de barras vertical
-            fig1 = go.Figure()
-            fig1.add_trace(go.Bar(
-                x=roles_list,
-                y=valores_list,
-                text=valores_list,
-                textposition='outside',
-                marker=dict(color=colors_list),
-                hovertemplate='<b>%{x}</b><br>Logs: %{y}<extra></extra>'
+        fig1.update_layout(
+            title='Cantidad de Ingresos de Usuarios por Rol',
+            xaxis_title='Rol',
+            yaxis_title='Número de Ingresos',
+            showlegend=False,
+            margin=dict(l=60, r=60, t=80, b=60),
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(family='Calibri, Arial, sans-serif', size=13, color='#2f2f2f'),
+            height=400,
+            xaxis=dict(gridcolor='#e9ecef'),
+            yaxis=dict(gridcolor='#e9ecef', zeroline=True)
+        )
+        
+        # Serializar gráfico 1 y adjuntar los conteos diarios por rol para filtrado
+        graph1_data = json.loads(fig1.to_json())
+        graph1_data['datosLogin'] = df_login[['fecha', 'mes', 'anio', 'user_role', 'cantidad']].to_dict(orient='records')
+        graph1_json = json.dumps(graph1_data)
+
+        # GRÁFICO 2: Cantidad de /login por fecha (línea)
+        try:
+            # Rango de años de todo el rollup (no solo /login)
+            anio_minimo, anio_maximo = db.session.query(
+                func.min(Logs_Daily.dia), func.max(Logs_Daily.dia)
+            ).one()
+            rango_anios = {
+                'minimo': anio_minimo.year if anio_minimo else None,
+                'maximo': anio_maximo.year if anio_maximo else None,
+            }
+
+            por_dia = (
+                df_login.groupby(['dia', 'fecha', 'mes', 'anio'], sort=True)['cantidad']
+                .sum()
+                .reset_index()
+            )
+            fechas = por_dia['fecha'].tolist()
+            cantidades = por_dia['cantidad'].astype(int).tolist()
+            datos_completos = por_dia[['fecha', 'mes', 'anio', 'cantidad']].to_dict(orient='records')
+
+            fig2 = go.Figure()
+            fig2.add_trace(go.Scatter(
+                x=fechas,
+                y=cantidades,
+                mode='lines+markers',
+                name='Cantidad de logins',
+                line=dict(color='#0064AF', width=3),
+                marker=dict(size=8, color='#0064AF'),
+                hovertemplate='<b>%{x}</b><br>Logins: %{y}<extra></extra>'
             ))
             
-            fig1.update_layout(
-                title='Cantidad de Ingresos de Usuarios por Rol',
-                xaxis_title='Rol',
+            fig2.update_layout(
+                title='Cantidad de Ingresos por Fecha',
+                xaxis_title='Fecha',
                 yaxis_title='Número de Ingresos',
                 showlegend=False,
                 margin=dict(l=60, r=60, t=80, b=60),
@@ -919,89 +1065,15 @@ def generate_graphs(logs):
                 font=dict(family='Calibri, Arial, sans-serif', size=13, color='#2f2f2f'),
                 height=400,
                 xaxis=dict(gridcolor='#e9ecef'),
-                yaxis=dict(gridcolor='#e9ecef', zeroline=True)
+                yaxis=dict(gridcolor='#e9ecef', zeroline=True),
+                hovermode='x unified'
             )
             
-            # Serializar gráfico 1 usando to_json() y adjuntar datos para filtrado
-            import json
-            graph1_json_raw = fig1.to_json()
-            graph1_data = json.loads(graph1_json_raw)
-            datos_login = df_login[['fecha', 'mes', 'anio', 'user_role']].fillna('').to_dict(orient='records')
-            graph1_data['datosLogin'] = datos_login
-            graph1_json = json.dumps(graph1_data)
-        
-        # GRÁFICO 2: Cantidad de /login por fecha (línea)
-        try:
-            from sqlalchemy import text
-            # Obtener rango de años de toda la tabla (no solo /login)
-            query_years = """SELECT 
-                            MIN(EXTRACT(YEAR FROM fecha)::integer) AS anio_minimo,
-                            MAX(EXTRACT(YEAR FROM fecha)::integer) AS anio_maximo
-                            FROM public."Log_users"
-                            WHERE fecha IS NOT NULL;"""
-            result_years = db.session.execute(text(query_years))
-            years_row = result_years.fetchone()
-            anio_minimo = years_row[0] if years_row and years_row[0] else None
-            anio_maximo = years_row[1] if years_row and years_row[1] else None
-
-            query_str = """SELECT 
-                           TO_CHAR(fecha, 'DD/MM/YYYY') AS fecha,
-                           TO_CHAR(fecha, 'MM') AS mes,
-                           TO_CHAR(fecha, 'YYYY') AS anio,
-                           COUNT(*) AS cantidad_login
-                           FROM public."Log_users"
-                           WHERE urls = '/login'
-                           GROUP BY TO_CHAR(fecha, 'DD/MM/YYYY'), TO_CHAR(fecha, 'MM'), TO_CHAR(fecha, 'YYYY')
-                           ORDER BY MIN(fecha);"""
-            
-            result = db.session.execute(text(query_str))
-            rows = result.fetchall()
-            
-            if rows and len(rows) > 0:
-                fechas = [str(row[0]) for row in rows]
-                meses = [str(row[1]) for row in rows]
-                anios = [str(row[2]) for row in rows]
-                cantidades = [row[3] for row in rows]
-                
-                # Crear datos completos con mes y año para filtrado
-                datos_completos = [{'fecha': f, 'mes': m, 'anio': a, 'cantidad': c} for f, m, a, c in zip(fechas, meses, anios, cantidades)]
-                rango_anios = {'minimo': anio_minimo, 'maximo': anio_maximo}
-                
-                fig2 = go.Figure()
-                fig2.add_trace(go.Scatter(
-                    x=fechas,
-                    y=cantidades,
-                    mode='lines+markers',
-                    name='Cantidad de logins',
-                    line=dict(color='#0064AF', width=3),
-                    marker=dict(size=8, color='#0064AF'),
-                    hovertemplate='<b>%{x}</b><br>Logins: %{y}<extra></extra>'
-                ))
-                
-                fig2.update_layout(
-                    title='Cantidad de Ingresos por Fecha',
-                    xaxis_title='Fecha',
-                    yaxis_title='Número de Ingresos',
-                    showlegend=False,
-                    margin=dict(l=60, r=60, t=80, b=60),
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font=dict(family='Calibri, Arial, sans-serif', size=13, color='#2f2f2f'),
-                    height=400,
-                    xaxis=dict(gridcolor='#e9ecef'),
-                    yaxis=dict(gridcolor='#e9ecef', zeroline=True),
-                    hovermode='x unified'
-                )
-                
-                graph2_json = fig2.to_json()
-                # Agregar datos completos y rango de años al JSON para el filtrado
-                import json
-                graph2_data = json.loads(graph2_json)
-                graph2_data['datosCompletos'] = datos_completos
-                graph2_data['rangoAnios'] = rango_anios
-                graph2_json = json.dumps(graph2_data)
-            else:
-                graph2_json = None
+            # Agregar datos completos y rango de años al JSON para el filtrado
+            graph2_data = json.loads(fig2.to_json())
+            graph2_data['datosCompletos'] = datos_completos
+            graph2_data['rangoAnios'] = rango_anios
+            graph2_json = json.dumps(graph2_data)
         except Exception as e:
             print(f"ERROR al generar gráfico 2 (línea de login por fechas): {e}")
             graph2_json = None
@@ -1015,30 +1087,116 @@ def generate_graphs(logs):
         return {'graph1': None, 'graph2': None}
 
 
+LOGS_PAGE_SIZE = 100
+LOGS_MAX_PAGE_SIZE = 500
+
+
+def _parse_date_arg(value):
+    """Convierte 'YYYY-MM-DD' a datetime en hora de Lima; None si no es válido."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value.strip(), '%Y-%m-%d').replace(tzinfo=LIMA_TZ)
+    except ValueError:
+        return None
+
+
+def apply_log_filters(query, args):
+    """Aplica a `query` los filtros de usuario/rol/estado/url/fechas de `args`.
+
+    Los filtros se resuelven en SQL; `date_to` es inclusivo (hasta el final
+    del día indicado).
+    """
+    user = (args.get('user') or '').strip()
+    role = (args.get('role') or '').strip()
+    status = (args.get('status') or '').strip()
+    url = (args.get('url') or '').strip()
+    date_from = _parse_date_arg(args.get('date_from'))
+    date_to = _parse_date_arg(args.get('date_to'))
+
+    if user:
+        query = query.filter(Logs_User.user.ilike(f"%{user}%"))
+    if role:
+        query = query.filter(Logs_User.user_role == role)
+    if status:
+        query = query.filter(Logs_User.status == status)
+    if url:
+        query = query.filter(Logs_User.urls.ilike(f"%{url}%"))
+    if date_from is not None:
+        query = query.filter(Logs_User.fecha >= date_from)
+    if date_to is not None:
+        query = query.filter(Logs_User.fecha < date_to + timedelta(days=1))
+    return query
+
+
+def serialize_log(log):
+    """Convierte un registro de `Log_users` al formato que consume la tabla."""
+    # Extraer solo la IP sin el UUID (filas de la tabla sin particionar)
+    ip_display = log.ip_user.split('-')[0] if log.ip_user and '-' in log.ip_user else (log.ip_user or 'N/A')
+    return {
+        'id': log.id,
+        'ip': ip_display,
+        'user': log.user,
+        'log': log.log,
+        'peticiones': log.peticiones,
+        'urls': log.urls,
+        'navegador': log.navegador,
+        'status': log.status,
+        'user_role': log.user_role,
+        'fecha': format_datetime(log.fecha),
+    }
+
+
 @logs_bp.route('/')
 @login_required
 def view_logs():
     """Vista principal para mostrar logs de auditoría.
     
     Solo accesible para administradores.
-    Muestra todos los registros de la tabla Log_users en una sola página
-    junto con 2 gráficos de análisis.
+    Entrega el esqueleto de la página con los 2 gráficos de análisis; la
+    tabla se carga por páginas desde `/logs/data`.
     """
     # Verificar que el usuario sea admin
     if current_user.role != 'admin':
         return "Acceso denegado. Solo administradores pueden ver los logs.", 403
     
-    # Consultar TODOS los logs ordenados por ID descendente (más recientes primero)
-    logs = Logs_User.query.order_by(desc(Logs_User.id)).all()
-    
-    # Calcular total de logs de /login
-    total_login = len([log for log in logs if log.urls == '/login'])
+    # Calcular total de logs de /login desde el rollup diario
+    total_login = db.session.query(func.sum(Logs_Daily.cantidad)).filter(Logs_Daily.urls == '/login').scalar() or 0
     
     # Generar gráficos
-    graphs = generate_graphs(logs)
+    graphs = generate_graphs()
     
     # Generar HTML con tabla y gráficos
-    return generate_logs_html(logs, total_login, graphs)
+    return generate_logs_html(total_login, graphs)
+
+
+@logs_bp.route('/data')
+@login_required
+def logs_data():
+    """Devuelve una página de logs en JSON (solo admin).
+
+    Paginación por keyset sobre `id` descendente: `cursor` es el último id
+    recibido y `next_cursor` es null cuando no quedan más registros.
+    """
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Acceso denegado.'}), 403
+
+    limit = request.args.get('limit', LOGS_PAGE_SIZE, type=int) or LOGS_PAGE_SIZE
+    limit = max(1, min(limit, LOGS_MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor', type=int)
+
+    query = apply_log_filters(Logs_User.query, request.args)
+    if cursor is not None:
+        query = query.filter(Logs_User.id < cursor)
+    logs = query.order_by(desc(Logs_User.id)).limit(limit + 1).all()
+
+    has_more = len(logs) > limit
+    logs = logs[:limit]
+    next_cursor = logs[-1].id if has_more and logs else None
+    return jsonify({
+        'rows': [serialize_log(log) for log in logs],
+        'next_cursor': next_cursor,
+    })
 
 
 def register_logs_blueprint(app):
@@ -1051,42 +1209,221 @@ def register_logs_blueprint(app):
     app.register_blueprint(logs_bp)
 
 
+EXPORT_COLUMNS = ['id', 'ip_user', 'user', 'log', 'peticiones', 'urls', 'navegador', 'status', 'user_role', 'fecha']
+EXPORT_CHUNK_SIZE = 2000
+
+
+def iter_logs_csv(query, chunk_size=EXPORT_CHUNK_SIZE):
+    """Genera el CSV de `query` por bloques de `chunk_size` filas.
+
+    La consulta se ejecuta con un cursor del lado del servidor, de modo que
+    nunca se materializa el historial completo en el worker.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    pending = 0
+    for row in query.yield_per(chunk_size):
+        values = list(row)
+        values[-1] = format_datetime(values[-1])
+        writer.writerow(values)
+        pending += 1
+        if pending >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+    yield buffer.getvalue()
+
+
 @logs_bp.route('/export_csv')
 @login_required
 def export_logs_csv():
-    """Exporta todos los logs como CSV (solo admin)."""
+    """Exporta los logs como CSV en streaming (solo admin).
+
+    Acepta los mismos filtros que `/logs/data` (user, role, status, url,
+    date_from, date_to).
+    """
     if current_user.role != 'admin':
         return "Acceso denegado.", 403
 
-    logs = Logs_User.query.order_by(desc(Logs_User.id)).all()
-
-    # Construir lista de dicts con todas las columnas de la tabla mostrada
-    rows = []
-    for log in logs:
-        rows.append({
-            'id': getattr(log, 'id', None),
-            'ip_user': getattr(log, 'ip_user', None),
-            'user': getattr(log, 'user', None),
-            'log': getattr(log, 'log', None),
-            'peticiones': getattr(log, 'peticiones', None),
-            'urls': getattr(log, 'urls', None),
-            'navegador': getattr(log, 'navegador', None),
-            'status': getattr(log, 'status', None),
-            'user_role': getattr(log, 'user_role', None),
-            'fecha': format_datetime(getattr(log, 'fecha', None)),
-        })
-
-    # Crear DataFrame y generar CSV
-    try:
-        df_export = pd.DataFrame(rows)
-        csv_data = df_export.to_csv(index=False)
-        # Responder con attachment
-        return Response(
-            csv_data,
-            mimetype='text/csv; charset=utf-8',
-            headers={'Content-Disposition': 'attachment; filename=logs_export.csv'}
-        )
-    except Exception as e:
-        print(f"ERROR export CSV: {e}")
-        return "Error generando CSV", 500
+    query = apply_log_filters(
+        db.session.query(*(getattr(Logs_User, col) for col in EXPORT_COLUMNS)),
+        request.args,
+    ).order_by(desc(Logs_User.id))
+
+    return Response(
+        stream_with_context(iter_logs_csv(query)),
+        mimetype='text/csv; charset=utf-8',
+        headers={'Content-Disposition': 'attachment; filename=logs_export.csv'}
+    )
+
+
+SLOW_QUERIES_TEMPLATE = """
+<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <title>Consultas lentas</title>
+    <style>
+        body { font-family: 'Inter', sans-serif; background: #f5f7fa; margin: 0; padding: 24px; color: #212529; }
+        .slow-container { max-width: 1400px; margin: 0 auto; }
+        .header-card { display: flex; align-items: center; background: white; border-radius: 12px;
+                       padding: 20px 24px; box-shadow: 0 4px 12px rgba(0,0,0,0.06); margin-bottom: 20px; }
+        .header-card h1 { font-size: 22px; margin: 0 0 4px; }
+        .logs-subtitle { margin: 0; color: #6c757d; font-size: 14px; }
+        .btn-back { padding: 10px 20px; background: #6c757d; color: white; border-radius: 8px;
+                    text-decoration: none; font-size: 14px; font-weight: 600; }
+        table { width: 100%; border-collapse: collapse; background: white; border-radius: 12px; overflow: hidden;
+                box-shadow: 0 4px 12px rgba(0,0,0,0.06); font-size: 13px; }
+        th, td { padding: 10px 12px; border-bottom: 1px solid #e9ecef; text-align: left; vertical-align: top; }
+        th { background: #f1f3f5; }
+        pre { white-space: pre-wrap; word-break: break-word; max-height: 400px; overflow: auto;
+              background: #f8f9fa; padding: 8px; border-radius: 6px; font-size: 12px; }
+        .ms { font-weight: 600; color: #b02a37; white-space: nowrap; }
+        .tags span { display: inline-block; margin: 0 4px 4px 0; padding: 2px 6px; border-radius: 4px; background: #e7f1ff; }
+        .plan-error { color: #b02a37; }
+    </style>
+</head>
+<body>
+    <div class="slow-container">
+        <div class="header-card">
+            <div style="flex:1">
+                <h1>🐢 Consultas lentas</h1>
+                <p class="logs-subtitle">Sentencias que superaron {{ threshold }} ms, con su plan (EXPLAIN, sin ejecutar). Últimas {{ entries|length }}.</p>
+            </div>
+            <a href="/logs/" class="btn-back">← Volver a logs</a>
+        </div>
+        <table>
+            <thead>
+                <tr><th>Fecha</th><th>Duración</th><th>Base</th><th>Origen</th><th>SQL y plan</th></tr>
+            </thead>
+            <tbody>
+            {% for entry in entries %}
+                <tr>
+                    <td>{{ entry.fecha }}</td>
+                    <td class="ms">{{ entry.ms }} ms</td>
+                    <td>{{ entry.database or '' }}</td>
+                    <td class="tags">
+                        {% for key, value in (entry.tags or {}).items() %}<span>{{ key }}={{ value }}</span>{% endfor %}
+                    </td>
+                    <td>
+                        <details><summary>SQL</summary><pre>{{ entry.statement }}</pre></details>
+                        {% if entry.plan %}
+                        <details><summary>Plan</summary><pre>{{ entry.plan|tojson(indent=2) }}</pre></details>
+                        {% elif entry.plan_error %}
+                        <span class="plan-error">Sin plan: {{ entry.plan_error }}</span>
+                        {% endif %}
+                    </td>
+                </tr>
+            {% else %}
+                <tr><td colspan="5">No hay consultas lentas registradas.</td></tr>
+            {% endfor %}
+            </tbody>
+        </table>
+    </div>
+</body>
+</html>
+"""
+
+
+@logs_bp.route('/slow')
+@login_required
+def slow_queries():
+    """Últimas consultas lentas con su plan de ejecución (solo admin)."""
+    if current_user.role != 'admin':
+        return "Acceso denegado.", 403
+
+    limit = request.args.get('limit', 200, type=int) or 200
+    entries = read_slow_queries(max(1, min(limit, 1000)))
+    return render_template_string(SLOW_QUERIES_TEMPLATE, entries=entries, threshold=SLOW_QUERY_MS)
+
+
+PROFILES_TEMPLATE = """
+<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <title>Perfiles de peticiones</title>
+    <style>
+        body { font-family: 'Inter', sans-serif; background: #f5f7fa; margin: 0; padding: 24px; color: #212529; }
+        .slow-container { max-width: 1400px; margin: 0 auto; }
+        .header-card { display: flex; align-items: center; background: white; border-radius: 12px;
+                       padding: 20px 24px; box-shadow: 0 4px 12px rgba(0,0,0,0.06); margin-bottom: 20px; }
+        .header-card h1 { font-size: 22px; margin: 0 0 4px; }
+        .logs-subtitle { margin: 0; color: #6c757d; font-size: 14px; }
+        .btn-back { padding: 10px 20px; background: #6c757d; color: white; border-radius: 8px;
+                    text-decoration: none; font-size: 14px; font-weight: 600; }
+        table { width: 100%; border-collapse: collapse; background: white; border-radius: 12px; overflow: hidden;
+                box-shadow: 0 4px 12px rgba(0,0,0,0.06); font-size: 13px; }
+        th, td { padding: 10px 12px; border-bottom: 1px solid #e9ecef; text-align: left; vertical-align: top; }
+        th { background: #f1f3f5; }
+        code { word-break: break-all; }
+        .ms { font-weight: 600; color: #b02a37; white-space: nowrap; }
+        .plan-error { color: #b02a37; }
+    </style>
+</head>
+<body>
+    <div class="slow-container">
+        <div class="header-card">
+            <div style="flex:1">
+                <h1>⏱️ Perfiles de peticiones</h1>
+                <p class="logs-subtitle">
+                    Agregue <code>?profile=1</code> a una página para perfilar sus callbacks durante
+                    {{ minutes }} minutos (<code>?profile=0</code> lo desactiva) o envíe la cabecera
+                    <code>X-Profile: 1</code>. Se conservan los últimos {{ keep }}.
+                </p>
+            </div>
+            <a href="/logs/" class="btn-back">← Volver a logs</a>
+        </div>
+        <table>
+            <thead>
+                <tr><th>Fecha</th><th>Duración</th><th>Petición</th><th>Callback</th><th>Usuario</th><th>Reporte</th></tr>
+            </thead>
+            <tbody>
+            {% for profile in profiles %}
+                <tr>
+                    <td>{{ profile.fecha }}</td>
+                    <td class="ms">{{ profile.ms }} ms</td>
+                    <td><code>{{ profile.path }}</code></td>
+                    <td><code>{{ profile.callback or '' }}</code></td>
+                    <td>{{ profile.user or '' }}</td>
+                    <td>
+                        <a href="/logs/profiles/{{ profile.file }}" target="_blank">{{ profile.motor }}</a>
+                        {% if profile.error %}<div class="plan-error">{{ profile.error }}</div>{% endif %}
+                    </td>
+                </tr>
+            {% else %}
+                <tr><td colspan="6">No hay perfiles guardados.</td></tr>
+            {% endfor %}
+            </tbody>
+        </table>
+    </div>
+</body>
+</html>
+"""
+
+
+@logs_bp.route('/profiles')
+@login_required
+def profiles():
+    """Perfiles de peticiones guardados (solo admin)."""
+    if current_user.role != 'admin':
+        return "Acceso denegado.", 403
+
+    return render_template_string(PROFILES_TEMPLATE, profiles=list_profiles(),
+                                  minutes=PROFILE_SESSION_MINUTES, keep=PROFILE_KEEP)
+
+
+@logs_bp.route('/profiles/<name>')
+@login_required
+def profile_report(name):
+    """Reporte de un perfil: HTML de pyinstrument o texto de cProfile (solo admin)."""
+    if current_user.role != 'admin':
+        return "Acceso denegado.", 403
 
+    path = profile_path(name)
+    if path is None:
+        return "Perfil no encontrado.", 404
+    mimetype = 'text/html' if name.endswith('.html') else 'text/plain'
+    return send_file(path, mimetype=mimetype)